@@ -0,0 +1,261 @@
+"""Modo de almacenamiento de las mediciones: completo (tabla clientes) o compacto (tabla mediciones).
+
+En modo completo cada fila guarda las entradas del análisis y las 15 métricas derivadas. En modo
+compacto solo se guardan las entradas y el objetivo; las métricas se calculan al leer, por bloques,
+con calculadora_lote.metricas_lote, y coinciden exactamente con las que guardaría el modo completo.
+La base de datos ocupa en torno a la mitad, a cambio de algo de CPU en cada lectura.
+
+El modo es un ajuste de la propia base de datos (tabla ajustes), así que la aplicación, el importador,
+la API y la línea de comandos lo comparten. Para cambiarlo, con la aplicación cerrada:
+
+    python almacenamiento.py compacto
+    python almacenamiento.py completo
+
+La migración copia las filas conservando sus id en una sola transacción y después compacta el archivo
+con VACUUM (--sin-vacuum para omitirlo).
+"""
+
+import argparse
+import sys
+import threading
+import weakref
+from collections import namedtuple
+
+from sqlalchemy import delete, func, select
+
+from base_datos import obtener_motor
+from models import Ajuste, Cliente, Medicion
+
+
+MODO_COMPLETO = 'completo'
+MODO_COMPACTO = 'compacto'
+MODOS = (MODO_COMPLETO, MODO_COMPACTO)
+
+'''Columnas guardadas en el modo compacto, además del id.'''
+
+CAMPOS_MEDICION = ('nombre', 'fecha', 'peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello',
+                   'objetivo')
+
+'''Factor que aplica calcular_calorias_diarias a la TMB según el objetivo; sirve para deducir el objetivo
+de las filas que no lo traen (la tabla clientes no lo guarda).'''
+
+FACTORES_OBJETIVO = {'mantener': 1.2, 'perder': 1.2 * 0.8, 'ganar': 1.2 * 1.2}
+
+_modos = weakref.WeakKeyDictionary()
+_cerrojo_modos = threading.Lock()
+
+
+def modo_almacenamiento(motor=None):
+
+    """Devuelve el modo de almacenamiento de una base de datos (MODO_COMPLETO si nunca se ha migrado).
+
+        El valor se lee una vez por motor y se guarda en memoria; migrar lo actualiza. Las lecturas se
+        guían por él; las escrituras usan leer_modo, por si otro proceso ha migrado la base de datos.
+
+        Args:
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            str: Uno de MODOS.
+        """
+    motor = motor or obtener_motor()
+    with _cerrojo_modos:
+        modo = _modos.get(motor)
+    if modo is None:
+        with motor.connect() as conexion:
+            modo = leer_modo(conexion)
+    return modo
+
+
+def leer_modo(conexion):
+
+    """Lee el modo de almacenamiento dentro de la transacción de la conexión, sin usar la memoria.
+
+        Las escrituras lo leen así, en la misma transacción que la inserción (es una consulta por clave
+        primaria): si otro proceso ha migrado la base de datos mientras tanto, la fila va igualmente a la
+        tabla del modo actual en lugar de a una que los lectores ya no miran. Actualiza el valor en memoria.
+
+        Args:
+            conexion (sqlalchemy.engine.Connection): Conexión de la operación.
+
+        Returns:
+            str: Uno de MODOS.
+        """
+    modo = conexion.execute(select(Ajuste.valor).where(Ajuste.clave == 'almacenamiento')).scalar() or MODO_COMPLETO
+    with _cerrojo_modos:
+        _modos[conexion.engine] = modo
+    return modo
+
+
+def tabla_datos(motor=None):
+
+    """Devuelve la tabla (clientes o mediciones) que guarda las mediciones en el modo actual."""
+    return Medicion.__table__ if modo_almacenamiento(motor) == MODO_COMPACTO else Cliente.__table__
+
+
+def objetivo_de(fila):
+
+    """Devuelve el objetivo de una fila de clientes, deduciéndolo de calorias_diarias / tmb si no lo trae."""
+    objetivo = fila.get('objetivo')
+    if objetivo:
+        return objetivo
+    tmb, calorias = fila.get('tmb'), fila.get('calorias_diarias')
+    if not tmb or calorias is None:
+        return 'mantener'
+    factor = calorias / tmb
+    return min(FACTORES_OBJETIVO, key=lambda o: abs(FACTORES_OBJETIVO[o] - factor))
+
+
+def insertar(conexion, filas, modo=None):
+
+    """Inserta filas de clientes en la tabla del modo actual, dentro de la transacción de la conexión.
+
+        Args:
+            conexion (sqlalchemy.engine.Connection): Conexión con la transacción en curso.
+            filas (list): Diccionarios con las columnas de Cliente (y, opcionalmente, objetivo).
+            modo (str, opcional): Modo ya leído con leer_modo en esta transacción; si no, se lee.
+        """
+    if not filas:
+        return
+    if (modo or leer_modo(conexion)) == MODO_COMPACTO:
+        filas = [{**{campo: fila[campo] for campo in CAMPOS_MEDICION[:-1]}, 'objetivo': objetivo_de(fila)}
+                 for fila in filas]
+        conexion.execute(Medicion.__table__.insert(), filas)
+    else:
+        conexion.execute(Cliente.__table__.insert(), filas)
+
+
+_clases_fila = {}
+
+
+def _clase_fila(columnas):
+    clase = _clases_fila.get(columnas)
+    if clase is None:
+        clase = _clases_fila[columnas] = namedtuple('Fila', columnas)
+    return clase
+
+
+def completar(filas, columnas):
+
+    """Calcula las métricas de unas filas de mediciones y devuelve las columnas pedidas.
+
+        Args:
+            filas (list): Filas leídas de mediciones con, al menos, CAMPOS_MEDICION y las columnas pedidas
+                que no son métricas.
+            columnas (tuple): Columnas del resultado, con los nombres de la tabla clientes.
+
+        Returns:
+            list: Filas con las columnas pedidas, accesibles por nombre y por posición (como las de SQLAlchemy).
+        """
+    from calculadora_lote import metricas_lote
+
+    columnas = tuple(columnas)
+    clase = _clase_fila(columnas)
+    if not filas:
+        return []
+    datos = {campo: list(valores) for campo, valores in zip(filas[0]._fields, zip(*filas))}
+    pedidas_metricas = [c for c in columnas if c not in datos]
+    if pedidas_metricas:
+        metricas = metricas_lote(datos)
+        for campo in pedidas_metricas:
+            datos[campo] = metricas[campo].tolist()
+    return [clase._make(fila) for fila in zip(*(datos[c] for c in columnas))]
+
+
+def columnas_lectura(columnas, motor=None):
+
+    """Prepara una lectura de las columnas de clientes indicadas en el modo actual.
+
+        Args:
+            columnas (tuple): Columnas de la tabla clientes que se quieren leer.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            tuple: (tabla, columnas SQL a seleccionar, función que convierte las filas leídas en filas con
+                las columnas pedidas). En modo completo la función devuelve las filas tal cual.
+        """
+    if modo_almacenamiento(motor) != MODO_COMPACTO:
+        tabla = Cliente.__table__
+        return tabla, [tabla.c[c] for c in columnas], lambda filas: filas
+
+    tabla = Medicion.__table__
+    leidas = [c for c in columnas if c in tabla.c]
+    leidas += [c for c in CAMPOS_MEDICION if c not in leidas]
+    return tabla, [tabla.c[c] for c in leidas], lambda filas: completar(filas, columnas)
+
+
+def migrar(destino, motor=None, tamano_bloque=10_000, vacuum=True):
+
+    """Pasa todas las mediciones al modo de almacenamiento indicado.
+
+        Las filas se copian por bloques conservando su id, se borran de la tabla de origen y se guarda el
+        nuevo modo, todo en una sola transacción. Al pasar a completo las métricas se calculan con
+        metricas_lote; al pasar a compacto el objetivo se deduce de calorias_diarias / tmb.
+
+        Args:
+            destino (str): Uno de MODOS.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+            tamano_bloque (int): Filas copiadas en cada bloque.
+            vacuum (bool): Si se compacta el archivo de la base de datos al terminar.
+
+        Returns:
+            int: Número de filas migradas (0 si la base de datos ya estaba en ese modo).
+        """
+    if destino not in MODOS:
+        raise ValueError(f"Modo de almacenamiento no válido: {destino!r}")
+    motor = motor or obtener_motor()
+    if modo_almacenamiento(motor) == destino:
+        return 0
+
+    migradas = 0
+    if destino == MODO_COMPACTO:
+        origen, tabla_destino = Cliente.__table__, Medicion.__table__
+    else:
+        origen, tabla_destino = Medicion.__table__, Cliente.__table__
+    columnas_destino = tuple(tabla_destino.c.keys())
+    with motor.begin() as conexion:
+        resultado = conexion.execution_options(yield_per=tamano_bloque).execute(
+            select(origen).order_by(origen.c.id))
+        for bloque in resultado.partitions():
+            if destino == MODO_COMPACTO:
+                filas = [{**{c: fila._mapping[c] for c in columnas_destino if c != 'objetivo'},
+                          'objetivo': objetivo_de(fila._mapping)} for fila in bloque]
+            else:
+                filas = [fila._asdict() for fila in completar(bloque, columnas_destino)]
+            conexion.execute(tabla_destino.insert(), filas)
+            migradas += len(filas)
+        conexion.execute(delete(origen))
+        conexion.execute(delete(Ajuste.__table__).where(Ajuste.clave == 'almacenamiento'))
+        conexion.execute(Ajuste.__table__.insert().values(clave='almacenamiento', valor=destino))
+    with _cerrojo_modos:
+        _modos[motor] = destino
+
+    if vacuum and motor.dialect.name == 'sqlite':
+        with motor.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+            conexion.exec_driver_sql("VACUUM")
+    return migradas
+
+
+def contar_mediciones(motor=None):
+
+    """Devuelve el número de mediciones guardadas en el modo actual."""
+    motor = motor or obtener_motor()
+    with motor.connect() as conexion:
+        return conexion.execute(select(func.count()).select_from(tabla_datos(motor))).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modo de almacenamiento de las mediciones.")
+    parser.add_argument('modo', nargs='?', choices=MODOS, help="Modo al que migrar; sin él, muestra el actual")
+    parser.add_argument('--sin-vacuum', action='store_true', help="No compactar el archivo tras migrar")
+    args = parser.parse_args(argv)
+
+    if args.modo:
+        migradas = migrar(args.modo, vacuum=not args.sin_vacuum)
+        print(f"{migradas} mediciones migradas al modo {args.modo}.")
+    print(f"Modo de almacenamiento: {modo_almacenamiento()} ({contar_mediciones()} mediciones).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Medición del tiempo de arranque de la aplicación.
+
+main.py importa este módulo antes que ningún otro, así que las etapas se miden desde que empieza a
+cargarse la aplicación. Cada arranque añade una línea a un archivo JSON Lines en el puesto de trabajo;
+para ver la evolución en un equipo:
+
+    python arranque.py
+"""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+
+INICIO = time.perf_counter()
+
+RUTA_INFORME = os.path.join(os.path.expanduser('~'), '.coachbodymetrics', 'arranque.jsonl')
+
+'''Etapas registradas en este arranque, como (etapa, segundos desde INICIO).'''
+
+_etapas = []
+
+
+def marcar(etapa):
+
+    """Registra que ha terminado una etapa del arranque; se puede llamar desde cualquier hilo.
+
+        Args:
+            etapa (str): Nombre de la etapa, por ejemplo 'ventana_login'.
+        """
+    _etapas.append((etapa, time.perf_counter() - INICIO))
+
+
+def etapas():
+
+    """Devuelve las etapas registradas hasta ahora en orden, como diccionario {etapa: segundos}."""
+    return dict(_etapas)
+
+
+def resumen():
+
+    """Devuelve una línea de texto con el tiempo de cada etapa, para mostrarla por consola."""
+    return "Arranque: " + ", ".join(f"{etapa} {segundos:.3f}s" for etapa, segundos in _etapas)
+
+
+def guardar_informe(ruta=RUTA_INFORME):
+
+    """Añade las etapas de este arranque al informe del puesto de trabajo.
+
+        Args:
+            ruta (str): Archivo JSON Lines con un arranque por línea.
+        """
+    registro = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'etapas': etapas(),
+    }
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'a', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+def leer_informe(ruta=RUTA_INFORME):
+
+    """Lee los arranques registrados en el puesto de trabajo.
+
+        Args:
+            ruta (str): Archivo JSON Lines generado por guardar_informe.
+
+        Returns:
+            list: Un diccionario por arranque, del más antiguo al más reciente.
+        """
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding='utf-8') as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    ruta = argv[0] if argv else RUTA_INFORME
+    registros = leer_informe(ruta)
+    if not registros:
+        print(f"No hay arranques registrados en {ruta}")
+        return 1
+
+    nombres = list(dict.fromkeys(etapa for registro in registros for etapa in registro['etapas']))
+    print(f"{len(registros)} arranques registrados en {ruta}")
+    print(f"{'etapa':20s} {'mediana':>9s} {'máximo':>9s} {'último':>9s}")
+    for nombre in nombres:
+        tiempos = [r['etapas'][nombre] for r in registros if nombre in r['etapas']]
+        ultimo = registros[-1]['etapas'].get(nombre)
+        print(f"{nombre:20s} {statistics.median(tiempos):8.3f}s {max(tiempos):8.3f}s "
+              f"{'' if ultimo is None else f'{ultimo:8.3f}s':>9s}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Inicio de sesión, registro y sesiones recordadas en el puesto de trabajo.
+
+Verificar una contraseña con bcrypt es deliberadamente lento, por eso la interfaz llama a estas
+funciones desde el trabajador de base de datos y no desde el hilo de Tk. Tras un inicio de sesión
+correcto se guarda en el puesto un token aleatorio de corta duración; mientras no caduque, al volver
+a abrir la aplicación basta con comprobar su SHA-256 en la tabla sesiones.
+"""
+
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+
+import models
+from base_datos import nueva_sesion
+from instrumentacion import instrumentar
+from models import Usuario, SesionUsuario
+
+
+'''Duración de una sesión recordada: un turno de trabajo.'''
+
+DURACION_SESION = timedelta(hours=8)
+
+RUTA_TOKEN = os.path.join(os.path.expanduser('~'), '.coachbodymetrics', 'sesion')
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+@instrumentar('autenticar')
+def autenticar(username, password, motor=None):
+
+    """Verifica las credenciales de un usuario.
+
+        Si la contraseña se guardó con un coste de bcrypt distinto al actual (models.COSTE_BCRYPT),
+        se vuelve a cifrar con el coste actual aprovechando que se conoce la contraseña en claro.
+
+        Args:
+            username (str): Nombre de usuario.
+            password (str): Contraseña en claro.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            str: El nombre de usuario si las credenciales son correctas, o None si no lo son.
+        """
+    sesion = nueva_sesion(motor)
+    try:
+        user = sesion.query(Usuario).filter_by(username=username).first()
+        if not user or not user.check_password(password):
+            return None
+        if user.coste_password() != models.COSTE_BCRYPT:
+            user.set_password(password)
+            sesion.commit()
+        return user.username
+    finally:
+        sesion.close()
+
+
+def registrar(username, password, motor=None):
+
+    """Registra un nuevo usuario con el coste de bcrypt actual.
+
+        Args:
+            username (str): Nombre de usuario.
+            password (str): Contraseña en claro.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            bool: True si se registró, False si el nombre de usuario ya existe.
+        """
+    sesion = nueva_sesion(motor)
+    try:
+        if sesion.query(Usuario).filter_by(username=username).first():
+            return False
+        new_user = Usuario(username=username)
+        new_user.set_password(password)
+        sesion.add(new_user)
+        sesion.commit()
+        return True
+    finally:
+        sesion.close()
+
+
+def recordar_sesion(username, ruta=RUTA_TOKEN, duracion=DURACION_SESION, motor=None):
+
+    """Crea una sesión recordada para el usuario y guarda su token en el puesto de trabajo.
+
+        Args:
+            username (str): Usuario ya autenticado.
+            ruta (str): Archivo donde se guarda el token.
+            duracion (timedelta): Tiempo de validez de la sesión.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+        """
+    token = secrets.token_urlsafe(32)
+    sesion = nueva_sesion(motor)
+    try:
+        user = sesion.query(Usuario).filter_by(username=username).one()
+        ahora = datetime.now()
+        sesion.query(SesionUsuario).filter(SesionUsuario.expira <= ahora).delete()
+        sesion.add(SesionUsuario(usuario_id=user.id, token_hash=_hash_token(token), expira=ahora + duracion))
+        sesion.commit()
+    finally:
+        sesion.close()
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w') as archivo:
+        archivo.write(token)
+
+
+def recuperar_sesion(ruta=RUTA_TOKEN, motor=None):
+
+    """Comprueba si el puesto de trabajo tiene una sesión recordada que siga vigente.
+
+        Args:
+            ruta (str): Archivo donde se guardó el token.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            str: El nombre de usuario de la sesión, o None si no hay sesión o ha caducado.
+        """
+    try:
+        with open(ruta) as archivo:
+            token = archivo.read().strip()
+    except OSError:
+        return None
+    if not token:
+        return None
+
+    sesion = nueva_sesion(motor)
+    try:
+        fila = (sesion.query(Usuario.username)
+                .join(SesionUsuario, SesionUsuario.usuario_id == Usuario.id)
+                .filter(SesionUsuario.token_hash == _hash_token(token), SesionUsuario.expira > datetime.now())
+                .first())
+        return fila.username if fila else None
+    finally:
+        sesion.close()
+
+
+def cerrar_sesion(ruta=RUTA_TOKEN, motor=None):
+
+    """Invalida la sesión recordada del puesto de trabajo y borra su token.
+
+        Args:
+            ruta (str): Archivo donde se guardó el token.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+        """
+    try:
+        with open(ruta) as archivo:
+            token = archivo.read().strip()
+        os.remove(ruta)
+    except OSError:
+        return
+    sesion = nueva_sesion(motor)
+    try:
+        sesion.query(SesionUsuario).filter_by(token_hash=_hash_token(token)).delete()
+        sesion.commit()
+    finally:
+        sesion.close()
@@ -0,0 +1,150 @@
+"""Acceso a la base de datos: el motor compartido por toda la aplicación y las sesiones por operación.
+
+Todo el código obtiene aquí el motor (obtener_motor) y las sesiones ORM (nueva_sesion o sesion_bd), en
+lugar de crear los suyos. El motor se crea la primera vez que se pide, con un grupo de conexiones de
+tamaño fijo que comparten el hilo de la interfaz, el trabajador de base de datos y los hilos de la API;
+cada conexión nueva se configura en modo WAL y espera a que se libere el bloqueo en lugar de fallar.
+
+Las sesiones son de corta duración: se abren para una operación y se cierran al terminarla, de modo que
+el mapa de identidad no crece a lo largo de la jornada y ninguna sesión se comparte entre hilos.
+
+La ubicación de la base de datos se puede cambiar con la variable de entorno COACHBODYMETRICS_BD (una
+URL de SQLAlchemy); por defecto es clientes.db en el directorio de trabajo.
+"""
+
+import contextlib
+import os
+import threading
+
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, crear_indices
+
+
+'''Configuración del motor y de su grupo de conexiones.'''
+
+URL_BD = os.environ.get('COACHBODYMETRICS_BD', 'sqlite:///clientes.db')
+TAMANO_POOL = 5
+EXCESO_POOL = 10
+ESPERA_POOL = 30
+ESPERA_BLOQUEO = 30
+
+Session = sessionmaker()
+
+_motor = None
+_cerrojo_motor = threading.Lock()
+
+
+def _configurar_conexion_sqlite(conexion_dbapi, registro_conexion):
+    cursor = conexion_dbapi.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def crear_motor(url=URL_BD, tamano_pool=TAMANO_POOL, exceso_pool=EXCESO_POOL):
+
+    """Crea un motor configurado como el de la aplicación, sin crear el esquema.
+
+        Para SQLite en archivo usa un QueuePool de tamano_pool conexiones (más exceso_pool temporales)
+        que se pueden usar desde cualquier hilo, y configura cada conexión nueva en modo WAL.
+
+        Args:
+            url (str): URL de SQLAlchemy de la base de datos.
+            tamano_pool (int): Conexiones que el grupo mantiene abiertas.
+            exceso_pool (int): Conexiones adicionales permitidas en los picos.
+
+        Returns:
+            sqlalchemy.engine.Engine: El motor nuevo.
+        """
+    opciones = {}
+    url = make_url(url)
+    es_sqlite = url.get_backend_name() == 'sqlite'
+    en_memoria = es_sqlite and url.database in (None, '', ':memory:')
+    if es_sqlite:
+        opciones['connect_args'] = {'timeout': ESPERA_BLOQUEO}
+    if not en_memoria:
+        opciones.update(pool_size=tamano_pool, max_overflow=exceso_pool, pool_timeout=ESPERA_POOL)
+    motor = create_engine(url, **opciones)
+    if es_sqlite and not en_memoria:
+        event.listen(motor, 'connect', _configurar_conexion_sqlite)
+    return motor
+
+
+def obtener_motor():
+
+    """Devuelve el motor compartido, creándolo la primera vez junto con las tablas e índices que falten.
+
+        Si la base de datos ya tenía mediciones pero no sus estadísticas (es anterior a ellas), las
+        reconstruye (ver estadisticas.completar_agregados). Es seguro llamarla desde varios hilos: solo el primero crea el motor y comprueba el esquema.
+
+        Returns:
+            sqlalchemy.engine.Engine: El motor compartido por toda la aplicación.
+        """
+    global _motor
+    if _motor is None:
+        with _cerrojo_motor:
+            if _motor is None:
+                from estadisticas import completar_agregados
+
+                motor = crear_motor()
+                Base.metadata.create_all(motor)
+                crear_indices(motor)
+                completar_agregados(motor)
+                _motor = motor
+    return _motor
+
+
+def cerrar_motor():
+
+    """Cierra todas las conexiones del motor compartido; la siguiente llamada a obtener_motor crea otro.
+
+        Se llama al cerrar la aplicación (o el servidor) para que SQLite termine el checkpoint del WAL y
+        no queden conexiones abiertas.
+        """
+    global _motor
+    with _cerrojo_motor:
+        motor, _motor = _motor, None
+    if motor is not None:
+        motor.dispose()
+
+
+def nueva_sesion(motor=None):
+
+    """Abre una sesión ORM de corta duración.
+
+        Args:
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            sqlalchemy.orm.Session: Sesión nueva; quien la abre debe cerrarla.
+        """
+    return Session(bind=motor if motor is not None else obtener_motor())
+
+
+@contextlib.contextmanager
+def sesion_bd(motor=None):
+
+    """Abre una sesión para una operación: confirma al salir, deshace si hay una excepción y siempre la cierra.
+
+        Args:
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Yields:
+            sqlalchemy.orm.Session: La sesión de la operación.
+        """
+    sesion = nueva_sesion(motor)
+    try:
+        yield sesion
+        sesion.commit()
+    except BaseException:
+        sesion.rollback()
+        raise
+    finally:
+        sesion.close()
+
+
+if __name__ == "__main__":
+    obtener_motor()
+    print("Base de datos creada.")
@@ -0,0 +1,310 @@
+"""Banco de pruebas de rendimiento de CoachBodyMetrics.
+
+Mide las fórmulas escalares de calculadora.py, el motor vectorizado, el guardado (uno a uno y en lote),
+la lectura del historial y la exportación sobre bases de datos sintéticas de distintos tamaños, y el
+tamaño y la velocidad de lectura de los dos modos de almacenamiento (ver almacenamiento.py). Los
+resultados se guardan en JSON y pueden compararse con una ejecución de referencia:
+
+    python benchmark.py --rapido --salida referencia.json
+    python benchmark.py --rapido --baseline referencia.json --tolerancia 0.25
+
+El programa termina con código 1 si alguna métrica empeora más que la tolerancia respecto a la referencia.
+Se ejecuta a mano y no en la integración continua: los tiempos solo son comparables entre ejecuciones en
+la misma máquina, así que la referencia se genera antes del cambio que se quiere medir.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+
+import almacenamiento
+import calculadora
+import exportador
+from calculadora_lote import calcular_lote
+from models import Base, Cliente, crear_indices
+
+
+TAMANOS = (10_000, 100_000, 1_000_000)
+TAMANOS_RAPIDOS = (10_000,)
+
+'''Argumentos de ejemplo para medir cada fórmula escalar.'''
+
+FORMULAS_ESCALARES = {
+    'calcular_tmb': (80.0, 180.0, 30, 'h'),
+    'calcular_imc': (80.0, 180.0),
+    'calcular_porcentaje_grasa': (85.0, 0.0, 40.0, 180.0, 'h'),
+    'calcular_agua_total': (80.0, 180.0, 30, 'h'),
+    'calcular_peso_saludable': (180.0,),
+    'calcular_sobrepeso': (80.0, 180.0),
+    'calcular_masa_muscular': (80.0, 18.0),
+    'calcular_ffmi': (65.0, 180.0),
+    'calcular_rcc': (70.0, 95.0),
+    'calcular_ratio_cintura_altura': (85.0, 180.0),
+    'calcular_calorias_diarias': (1800.0, 'perder'),
+    'calcular_macronutrientes': (2200.0, 'ganar'),
+    'interpretar_ffmi': (21.0, 'h'),
+    'interpretar_imc': (26.0, 20.0, 'm'),
+    'analizar': ('Cliente', 80.0, 180.0, 30, 'h', 85.0, 0.0, 40.0, 'mantener'),
+}
+
+
+def columnas_sinteticas(filas, semilla=80):
+
+    """Genera entradas aleatorias plausibles para un lote de clientes.
+
+        Args:
+            filas (int): Número de filas.
+            semilla (int): Semilla del generador, para que las bases de datos sean reproducibles.
+
+        Returns:
+            dict: Columnas de entrada para calcular_lote, más 'nombre' y 'fecha'.
+        """
+    rng = np.random.default_rng(semilla)
+    genero = rng.choice(np.array(['h', 'm']), size=filas)
+    inicio = np.datetime64('2020-01-01T08:00')
+    return {
+        'nombre': np.char.add('Cliente ', rng.integers(0, max(filas // 20, 1), filas).astype(str)),
+        'fecha': inicio + np.sort(rng.integers(0, 5 * 365 * 24 * 60, filas)).astype('timedelta64[m]'),
+        'peso': rng.uniform(45, 130, filas).round(1),
+        'altura': rng.uniform(150, 200, filas).round(1),
+        'edad': rng.integers(18, 80, filas),
+        'genero': genero,
+        'cintura': rng.uniform(70, 120, filas).round(1),
+        'cadera': np.where(genero == 'm', rng.uniform(85, 130, filas).round(1), 0.0),
+        'cuello': rng.uniform(30, 45, filas).round(1),
+        'objetivo': rng.choice(np.array(['mantener', 'perder', 'ganar']), size=filas),
+    }
+
+
+def filas_sinteticas(columnas):
+
+    """Convierte columnas sintéticas en diccionarios listos para insertar en la tabla clientes."""
+    datos = {**columnas, **calcular_lote(columnas)}
+    listas = {c: datos[c].tolist() for c in calculadora.CAMPOS_CLIENTE if c != 'fecha'}
+    listas['fecha'] = columnas['fecha'].astype('datetime64[us]').tolist()
+    return [dict(zip(listas, fila)) for fila in zip(*listas.values())]
+
+
+def generar_base_sintetica(ruta, filas, tamano_bloque=50_000):
+
+    """Crea (o reutiliza si ya existe con el mismo tamaño) una base de datos clientes.db sintética.
+
+        Args:
+            ruta (str): Archivo SQLite de destino.
+            filas (int): Número de filas de la tabla clientes.
+            tamano_bloque (int): Filas generadas e insertadas en cada bloque.
+
+        Returns:
+            sqlalchemy.engine.Engine: Motor conectado a la base de datos generada.
+        """
+    motor = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(motor)
+    crear_indices(motor)
+    with motor.connect() as conexion:
+        existentes = conexion.execute(select(func.count()).select_from(Cliente.__table__)).scalar()
+    if existentes == filas:
+        return motor
+    if existentes:
+        raise RuntimeError(f"{ruta} ya tiene {existentes} filas; bórrela para generar {filas}")
+
+    with motor.connect() as conexion:
+        calculadora.configurar_sqlite_rendimiento(conexion)
+        for inicio in range(0, filas, tamano_bloque):
+            n = min(tamano_bloque, filas - inicio)
+            conexion.execute(Cliente.__table__.insert(), filas_sinteticas(columnas_sinteticas(n, semilla=inicio)))
+        conexion.commit()
+    return motor
+
+
+def cronometrar(funcion, repeticiones=3):
+
+    """Ejecuta la función varias veces y devuelve el mejor tiempo en segundos y el último resultado."""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def medir_formulas(resultados, llamadas=20_000):
+
+    """Mide el coste por llamada de cada fórmula escalar y del motor vectorizado."""
+    for nombre, argumentos in FORMULAS_ESCALARES.items():
+        funcion = getattr(calculadora, nombre)
+        segundos = min(timeit.repeat(lambda: funcion(*argumentos), number=llamadas, repeat=3))
+        resultados[f"escalar.{nombre}"] = {'valor': segundos / llamadas * 1e9, 'unidad': 'ns/llamada'}
+
+    columnas = columnas_sinteticas(100_000)
+    segundos, _ = cronometrar(lambda: calcular_lote(columnas))
+    resultados['lote.calcular_lote.100000'] = {'valor': segundos, 'unidad': 's'}
+
+
+def medir_guardado(resultados, directorio, filas=2_000):
+
+    """Mide el guardado fila a fila con guardar_datos y en bloque con guardar_lote."""
+    registros = filas_sinteticas(columnas_sinteticas(filas))
+
+    motor = create_engine(f"sqlite:///{os.path.join(directorio, 'guardado_uno_a_uno.db')}")
+    Base.metadata.create_all(motor)
+    muestra = registros[:max(filas // 10, 1)]
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for registro in muestra:
+            calculadora.guardar_datos(registro, motor=motor)
+    resultados['guardar_datos'] = {'valor': len(muestra) / (time.perf_counter() - inicio),
+                                   'unidad': 'filas/s', 'mayor_es_mejor': True}
+    motor.dispose()
+
+    motor = create_engine(f"sqlite:///{os.path.join(directorio, 'guardado_lote.db')}")
+    Base.metadata.create_all(motor)
+    inicio = time.perf_counter()
+    calculadora.guardar_lote(registros, motor=motor)
+    resultados['guardar_lote'] = {'valor': len(registros) / (time.perf_counter() - inicio),
+                                  'unidad': 'filas/s', 'mayor_es_mejor': True}
+    motor.dispose()
+
+
+def medir_historial(resultados, directorio, tamanos):
+
+    """Mide la lectura y exportación del historial sobre bases de datos sintéticas de cada tamaño."""
+    for filas in tamanos:
+        motor = generar_base_sintetica(os.path.join(directorio, f"clientes_{filas}.db"), filas)
+
+        segundos, _ = cronometrar(lambda: calculadora.recuperar_historial_pagina(limite=200, motor=motor))
+        resultados[f"historial.primera_pagina.{filas}"] = {'valor': segundos, 'unidad': 's'}
+
+        segundos, _ = cronometrar(lambda: calculadora.recuperar_historial_cliente('Cliente 7', motor=motor))
+        resultados[f"historial.cliente.{filas}"] = {'valor': segundos, 'unidad': 's'}
+
+        if filas <= 100_000:
+            segundos, _ = cronometrar(lambda: calculadora.recuperar_historial(motor=motor), repeticiones=1)
+            resultados[f"historial.completo.{filas}"] = {'valor': segundos, 'unidad': 's'}
+
+        ruta_csv = os.path.join(directorio, f"exportacion_{filas}.csv")
+        segundos, _ = cronometrar(lambda: exportador.exportar_historial(ruta_csv, motor=motor), repeticiones=1)
+        resultados[f"exportar.csv.{filas}"] = {'valor': segundos, 'unidad': 's'}
+        os.remove(ruta_csv)
+        motor.dispose()
+
+
+def medir_almacenamiento(resultados, directorio, tamanos):
+
+    """Compara el tamaño del archivo y la lectura completa del historial en los modos completo y compacto."""
+    for filas in (f for f in tamanos if f <= 100_000):
+        ruta = os.path.join(directorio, f"clientes_{filas}.db")
+        generar_base_sintetica(ruta, filas).dispose()
+        ruta_compacta = os.path.join(directorio, f"compacto_{filas}.db")
+        shutil.copyfile(ruta, ruta_compacta)
+        motor = create_engine(f"sqlite:///{ruta_compacta}")
+        almacenamiento.migrar(almacenamiento.MODO_COMPACTO, motor)
+        motor.dispose()
+
+        for modo, archivo in ((almacenamiento.MODO_COMPLETO, ruta), (almacenamiento.MODO_COMPACTO, ruta_compacta)):
+            resultados[f"almacenamiento.{modo}.mb.{filas}"] = {'valor': os.path.getsize(archivo) / 2 ** 20,
+                                                               'unidad': 'MB'}
+            motor = create_engine(f"sqlite:///{archivo}")
+            segundos, leidas = cronometrar(
+                lambda: sum(len(bloque) for bloque in exportador.iterar_historial(tamano_bloque=10_000, motor=motor)),
+                repeticiones=1)
+            resultados[f"almacenamiento.{modo}.lectura.{filas}"] = {'valor': leidas / segundos, 'unidad': 'filas/s',
+                                                                    'mayor_es_mejor': True}
+            motor.dispose()
+        os.remove(ruta_compacta)
+
+
+def comparar(actual, referencia, tolerancia):
+
+    """Compara dos ejecuciones y devuelve las métricas que han empeorado más que la tolerancia.
+
+        Args:
+            actual (dict): Métricas de esta ejecución.
+            referencia (dict): Métricas de la ejecución de referencia.
+            tolerancia (float): Empeoramiento relativo admitido (0.2 = 20 %).
+
+        Returns:
+            list: Tuplas (métrica, valor de referencia, valor actual, empeoramiento relativo).
+        """
+    regresiones = []
+    for nombre, medida in actual.items():
+        if nombre not in referencia:
+            continue
+        antes, ahora = referencia[nombre]['valor'], medida['valor']
+        if medida.get('mayor_es_mejor'):
+            empeoramiento = antes / ahora - 1 if ahora else float('inf')
+        else:
+            empeoramiento = ahora / antes - 1 if antes else 0.0
+        if empeoramiento > tolerancia:
+            regresiones.append((nombre, antes, ahora, empeoramiento))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de CoachBodyMetrics.")
+    parser.add_argument('--filas', type=int, nargs='+', default=list(TAMANOS),
+                        help="Tamaños de las bases de datos sintéticas")
+    parser.add_argument('--rapido', action='store_true', help="Solo la base de datos de 10.000 filas")
+    parser.add_argument('--directorio', help="Directorio donde guardar (y reutilizar) las bases de datos sintéticas")
+    parser.add_argument('--salida', default='benchmark_resultados.json', help="Archivo JSON de resultados")
+    parser.add_argument('--baseline', help="Archivo JSON de una ejecución de referencia con la que comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Empeoramiento relativo admitido")
+    args = parser.parse_args(argv)
+
+    tamanos = TAMANOS_RAPIDOS if args.rapido else tuple(args.filas)
+    temporal = None
+    directorio = args.directorio
+    if directorio is None:
+        temporal = tempfile.TemporaryDirectory()
+        directorio = temporal.name
+    os.makedirs(directorio, exist_ok=True)
+
+    metricas = {}
+    try:
+        medir_formulas(metricas)
+        medir_guardado(metricas, directorio)
+        medir_historial(metricas, directorio, tamanos)
+        medir_almacenamiento(metricas, directorio, tamanos)
+    finally:
+        if temporal is not None:
+            temporal.cleanup()
+
+    informe = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'metricas': metricas,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+
+    for nombre, medida in metricas.items():
+        print(f"{nombre:45s} {medida['valor']:14.6g} {medida['unidad']}")
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as archivo:
+            referencia = json.load(archivo)['metricas']
+        regresiones = comparar(metricas, referencia, args.tolerancia)
+        for nombre, antes, ahora, empeoramiento in regresiones:
+            print(f"REGRESIÓN {nombre}: {antes:.6g} -> {ahora:.6g} ({empeoramiento:+.0%})")
+        if regresiones:
+            return 1
+        print(f"Sin regresiones respecto a {args.baseline} (tolerancia {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
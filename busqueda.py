@@ -0,0 +1,88 @@
+"""Búsqueda de clientes por nombre para filtrar el historial en la base de datos.
+
+El texto se divide en palabras y cada una se busca como prefijo de cualquier palabra del nombre, sin
+distinguir mayúsculas ni tildes: 'gar ma' encuentra a 'María García'. La búsqueda se hace sobre el
+índice FTS5 busqueda_nombres (ver models.crear_busqueda), que solo tiene un registro por cliente, y el
+resultado filtra las mediciones por el índice (nombre, fecha); nunca se recorre el historial completo.
+
+Si SQLite no tiene FTS5, se busca cada palabra con LIKE en nombres_clientes, que sigue siendo una tabla
+pequeña, también como prefijo de cualquier palabra del nombre ('ma%' o '% ma%').
+"""
+
+import re
+import threading
+import weakref
+
+from sqlalchemy import and_, inspect, literal_column, or_, select, table
+
+from models import NombreCliente
+
+
+_busqueda_nombres = table('busqueda_nombres', literal_column('rowid'))
+
+_con_fts = weakref.WeakKeyDictionary()
+_cerrojo_fts = threading.Lock()
+
+
+def palabras_busqueda(texto):
+
+    """Devuelve las palabras de un texto de búsqueda, sin signos de puntuación."""
+    return re.findall(r'\w+', texto or '')
+
+
+def expresion_fts(texto):
+
+    """Convierte un texto de búsqueda en una consulta FTS5 en la que cada palabra es un prefijo.
+
+        Args:
+            texto (str): Texto escrito por el usuario, por ejemplo 'gar ma'.
+
+        Returns:
+            str: La consulta ('"gar"* "ma"*'), o None si el texto no tiene ninguna palabra.
+        """
+    # Las comillas evitan que palabras como AND, OR o NEAR se interpreten como operadores
+    return ' '.join(f'"{palabra}"*' for palabra in palabras_busqueda(texto)) or None
+
+
+def escapar_like(palabra):
+
+    """Escapa los comodines de LIKE (%, _ y la barra invertida) de una palabra de búsqueda."""
+    return re.sub(r'([\\%_])', r'\\\1', palabra)
+
+
+def tiene_fts(motor):
+
+    """Indica si la base de datos tiene el índice FTS5 busqueda_nombres; se comprueba una vez por motor."""
+    with _cerrojo_fts:
+        resultado = _con_fts.get(motor)
+    if resultado is None:
+        resultado = inspect(motor).has_table('busqueda_nombres')
+        with _cerrojo_fts:
+            _con_fts[motor] = resultado
+    return resultado
+
+
+def nombres_coincidentes(texto, motor):
+
+    """Devuelve una subconsulta con los nombres de cliente que coinciden con el texto de búsqueda.
+
+        Args:
+            texto (str): Texto de búsqueda.
+            motor (sqlalchemy.engine.Engine): Motor de la base de datos que se va a consultar.
+
+        Returns:
+            sqlalchemy.sql.Select: SELECT de una columna (nombre), o None si el texto no tiene palabras.
+        """
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        return None
+    nombres = NombreCliente.__table__
+    if tiene_fts(motor):
+        coincidencias = select(_busqueda_nombres.c.rowid).where(literal_column('busqueda_nombres').match(expresion))
+        return select(nombres.c.nombre).where(literal_column('nombres_clientes.rowid').in_(coincidencias))
+    condiciones = []
+    for palabra in palabras_busqueda(texto):
+        patron = escapar_like(palabra)
+        condiciones.append(or_(nombres.c.nombre.like(f"{patron}%", escape='\\'),
+                               nombres.c.nombre.like(f"% {patron}%", escape='\\')))
+    return select(nombres.c.nombre).where(and_(*condiciones))
@@ -1,16 +1,15 @@
 from datetime import datetime
 import math
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Cliente, Base
-
-
-'''Configuración de la base de datos'''
-
-engine = create_engine('sqlite:///clientes.db')
-Base.metadata.bind = engine
-DBSession = sessionmaker(bind=engine)
-session = DBSession()
+from sqlalchemy import func, select, tuple_
+from interpretacion import (
+    ESCALA_FFMI, ESCALA_IMC, ESCALA_PORCENTAJE_GRASA, ESCALA_RATIO_CINTURA_ALTURA, ESCALA_RCC, ESCALA_SALUD,
+    codigo_imc
+)
+from almacenamiento import MODO_COMPACTO, columnas_lectura, insertar, leer_modo, modo_almacenamiento
+from base_datos import nueva_sesion, obtener_motor
+from busqueda import nombres_coincidentes
+from instrumentacion import instrumentar
+from models import Cliente
 
 
 def calcular_tmb(peso, altura, edad, genero):
@@ -59,12 +58,7 @@ def interpretar_imc(imc, ffmi, genero):
         Returns:
             str: Interpretación del IMC basada en los valores de FFMI y género.
         """
-    if imc > 25 and ffmi > 19 if genero == 'm' else ffmi > 16:
-        return "El IMC es alto, pero puede estar influenciado por una alta masa muscular."
-    elif imc < 18.5:
-        return "El IMC es bajo, se recomienda consultar con un profesional de salud."
-    else:
-        return "El IMC está dentro del rango normal."
+    return ESCALA_IMC.etiqueta(codigo_imc(imc, ffmi, genero))
 
 def calcular_porcentaje_grasa(cintura, cadera, cuello, altura, genero):
 
@@ -100,20 +94,7 @@ def interpretar_porcentaje_grasa(porcentaje_grasa, genero):
         Returns:
             str: Una cadena de texto que describe el estado del porcentaje de grasa corporal en términos de salud.
         """
-    if genero == 'h':
-        if porcentaje_grasa > 25:
-            return "Alto"
-        elif porcentaje_grasa < 6:
-            return "Bajo"
-        else:
-            return "Normal"
-    else:
-        if porcentaje_grasa > 32:
-            return "Alto"
-        elif porcentaje_grasa < 16:
-            return "Bajo"
-        else:
-            return "Normal"
+    return ESCALA_PORCENTAJE_GRASA.interpretar(porcentaje_grasa, genero)
 
 def calcular_agua_total(peso, altura, edad, genero):
 
@@ -238,48 +219,7 @@ def interpretar_ffmi(ffmi, genero):
         Returns:
             str: Descripción del nivel de forma física basado en el FFMI.
         """
-    if genero == 'h':
-        if ffmi < 18:
-            return "Lejos del máximo potencial (pobre forma física)"
-        elif 18 <= ffmi < 19:
-            return "Cercano a la normalidad"
-        elif 19 <= ffmi < 20:
-            return "Normal"
-        elif 20 <= ffmi < 21:
-            return "Superior a la normalidad (buena forma física)"
-        elif 21 <= ffmi < 22.5:
-            return "Fuerte (Muy buena forma física)"
-        elif 22.5 <= ffmi < 24:
-            return "Muy fuerte (Excelente forma física). Cerca del máximo potencial."
-        elif 24 <= ffmi < 25.5:
-            return "Muy cerca del máximo potencial."
-        elif 25.5 <= ffmi < 27:
-            return "Potencial máximo natural alcanzado. Muy muy pocos llegan naturales"
-        elif 27 <= ffmi < 29:
-            return "Prácticamente imposible sin fármacos"
-        else:
-            return "Imposible sin fármacos"
-    else:
-        if ffmi < 13.5:
-            return "Lejos del máximo potencial (pobre forma física)"
-        elif 13.5 <= ffmi < 14.5:
-            return "Cercano a la normalidad"
-        elif 14.5 <= ffmi < 16:
-            return "Normal"
-        elif 16 <= ffmi < 17:
-            return "Superior a la normalidad (buena forma física)"
-        elif 17 <= ffmi < 18.5:
-            return "Fuerte (Muy buena forma física)"
-        elif 18.5 <= ffmi < 20:
-            return "Muy fuerte (Excelente forma física). Cerca del máximo potencial."
-        elif 20 <= ffmi < 21:
-            return "Muy cerca del máximo potencial."
-        elif 21 <= ffmi < 22:
-            return "Potencial máximo natural alcanzado. Muy muy pocos llegan naturales"
-        elif 22 <= ffmi < 23:
-            return "Prácticamente imposible sin fármacos"
-        else:
-            return "Imposible sin fármacos"
+    return ESCALA_FFMI.interpretar(ffmi, genero)
 
 def calcular_rcc(cintura, cadera):
 
@@ -323,20 +263,7 @@ def interpretar_rcc(rcc, genero):
         Returns:
             str: Interpretación del nivel de riesgo asociado con la RCC.
         """
-    if genero == 'h':
-        if rcc > 0.95:
-            return "Alto riesgo"
-        elif 0.90 < rcc <= 0.95:
-            return "Moderado riesgo"
-        else:
-            return "Bajo riesgo"
-    else:
-        if rcc > 0.85:
-            return "Alto riesgo"
-        elif 0.80 < rcc <= 0.85:
-            return "Moderado riesgo"
-        else:
-            return "Bajo riesgo"
+    return ESCALA_RCC.interpretar(rcc, genero)
 
 def calcular_ratio_cintura_altura(cintura, altura):
 
@@ -362,12 +289,7 @@ def interpretar_ratio_cintura_altura(ratio):
         Returns:
             str: Interpretación del nivel de riesgo metabólico basado en el ratio.
         """
-    if ratio >= 0.6:
-        return "Alto riesgo"
-    elif 0.5 <= ratio < 0.6:
-        return "Moderado riesgo"
-    else:
-        return "Bajo riesgo"
+    return ESCALA_RATIO_CINTURA_ALTURA.interpretar(ratio)
 
 def calcular_calorias_diarias(tmb, objetivo):
 
@@ -415,64 +337,568 @@ def calcular_macronutrientes(calorias, objetivo):
         grasas = (calorias * 0.20) / 9
     return float(proteinas), float(carbohidratos), float(grasas)
 
+def interpretar_salud(porcentaje_grasa, genero):
+
+    """Genera el mensaje de salud que acompaña al análisis según el porcentaje de grasa corporal.
+
+        Args:
+            porcentaje_grasa (float): El porcentaje de grasa corporal calculado.
+            genero (str): Género del usuario ('h' para hombre, 'm' para mujer).
+
+        Returns:
+            str: Recomendación de salud para mostrar al usuario.
+        """
+    return ESCALA_SALUD.interpretar(porcentaje_grasa, genero)
+
+
+OBJETIVOS = ('mantener', 'perder', 'ganar')
+
+'''Columnas de la tabla clientes que se rellenan a partir de un análisis.'''
+
+CAMPOS_CLIENTE = (
+    'nombre', 'fecha', 'peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello',
+    'tmb', 'porcentaje_grasa', 'peso_grasa', 'masa_muscular', 'agua_total', 'ffmi',
+    'peso_min', 'peso_max', 'sobrepeso', 'rcc', 'ratio_cintura_altura',
+    'calorias_diarias', 'proteinas', 'carbohidratos', 'grasas',
+)
+
+
+class ResultadoAnalisis:
 
-def guardar_datos(cliente_data):
+    """
+        Resultado inmutable de un análisis completo de composición corporal.
+
+        Guarda en un único registro compacto (con __slots__) las entradas, las métricas calculadas
+        y sus interpretaciones, de modo que la interfaz las muestre y la base de datos las persista
+        sin volver a calcularlas.
+
+        Atributos:
+            Las entradas (nombre, fecha, peso, altura, edad, genero, cintura, cadera, cuello, objetivo),
+            las métricas de CAMPOS_CLIENTE más el imc, y los textos de interpretación
+            (interpretacion_imc, interpretacion_porcentaje_grasa, interpretacion_ffmi,
+            interpretacion_rcc, interpretacion_ratio_cintura_altura, mensaje_salud).
+        """
+    __slots__ = CAMPOS_CLIENTE + (
+        'objetivo', 'imc', 'interpretacion_imc', 'interpretacion_porcentaje_grasa', 'interpretacion_ffmi',
+        'interpretacion_rcc', 'interpretacion_ratio_cintura_altura', 'mensaje_salud',
+    )
+
+    def __init__(self, **valores):
+        for campo in self.__slots__:
+            object.__setattr__(self, campo, valores[campo])
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError(f"{type(self).__name__} es inmutable")
+
+    def __delattr__(self, nombre):
+        raise AttributeError(f"{type(self).__name__} es inmutable")
+
+    def __eq__(self, otro):
+        if not isinstance(otro, ResultadoAnalisis):
+            return NotImplemented
+        return all(getattr(self, c) == getattr(otro, c) for c in self.__slots__)
+
+    def __repr__(self):
+        return f"ResultadoAnalisis(nombre={self.nombre!r}, fecha={self.fecha!r})"
+
+    def entradas(self):
+
+        """Devuelve los argumentos con los que se llamó a analizar (sin la fecha), para saber si sigue vigente."""
+        return {campo: getattr(self, campo) for campo in (
+            'nombre', 'peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello', 'objetivo')}
+
+    def con_fecha(self, fecha):
+
+        """Devuelve una copia del análisis con otra fecha (por ejemplo, la del momento de guardarlo)."""
+        return ResultadoAnalisis(**{**self.a_diccionario(), 'fecha': fecha})
+
+    def datos_cliente(self):
+
+        """Devuelve un diccionario con las columnas de Cliente, listo para guardar_datos."""
+        return {campo: getattr(self, campo) for campo in CAMPOS_CLIENTE}
+
+    def datos_guardado(self):
+
+        """Devuelve las columnas de Cliente más el objetivo, que el almacenamiento compacto guarda tal cual."""
+        return {**self.datos_cliente(), 'objetivo': self.objetivo}
+
+    def a_diccionario(self):
+
+        """Devuelve un diccionario con todos los campos: entradas, métricas e interpretaciones."""
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def __reduce__(self):
+        # El pickle por defecto asignaría los atributos uno a uno, y la clase es inmutable
+        return (_reconstruir_resultado, (self.a_diccionario(),))
+
+
+def _reconstruir_resultado(valores):
+    return ResultadoAnalisis(**valores)
+
+
+def analizar(nombre, peso, altura, edad, genero, cintura, cadera, cuello, objetivo, fecha=None):
+
+    """Calcula en una sola pasada todas las métricas e interpretaciones de un cliente.
+
+        Los valores se redondean a dos decimales en el mismo orden en que se muestran en la interfaz,
+        para que lo que ve el usuario sea exactamente lo que se guarda.
+
+        Args:
+            nombre (str): Nombre del cliente.
+            peso (float): Peso en kilogramos.
+            altura (float): Altura en centímetros.
+            edad (int): Edad en años.
+            genero (str): Género ('h' para hombre, 'm' para mujer).
+            cintura (float): Medida de la cintura en centímetros.
+            cadera (float): Medida de la cadera en centímetros (se ignora en hombres).
+            cuello (float): Medida del cuello en centímetros.
+            objetivo (str): Objetivo nutricional ('mantener', 'perder', 'ganar').
+            fecha (datetime, opcional): Fecha del análisis; por defecto, el momento actual.
+
+        Returns:
+            ResultadoAnalisis: El registro con todas las métricas del cliente.
+
+        Raises:
+            ValueError: Si el objetivo no es uno de OBJETIVOS.
+        """
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo no válido: {objetivo!r}")
+    if genero != 'm':
+        cadera = 0.0
+
+    tmb = round(calcular_tmb(peso, altura, edad, genero), 2)
+    imc = round(calcular_imc(peso, altura), 2)
+    porcentaje_grasa = round(calcular_porcentaje_grasa(cintura, cadera, cuello, altura, genero), 2)
+    peso_grasa = round((porcentaje_grasa / 100) * peso, 2)
+    masa_muscular = round(calcular_masa_muscular(peso, porcentaje_grasa), 2)
+    ffmi = round(calcular_ffmi(masa_muscular, altura), 2)
+    agua_total = round(calcular_agua_total(peso, altura, edad, genero), 2)
+    peso_min, peso_max = calcular_peso_saludable(altura)
+    peso_min, peso_max = round(peso_min, 2), round(peso_max, 2)
+    sobrepeso = round(max(0, peso - peso_max), 2)
+    rcc = round(calcular_rcc(cintura, cadera), 2)
+    ratio_cintura_altura = round(calcular_ratio_cintura_altura(cintura, altura), 2)
+    calorias_diarias = round(calcular_calorias_diarias(tmb, objetivo), 2)
+    proteinas, carbohidratos, grasas = calcular_macronutrientes(calorias_diarias, objetivo)
+
+    return ResultadoAnalisis(
+        nombre=nombre,
+        fecha=fecha or datetime.now(),
+        peso=peso,
+        altura=altura,
+        edad=edad,
+        genero=genero,
+        cintura=cintura,
+        cadera=cadera,
+        cuello=cuello,
+        objetivo=objetivo,
+        tmb=tmb,
+        imc=imc,
+        porcentaje_grasa=porcentaje_grasa,
+        peso_grasa=peso_grasa,
+        masa_muscular=masa_muscular,
+        agua_total=agua_total,
+        ffmi=ffmi,
+        peso_min=peso_min,
+        peso_max=peso_max,
+        sobrepeso=sobrepeso,
+        rcc=rcc,
+        ratio_cintura_altura=ratio_cintura_altura,
+        calorias_diarias=calorias_diarias,
+        proteinas=round(proteinas, 2),
+        carbohidratos=round(carbohidratos, 2),
+        grasas=round(grasas, 2),
+        interpretacion_imc=interpretar_imc(imc, ffmi, genero),
+        interpretacion_porcentaje_grasa=interpretar_porcentaje_grasa(porcentaje_grasa, genero),
+        interpretacion_ffmi=interpretar_ffmi(ffmi, genero),
+        interpretacion_rcc=interpretar_rcc(rcc, genero) if rcc != 0.0 else "N/A",
+        interpretacion_ratio_cintura_altura=interpretar_ratio_cintura_altura(ratio_cintura_altura),
+        mensaje_salud=interpretar_salud(porcentaje_grasa, genero),
+    )
+
+
+@instrumentar('guardar_datos', filas=int)
+def guardar_datos(cliente_data, motor=None):
     """
         Guarda los datos del cliente en la base de datos. Asegura que todos los campos necesarios estén presentes y sean válidos.
 
         Args:
-            cliente_data (dict): Un diccionario con todos los datos del cliente, incluyendo nombre, medidas corporales, y resultados de cálculos.
+            cliente_data (dict | ResultadoAnalisis): Un diccionario con todos los datos del cliente, incluyendo nombre, medidas corporales, y resultados de cálculos,
+                o directamente el resultado devuelto por analizar.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
 
         Returns:
             bool: True si los datos se guardaron correctamente, False si ocurrió un error.
         """
 
+    if isinstance(cliente_data, ResultadoAnalisis):
+        cliente_data = cliente_data.datos_guardado()
+    sesion = nueva_sesion(motor)
     try:
-        cliente = Cliente(
-            nombre=cliente_data['nombre'],
-            fecha=cliente_data['fecha'],
-            peso=cliente_data['peso'],
-            altura=cliente_data['altura'],
-            edad=cliente_data['edad'],
-            genero=cliente_data['genero'],
-            cintura=cliente_data['cintura'],
-            cadera=cliente_data['cadera'],
-            cuello=cliente_data['cuello'],
-            tmb=cliente_data['tmb'],
-            porcentaje_grasa=cliente_data['porcentaje_grasa'],
-            peso_grasa=cliente_data['peso_grasa'],
-            masa_muscular=cliente_data['masa_muscular'],
-            agua_total=cliente_data['agua_total'],
-            ffmi=cliente_data['ffmi'],
-            peso_min=cliente_data['peso_min'],
-            peso_max=cliente_data['peso_max'],
-            sobrepeso=cliente_data['sobrepeso'],
-            rcc=cliente_data['rcc'],
-            ratio_cintura_altura=cliente_data['ratio_cintura_altura'],
-            calorias_diarias=cliente_data['calorias_diarias'],
-            proteinas=cliente_data['proteinas'],
-            carbohidratos=cliente_data['carbohidratos'],
-            grasas=cliente_data['grasas']
-        )
-        session.add(cliente)
-        session.commit()
+        conexion = sesion.connection()
+        # El modo se lee en la transacción de la inserción: otro proceso puede haber migrado la base de datos
+        if leer_modo(conexion) == MODO_COMPACTO:
+            insertar(conexion, [cliente_data], MODO_COMPACTO)
+        else:
+            sesion.add(_cliente_orm(cliente_data))
+            sesion.flush()
+        # Las estadísticas agregadas se actualizan en la misma transacción que la inserción
+        from estadisticas import actualizar_estadisticas
+        actualizar_estadisticas(conexion, [cliente_data])
+        sesion.commit()
         print("Datos guardados exitosamente.")
         return True
     except Exception as e:
-        session.rollback()
+        sesion.rollback()
         print(f"Error al guardar datos: {e}")
         return False
+    finally:
+        sesion.close()
+
+
+def _cliente_orm(cliente_data):
+    return Cliente(
+        nombre=cliente_data['nombre'],
+        fecha=cliente_data['fecha'],
+        peso=cliente_data['peso'],
+        altura=cliente_data['altura'],
+        edad=cliente_data['edad'],
+        genero=cliente_data['genero'],
+        cintura=cliente_data['cintura'],
+        cadera=cliente_data['cadera'],
+        cuello=cliente_data['cuello'],
+        tmb=cliente_data['tmb'],
+        porcentaje_grasa=cliente_data['porcentaje_grasa'],
+        peso_grasa=cliente_data['peso_grasa'],
+        masa_muscular=cliente_data['masa_muscular'],
+        agua_total=cliente_data['agua_total'],
+        ffmi=cliente_data['ffmi'],
+        peso_min=cliente_data['peso_min'],
+        peso_max=cliente_data['peso_max'],
+        sobrepeso=cliente_data['sobrepeso'],
+        rcc=cliente_data['rcc'],
+        ratio_cintura_altura=cliente_data['ratio_cintura_altura'],
+        calorias_diarias=cliente_data['calorias_diarias'],
+        proteinas=cliente_data['proteinas'],
+        carbohidratos=cliente_data['carbohidratos'],
+        grasas=cliente_data['grasas']
+    )
+
+
+'''Campos obligatorios (NOT NULL) de la tabla clientes y su conversión al guardar en lote.'''
+
+CAMPOS_OBLIGATORIOS = ('nombre', 'fecha', 'peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello')
+CAMPOS_ENTEROS = ('edad',)
+CAMPOS_TEXTO = ('nombre', 'genero')
+
+
+def configurar_sqlite_rendimiento(conexion):
+
+    """Ajusta una conexión SQLite para escrituras masivas: diario WAL y sincronización NORMAL.
+
+        En modo WAL, synchronous=NORMAL mantiene la base de datos consistente ante un corte y evita
+        un fsync por cada transacción. En otros motores no hace nada.
+
+        Args:
+            conexion (sqlalchemy.engine.Connection): Conexión abierta fuera de una transacción.
+        """
+    if conexion.dialect.name != 'sqlite':
+        return
+    conexion.exec_driver_sql("PRAGMA journal_mode=WAL")
+    conexion.exec_driver_sql("PRAGMA synchronous=NORMAL")
+    conexion.commit()
+
+
+def _preparar_fila(cliente_data):
+    if isinstance(cliente_data, ResultadoAnalisis):
+        cliente_data = cliente_data.datos_guardado()
+    fila = {}
+    for campo in CAMPOS_CLIENTE:
+        valor = cliente_data[campo]
+        if valor is None:
+            if campo in CAMPOS_OBLIGATORIOS:
+                raise ValueError(f"El campo '{campo}' es obligatorio")
+        elif campo == 'fecha':
+            if not isinstance(valor, datetime):
+                raise ValueError("El campo 'fecha' debe ser un datetime")
+        elif campo in CAMPOS_TEXTO:
+            valor = str(valor)
+        elif campo in CAMPOS_ENTEROS:
+            valor = int(valor)
+        else:
+            valor = float(valor)
+        fila[campo] = valor
+    if cliente_data.get('objetivo'):
+        fila['objetivo'] = str(cliente_data['objetivo'])
+    return fila
 
-def recuperar_historial():
+
+@instrumentar('guardar_lote', filas=lambda resultados: sum(guardado for guardado, _ in resultados))
+def guardar_lote(registros, tamano_lote=1000, motor=None):
+    """
+        Guarda muchos registros de clientes en una sola transacción usando inserciones masivas de SQLAlchemy Core.
+
+        Cada registro se valida antes de escribir; los que no son válidos se descartan sin afectar al resto.
+        Los válidos se insertan en bloques de tamano_lote filas dentro de la misma transacción, con la conexión
+        SQLite configurada en modo WAL (ver configurar_sqlite_rendimiento).
+
+        Args:
+            registros (iterable): Diccionarios con los mismos campos que guardar_datos, o ResultadoAnalisis.
+            tamano_lote (int): Número de filas por sentencia de inserción.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            list: Una tupla (exito, error) por registro, en el mismo orden; error es None si se guardó.
+        """
+    if tamano_lote < 1:
+        raise ValueError("tamano_lote debe ser mayor que cero")
+
+    resultados = []
+    filas = []
+    posiciones = []
+    for cliente_data in registros:
+        try:
+            filas.append(_preparar_fila(cliente_data))
+            posiciones.append(len(resultados))
+            resultados.append((True, None))
+        except KeyError as e:
+            resultados.append((False, f"Falta el campo {e}"))
+        except (TypeError, ValueError) as e:
+            resultados.append((False, str(e)))
+
+    if not filas:
+        return resultados
+
+    from estadisticas import actualizar_estadisticas
+
+    try:
+        with (motor or obtener_motor()).connect() as conexion:
+            configurar_sqlite_rendimiento(conexion)
+            modo = leer_modo(conexion)
+            for inicio in range(0, len(filas), tamano_lote):
+                insertar(conexion, filas[inicio:inicio + tamano_lote], modo)
+            actualizar_estadisticas(conexion, filas)
+            conexion.commit()
+    except Exception as e:
+        print(f"Error al guardar lote: {e}")
+        for posicion in posiciones:
+            resultados[posicion] = (False, str(e))
+    else:
+        print(f"Lote guardado: {len(filas)} de {len(resultados)} registros.")
+    return resultados
+
+
+def recuperar_historial(motor=None):
 
     """
             Recupera el historial completo de clientes de la base de datos.
 
+            Usa una sesión propia que se cierra al terminar, como guardar_datos, para poder llamarse desde
+            cualquier hilo.
+
+            Args:
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
             Returns:
-                list: Una lista de objetos Cliente, cada uno representando un registro histórico de un cliente.
+                list: Una lista de objetos Cliente, cada uno representando un registro histórico de un cliente
+                    (en el almacenamiento compacto, filas con las mismas columnas accesibles por nombre), o una
+                    lista vacía si la lectura falla (el error se muestra por consola).
             """
     try:
-        return session.query(Cliente).all()
+        return _leer_historial(motor)
     except Exception as e:
         print(f"Error al recuperar historial: {e}")
         return []
+
+
+# Separada de recuperar_historial para que la instrumentación cuente los errores antes de ocultarlos
+@instrumentar('recuperar_historial', filas=len)
+def _leer_historial(motor):
+    if modo_almacenamiento(motor) == MODO_COMPACTO:
+        tabla, columnas, completar = columnas_lectura(_COLUMNAS_CLIENTES, motor)
+        return completar(consultar(select(*columnas).order_by(tabla.c.id), motor))
+    with nueva_sesion(motor) as sesion:
+        return sesion.query(Cliente).all()
+
+
+def consultar(consulta, motor=None):
+
+    """Ejecuta una consulta de lectura con una conexión propia y devuelve todas sus filas.
+
+        Args:
+            consulta (sqlalchemy.sql.Select): Consulta a ejecutar.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            list: Las filas.
+
+        Raises:
+            sqlalchemy.exc.SQLAlchemyError: Si la consulta falla (base de datos bloqueada, tabla ausente...).
+                Los errores no se ocultan para que la ventana de historial o la API puedan informar de ellos.
+        """
+    with (motor or obtener_motor()).connect() as conexion:
+        return conexion.execute(consulta).all()
+
+
+_COLUMNAS_CLIENTES = tuple(Cliente.__table__.c.keys())
+
+'''Columnas que muestra la ventana de historial; id se incluye para la paginación por clave.'''
+
+COLUMNAS_HISTORIAL = (
+    'id', 'fecha', 'nombre', 'edad', 'altura', 'peso', 'porcentaje_grasa', 'peso_grasa', 'masa_muscular',
+    'ffmi', 'peso_min', 'peso_max', 'sobrepeso', 'rcc', 'ratio_cintura_altura', 'calorias_diarias',
+    'proteinas', 'carbohidratos', 'grasas',
+)
+
+'''Órdenes admitidos al paginar el historial y columnas de la clave de cada uno (además del id). Todos
+   siguen un índice (ix_*_fecha o ix_*_nombre_fecha), así que cualquier página cuesta lo mismo.'''
+
+ORDENES_HISTORIAL = {'fecha': ('fecha',), 'nombre': ('nombre', 'fecha')}
+
+
+def claves_orden(tabla, orden='fecha', descendente=False):
+
+    """Devuelve las expresiones ORDER BY de un orden de ORDENES_HISTORIAL sobre una tabla o subconsulta."""
+    if orden not in ORDENES_HISTORIAL:
+        raise ValueError(f"Orden no válido: {orden!r}")
+    claves = [tabla.c[columna] for columna in ORDENES_HISTORIAL[orden] + ('id',)]
+    return [clave.desc() for clave in claves] if descendente else claves
+
+
+def filtrar_pagina(consulta, tabla, despues_de=None, orden='fecha', descendente=False, busqueda=None,
+                   motor=None):
+
+    """Aplica a una consulta sobre el historial la búsqueda, el orden y la continuación tras un cursor.
+
+        Args:
+            consulta (sqlalchemy.sql.Select): Consulta sobre la tabla del historial.
+            tabla (sqlalchemy.Table): Tabla de las mediciones (clientes o mediciones).
+            despues_de (tuple, opcional): Cursor de la última fila ya leída (ver clave_pagina).
+            orden (str): Uno de ORDENES_HISTORIAL.
+            descendente (bool): Si el orden es de mayor a menor.
+            busqueda (str, opcional): Texto de búsqueda por nombre (ver busqueda.py).
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            sqlalchemy.sql.Select: La consulta ordenada y filtrada (sin límite).
+        """
+    claves = claves_orden(tabla, orden)
+    if despues_de is not None:
+        cursor, valores = tuple_(*claves), tuple_(*despues_de)
+        consulta = consulta.where(cursor < valores if descendente else cursor > valores)
+    nombres = nombres_coincidentes(busqueda, motor or obtener_motor())
+    if nombres is not None:
+        consulta = consulta.where(tabla.c.nombre.in_(nombres))
+    return consulta.order_by(*claves_orden(tabla, orden, descendente))
+
+
+def clave_pagina(fila, orden='fecha'):
+
+    """Devuelve el cursor (despues_de) para continuar el historial tras una fila leída con ese orden."""
+    return tuple(getattr(fila, columna) for columna in ORDENES_HISTORIAL[orden]) + (fila.id,)
+
+
+@instrumentar('recuperar_historial_pagina', filas=len)
+def recuperar_historial_pagina(despues_de=None, limite=200, motor=None, orden='fecha', descendente=False,
+                               busqueda=None):
+
+    """
+            Recupera una página del historial usando paginación por clave.
+
+            Solo se leen las columnas de COLUMNAS_HISTORIAL, sin crear objetos Cliente, y la consulta
+            continúa justo después de la última fila de la página anterior, por lo que su coste no depende
+            de cuántas páginas se hayan leído antes. El orden y la búsqueda se resuelven en SQL con índices.
+
+            Args:
+                despues_de (tuple, opcional): Cursor de la última fila ya leída, de clave_pagina ((fecha, id)
+                    con el orden por fecha); None para la primera página.
+                limite (int): Número máximo de filas de la página.
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+                orden (str): Uno de ORDENES_HISTORIAL; por defecto, por (fecha, id).
+                descendente (bool): Si el orden es de mayor a menor.
+                busqueda (str, opcional): Limita la página a los clientes cuyo nombre coincide (ver busqueda.py).
+
+            Returns:
+                list: Filas con las columnas de COLUMNAS_HISTORIAL accesibles por nombre (fila.nombre, fila.peso...).
+            """
+    tabla, columnas, completar = columnas_lectura(COLUMNAS_HISTORIAL, motor)
+    consulta = filtrar_pagina(select(*columnas), tabla, despues_de, orden, descendente, busqueda, motor)
+    return completar(consultar(consulta.limit(limite), motor))
+
+
+def recuperar_historial_cliente(nombre, motor=None):
+
+    """
+            Recupera todas las mediciones de un cliente ordenadas por fecha.
+
+            Usa el índice (nombre, fecha), por lo que el coste depende de las mediciones del cliente
+            y no del tamaño de la tabla.
+
+            Args:
+                nombre (str): Nombre del cliente.
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+            Returns:
+                list: Filas con todas las columnas de la tabla clientes, de la más antigua a la más reciente.
+            """
+    tabla, columnas, completar = columnas_lectura(_COLUMNAS_CLIENTES, motor)
+    consulta = select(*columnas).where(tabla.c.nombre == nombre).order_by(tabla.c.fecha, tabla.c.id)
+    return completar(consultar(consulta, motor))
+
+
+def recuperar_ultima_medicion(nombre, motor=None):
+
+    """
+            Recupera la medición más reciente de un cliente.
+
+            Args:
+                nombre (str): Nombre del cliente.
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+            Returns:
+                Row: La fila más reciente del cliente, o None si no tiene mediciones.
+            """
+    tabla, columnas, completar = columnas_lectura(_COLUMNAS_CLIENTES, motor)
+    consulta = (select(*columnas).where(tabla.c.nombre == nombre)
+                .order_by(tabla.c.fecha.desc(), tabla.c.id.desc()).limit(1))
+    filas = completar(consultar(consulta, motor))
+    return filas[0] if filas else None
+
+
+def recuperar_ultimas_mediciones(motor=None):
+
+    """
+            Recupera la medición más reciente de cada cliente.
+
+            Args:
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+            Returns:
+                list: Una fila por cliente con todas las columnas de la tabla clientes, ordenadas por nombre.
+            """
+    tabla, columnas, completar = columnas_lectura(_COLUMNAS_CLIENTES, motor)
+    orden = func.row_number().over(partition_by=tabla.c.nombre,
+                                   order_by=(tabla.c.fecha.desc(), tabla.c.id.desc())).label('orden')
+    numeradas = select(*columnas, orden).subquery()
+    consulta = (select(*(numeradas.c[c.name] for c in columnas))
+                .where(numeradas.c.orden == 1).order_by(numeradas.c.nombre))
+    return completar(consultar(consulta, motor))
+
+
+def recuperar_historial_rango(desde, hasta, motor=None):
+
+    """
+            Recupera las mediciones de todos los clientes entre dos fechas.
+
+            Args:
+                desde (datetime): Fecha mínima (incluida).
+                hasta (datetime): Fecha máxima (excluida).
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+            Returns:
+                list: Filas con todas las columnas de la tabla clientes, ordenadas por (fecha, id).
+            """
+    tabla, columnas, completar = columnas_lectura(_COLUMNAS_CLIENTES, motor)
+    consulta = (select(*columnas).where(tabla.c.fecha >= desde, tabla.c.fecha < hasta)
+                .order_by(tabla.c.fecha, tabla.c.id))
+    return completar(consultar(consulta, motor))
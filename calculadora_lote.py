@@ -0,0 +1,489 @@
+"""Versión vectorizada de las fórmulas de calculadora.py para procesar lotes de clientes.
+
+Cada función recibe arrays de NumPy (o cualquier secuencia convertible) y devuelve arrays con el
+mismo número de filas. Las ramas por género y objetivo se resuelven con máscaras en lugar de
+condicionales, de forma que un lote de cientos de miles de filas se calcula sin bucles de Python.
+Los resultados coinciden con las funciones escalares de calculadora.py.
+"""
+
+import numpy as np
+
+from interpretacion import (
+    ESCALA_FFMI, ESCALA_FFMI_MUSCULAR, ESCALA_IMC, ESCALA_PORCENTAJE_GRASA, ESCALA_RATIO_CINTURA_ALTURA,
+    ESCALA_RCC, ESCALA_SALUD, IMC_ALTO, IMC_NORMAL
+)
+
+
+'''Reparto de macronutrientes (proteínas, carbohidratos, grasas) por objetivo, igual que en
+calcular_macronutrientes.'''
+
+REPARTO_MACROS = {
+    'mantener': (0.30, 0.40, 0.30),
+    'perder': (0.40, 0.40, 0.20),
+    'ganar': (0.30, 0.50, 0.20),
+}
+
+COLUMNAS_ENTRADA = ('peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello', 'objetivo')
+
+COLUMNAS_RESULTADO = (
+    'tmb', 'imc', 'porcentaje_grasa', 'peso_grasa', 'masa_muscular', 'agua_total', 'ffmi',
+    'peso_min', 'peso_max', 'sobrepeso', 'rcc', 'ratio_cintura_altura', 'calorias_diarias',
+    'proteinas', 'carbohidratos', 'grasas',
+)
+
+
+def _numerico(valores):
+    return np.asarray(valores, dtype=np.float64)
+
+
+def _es_hombre(genero):
+    return np.asarray(genero) == 'h'
+
+
+def calcular_tmb_lote(peso, altura, edad, genero):
+
+    """Calcula la TMB (Harris-Benedict) para un lote de usuarios.
+
+        Args:
+            peso (array): Pesos en kilogramos.
+            altura (array): Alturas en centímetros.
+            edad (array): Edades en años.
+            genero (array): Géneros ('h' para hombre, 'm' para mujer).
+
+        Returns:
+            numpy.ndarray: TMB de cada fila.
+        """
+    peso, altura, edad = _numerico(peso), _numerico(altura), _numerico(edad)
+    hombre = 88.362 + (13.397 * peso) + (4.799 * altura) - (5.677 * edad)
+    mujer = 447.593 + (9.247 * peso) + (3.098 * altura) - (4.330 * edad)
+    return np.where(_es_hombre(genero), hombre, mujer)
+
+
+def calcular_imc_lote(peso, altura):
+
+    """Calcula el IMC para un lote de usuarios.
+
+        Args:
+            peso (array): Pesos en kilogramos.
+            altura (array): Alturas en centímetros.
+
+        Returns:
+            numpy.ndarray: IMC de cada fila.
+        """
+    altura_m = _numerico(altura) / 100
+    return _numerico(peso) / (altura_m ** 2)
+
+
+def calcular_porcentaje_grasa_lote(cintura, cadera, cuello, altura, genero):
+
+    """Calcula el porcentaje de grasa (fórmula de la Marina Estadounidense) para un lote de usuarios.
+
+        Se evalúan ambas fórmulas y se elige por máscara de género. Los avisos de NumPy por medidas
+        que no aplican (por ejemplo cadera = 0 en hombres) se silencian porque esa rama se descarta.
+
+        Args:
+            cintura (array): Cinturas en centímetros.
+            cadera (array): Caderas en centímetros.
+            cuello (array): Cuellos en centímetros.
+            altura (array): Alturas en centímetros.
+            genero (array): Géneros ('h' para hombre, 'm' para mujer).
+
+        Returns:
+            numpy.ndarray: Porcentaje de grasa de cada fila.
+        """
+    cintura, cadera = _numerico(cintura), _numerico(cadera)
+    cuello, log_altura = _numerico(cuello), np.log10(_numerico(altura))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hombre = 495 / (1.0324 - 0.19077 * np.log10(cintura - cuello) + 0.15456 * log_altura) - 450
+        mujer = 495 / (1.29579 - 0.35004 * np.log10(cintura + cadera - cuello) + 0.22100 * log_altura) - 450
+    return np.where(_es_hombre(genero), hombre, mujer)
+
+
+def calcular_agua_total_lote(peso, altura, edad, genero):
+
+    """Calcula el agua corporal total para un lote de usuarios.
+
+        Args:
+            peso (array): Pesos en kilogramos.
+            altura (array): Alturas en centímetros.
+            edad (array): Edades en años.
+            genero (array): Géneros ('h' para hombre, 'm' para mujer).
+
+        Returns:
+            numpy.ndarray: Agua total de cada fila.
+        """
+    peso, altura, edad = _numerico(peso), _numerico(altura), _numerico(edad)
+    hombre = 2.447 - (0.09156 * edad) + (0.1074 * altura) + (0.3362 * peso)
+    mujer = -2.097 + (0.1069 * altura) + (0.2466 * peso)
+    return np.where(_es_hombre(genero), hombre, mujer)
+
+
+def calcular_peso_saludable_lote(altura):
+
+    """Calcula el rango de peso saludable para un lote de alturas.
+
+        Args:
+            altura (array): Alturas en centímetros.
+
+        Returns:
+            tuple: Arrays de peso mínimo y peso máximo saludables.
+        """
+    altura_m2 = (_numerico(altura) / 100) ** 2
+    return 18.5 * altura_m2, 24.9 * altura_m2
+
+
+def calcular_sobrepeso_lote(peso, altura):
+
+    """Calcula el sobrepeso respecto al peso máximo saludable para un lote de usuarios.
+
+        Args:
+            peso (array): Pesos en kilogramos.
+            altura (array): Alturas en centímetros.
+
+        Returns:
+            numpy.ndarray: Sobrepeso de cada fila (0 si no lo hay).
+        """
+    _, peso_max = calcular_peso_saludable_lote(altura)
+    return np.maximum(0, _numerico(peso) - peso_max)
+
+
+def calcular_masa_muscular_lote(peso, porcentaje_grasa):
+
+    """Calcula la masa muscular (masa magra) para un lote de usuarios.
+
+        Args:
+            peso (array): Pesos en kilogramos.
+            porcentaje_grasa (array): Porcentajes de grasa corporal.
+
+        Returns:
+            numpy.ndarray: Masa muscular de cada fila en kilogramos.
+        """
+    return _numerico(peso) * ((100 - _numerico(porcentaje_grasa)) / 100)
+
+
+def calcular_ffmi_lote(masa_muscular, altura):
+
+    """Calcula el FFMI para un lote de usuarios.
+
+        Args:
+            masa_muscular (array): Masas musculares en kilogramos.
+            altura (array): Alturas en centímetros.
+
+        Returns:
+            numpy.ndarray: FFMI de cada fila.
+        """
+    altura_m = _numerico(altura) / 100
+    return _numerico(masa_muscular) / (altura_m ** 2)
+
+
+def calcular_rcc_lote(cintura, cadera):
+
+    """Calcula la relación cintura-cadera para un lote de usuarios, devolviendo 0 cuando la cadera es 0.
+
+        Args:
+            cintura (array): Cinturas en centímetros.
+            cadera (array): Caderas en centímetros.
+
+        Returns:
+            numpy.ndarray: Relación cintura-cadera de cada fila.
+        """
+    cintura, cadera = _numerico(cintura), _numerico(cadera)
+    rcc = np.zeros(np.broadcast(cintura, cadera).shape, dtype=np.float64)
+    np.divide(cintura, cadera, out=rcc, where=cadera != 0)
+    return rcc
+
+
+def calcular_ratio_cintura_altura_lote(cintura, altura):
+
+    """Calcula el ratio cintura-altura para un lote de usuarios.
+
+        Args:
+            cintura (array): Cinturas en centímetros.
+            altura (array): Alturas en centímetros.
+
+        Returns:
+            numpy.ndarray: Ratio cintura-altura de cada fila.
+        """
+    return _numerico(cintura) / _numerico(altura)
+
+
+def calcular_calorias_diarias_lote(tmb, objetivo):
+
+    """Calcula las calorías diarias para un lote según la TMB y el objetivo nutricional.
+
+        Args:
+            tmb (array): TMB de cada fila.
+            objetivo (array): Objetivos ('mantener', 'perder', 'ganar').
+
+        Returns:
+            numpy.ndarray: Calorías diarias de cada fila; NaN si el objetivo no es válido.
+        """
+    mantenimiento = _numerico(tmb) * 1.2
+    objetivo = np.asarray(objetivo)
+    return np.select(
+        [objetivo == 'mantener', objetivo == 'perder', objetivo == 'ganar'],
+        [mantenimiento, mantenimiento * 0.8, mantenimiento * 1.2],
+        default=np.nan,
+    )
+
+
+def calcular_macronutrientes_lote(calorias, objetivo):
+
+    """Calcula el reparto de macronutrientes para un lote según las calorías y el objetivo.
+
+        Args:
+            calorias (array): Calorías diarias de cada fila.
+            objetivo (array): Objetivos ('mantener', 'perder', 'ganar').
+
+        Returns:
+            tuple: Arrays de gramos de proteínas, carbohidratos y grasas; NaN si el objetivo no es válido.
+        """
+    calorias = _numerico(calorias)
+    objetivo = np.asarray(objetivo)
+    forma = np.broadcast(calorias, objetivo).shape
+    fracciones = np.full((3,) + forma, np.nan)
+    for nombre, reparto in REPARTO_MACROS.items():
+        mascara = np.broadcast_to(objetivo == nombre, forma)
+        for i, fraccion in enumerate(reparto):
+            fracciones[i][mascara] = fraccion
+    proteinas = (calorias * fracciones[0]) / 4
+    carbohidratos = (calorias * fracciones[1]) / 4
+    grasas = (calorias * fracciones[2]) / 9
+    return proteinas, carbohidratos, grasas
+
+
+def calcular_lote(columnas):
+
+    """Calcula todas las métricas de composición corporal para un lote de clientes.
+
+        Args:
+            columnas (dict): Columnas de entrada ('peso', 'altura', 'edad', 'genero', 'cintura', 'cadera',
+                'cuello' y 'objetivo'), cada una como array o secuencia de la misma longitud.
+
+        Returns:
+            dict: Un array por cada métrica de COLUMNAS_RESULTADO.
+        """
+    faltan = [c for c in COLUMNAS_ENTRADA if c not in columnas]
+    if faltan:
+        raise KeyError(f"Faltan columnas de entrada: {', '.join(faltan)}")
+
+    peso = _numerico(columnas['peso'])
+    altura = _numerico(columnas['altura'])
+    edad = _numerico(columnas['edad'])
+    genero = np.asarray(columnas['genero'])
+    cintura = _numerico(columnas['cintura'])
+    cadera = _numerico(columnas['cadera'])
+    cuello = _numerico(columnas['cuello'])
+    objetivo = np.asarray(columnas['objetivo'])
+
+    tmb = calcular_tmb_lote(peso, altura, edad, genero)
+    porcentaje_grasa = calcular_porcentaje_grasa_lote(cintura, cadera, cuello, altura, genero)
+    masa_muscular = calcular_masa_muscular_lote(peso, porcentaje_grasa)
+    peso_min, peso_max = calcular_peso_saludable_lote(altura)
+    calorias_diarias = calcular_calorias_diarias_lote(tmb, objetivo)
+    proteinas, carbohidratos, grasas = calcular_macronutrientes_lote(calorias_diarias, objetivo)
+
+    return {
+        'tmb': tmb,
+        'imc': calcular_imc_lote(peso, altura),
+        'porcentaje_grasa': porcentaje_grasa,
+        'peso_grasa': (porcentaje_grasa / 100) * peso,
+        'masa_muscular': masa_muscular,
+        'agua_total': calcular_agua_total_lote(peso, altura, edad, genero),
+        'ffmi': calcular_ffmi_lote(masa_muscular, altura),
+        'peso_min': peso_min,
+        'peso_max': peso_max,
+        'sobrepeso': np.maximum(0, peso - peso_max),
+        'rcc': calcular_rcc_lote(cintura, cadera),
+        'ratio_cintura_altura': calcular_ratio_cintura_altura_lote(cintura, altura),
+        'calorias_diarias': calorias_diarias,
+        'proteinas': proteinas,
+        'carbohidratos': carbohidratos,
+        'grasas': grasas,
+    }
+
+
+def redondear(valores, decimales=2):
+
+    """Redondea un array exactamente igual que round() de Python.
+
+        np.round multiplica por 10**decimales antes de redondear, y en los valores que quedan justo en
+        la mitad (como 1.005) puede dar un resultado distinto de round(). Esos pocos casos se repiten
+        con round() para que el lote coincida con calculadora.analizar.
+
+        Args:
+            valores (array): Valores a redondear.
+            decimales (int): Número de decimales.
+
+        Returns:
+            numpy.ndarray: Valores redondeados.
+        """
+    valores = _numerico(valores)
+    redondeados = np.round(valores, decimales)
+    escalados = valores * 10.0 ** decimales
+    with np.errstate(invalid='ignore'):
+        dudosos = np.flatnonzero(np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6)
+    for i in dudosos:
+        redondeados.flat[i] = round(float(valores.flat[i]), decimales)
+    return redondeados
+
+
+def codigos_lote(escala, valores, genero):
+
+    """Equivalente vectorizado de Escala.codigo: clasifica un array de valores con np.searchsorted.
+
+        Args:
+            escala (interpretacion.Escala): Tabla de umbrales a aplicar.
+            valores (array): Valores a clasificar.
+            genero (array | str): Género de cada fila, o uno común a todas.
+
+        Returns:
+            numpy.ndarray: Código de categoría de cada valor (enteros, índices de escala.etiquetas).
+        """
+    valores = _numerico(valores)
+    hombres = np.searchsorted(escala.limites['h'], valores, side='right')
+    if escala.limites['h'] == escala.limites['m']:
+        return hombres
+    mujeres = np.searchsorted(escala.limites['m'], valores, side='right')
+    return np.where(_es_hombre(genero), hombres, mujeres)
+
+
+def codigos_imc_lote(imc, ffmi, genero):
+
+    """Equivalente vectorizado de interpretacion.codigo_imc."""
+    codigos = codigos_lote(ESCALA_IMC, imc, genero)
+    musculado = codigos_lote(ESCALA_FFMI_MUSCULAR, ffmi, genero).astype(bool)
+    return np.where((codigos == IMC_ALTO) & ~musculado, IMC_NORMAL, codigos)
+
+
+def etiquetas_lote(escala, codigos):
+
+    """Traduce un array de códigos a sus textos; pensado para mostrarlos, no para clasificar."""
+    return np.asarray(escala.etiquetas, dtype=object)[np.asarray(codigos)]
+
+
+def clasificar_lote(metricas, genero):
+
+    """Clasifica las métricas de un lote con las escalas de interpretacion.py, sin generar textos.
+
+        Args:
+            metricas (dict): 'imc', 'porcentaje_grasa', 'ffmi', 'rcc' y 'ratio_cintura_altura' como arrays
+                (por ejemplo, el resultado de calcular_lote).
+            genero (array): Género de cada fila.
+
+        Returns:
+            dict: Array de códigos por interpretación ('imc', 'porcentaje_grasa', 'ffmi', 'rcc',
+                'ratio_cintura_altura', 'salud'); la etiqueta de cada uno está en la escala correspondiente.
+        """
+    return {
+        'imc': codigos_imc_lote(metricas['imc'], metricas['ffmi'], genero),
+        'porcentaje_grasa': codigos_lote(ESCALA_PORCENTAJE_GRASA, metricas['porcentaje_grasa'], genero),
+        'ffmi': codigos_lote(ESCALA_FFMI, metricas['ffmi'], genero),
+        'rcc': codigos_lote(ESCALA_RCC, metricas['rcc'], genero),
+        'ratio_cintura_altura': codigos_lote(ESCALA_RATIO_CINTURA_ALTURA, metricas['ratio_cintura_altura'], genero),
+        'salud': codigos_lote(ESCALA_SALUD, metricas['porcentaje_grasa'], genero),
+    }
+
+
+def metricas_lote(columnas):
+
+    """Calcula las métricas de un lote redondeadas exactamente como calculadora.analizar.
+
+        Es lo que se guarda en la tabla clientes para cada análisis; el almacenamiento compacto lo usa
+        para reconstruir esas columnas al leer (ver almacenamiento.py).
+
+        Args:
+            columnas (dict): Las columnas de COLUMNAS_ENTRADA, cada una como secuencia de la misma longitud.
+
+        Returns:
+            dict: Un array por métrica de COLUMNAS_RESULTADO.
+        """
+    genero = np.asarray(columnas['genero'])
+    objetivo = np.asarray(columnas['objetivo'])
+    peso, altura, edad = _numerico(columnas['peso']), _numerico(columnas['altura']), _numerico(columnas['edad'])
+    cintura, cuello = _numerico(columnas['cintura']), _numerico(columnas['cuello'])
+    cadera = np.where(genero == 'm', _numerico(columnas['cadera']), 0.0)
+
+    tmb = redondear(calcular_tmb_lote(peso, altura, edad, genero))
+    porcentaje_grasa = redondear(calcular_porcentaje_grasa_lote(cintura, cadera, cuello, altura, genero))
+    masa_muscular = redondear(calcular_masa_muscular_lote(peso, porcentaje_grasa))
+    peso_min, peso_max = calcular_peso_saludable_lote(altura)
+    peso_max = redondear(peso_max)
+    calorias_diarias = redondear(calcular_calorias_diarias_lote(tmb, objetivo))
+    proteinas, carbohidratos, grasas = calcular_macronutrientes_lote(calorias_diarias, objetivo)
+    return {
+        'tmb': tmb,
+        'imc': redondear(calcular_imc_lote(peso, altura)),
+        'porcentaje_grasa': porcentaje_grasa,
+        'peso_grasa': redondear((porcentaje_grasa / 100) * peso),
+        'masa_muscular': masa_muscular,
+        'agua_total': redondear(calcular_agua_total_lote(peso, altura, edad, genero)),
+        'ffmi': redondear(calcular_ffmi_lote(masa_muscular, altura)),
+        'peso_min': redondear(peso_min),
+        'peso_max': peso_max,
+        'sobrepeso': redondear(np.maximum(0, peso - peso_max)),
+        'rcc': redondear(calcular_rcc_lote(cintura, cadera)),
+        'ratio_cintura_altura': redondear(calcular_ratio_cintura_altura_lote(cintura, altura)),
+        'calorias_diarias': calorias_diarias,
+        'proteinas': redondear(proteinas),
+        'carbohidratos': redondear(carbohidratos),
+        'grasas': redondear(grasas),
+    }
+
+
+def analizar_lote(columnas):
+
+    """Equivalente vectorizado de calculadora.analizar para un lote de clientes ya validados.
+
+        Redondea los valores intermedios en el mismo orden que analizar, así que cada ResultadoAnalisis
+        es igual al que se obtendría llamando a analizar fila a fila. Tanto las métricas como las
+        categorías de interpretación (clasificar_lote) se calculan con NumPy; por fila solo se busca el texto.
+
+        Args:
+            columnas (dict): 'nombre', 'fecha' y las columnas de COLUMNAS_ENTRADA, cada una como secuencia
+                de la misma longitud. Los objetivos deben ser válidos (ver calculadora.OBJETIVOS).
+
+        Returns:
+            list: Un ResultadoAnalisis por fila, en el mismo orden, o None en las filas cuyas medidas no
+                permiten calcular todas las métricas (los casos en que analizar lanzaría ValueError, como
+                una cintura menor que el cuello).
+        """
+    from calculadora import ResultadoAnalisis
+
+    metricas = metricas_lote(columnas)
+    genero = np.asarray(columnas['genero'])
+    objetivo = np.asarray(columnas['objetivo'])
+    peso, altura = _numerico(columnas['peso']), _numerico(columnas['altura'])
+    cintura, cuello = _numerico(columnas['cintura']), _numerico(columnas['cuello'])
+    cadera = np.where(genero == 'm', _numerico(columnas['cadera']), 0.0)
+    entradas = {
+        'nombre': list(columnas['nombre']),
+        'fecha': list(columnas['fecha']),
+        'peso': peso.tolist(),
+        'altura': altura.tolist(),
+        'edad': [int(e) for e in columnas['edad']],
+        'genero': genero.tolist(),
+        'cintura': cintura.tolist(),
+        'cadera': cadera.tolist(),
+        'cuello': cuello.tolist(),
+        'objetivo': objetivo.tolist(),
+    }
+    codigos = clasificar_lote(metricas, genero)
+    interpretaciones = {
+        'interpretacion_imc': etiquetas_lote(ESCALA_IMC, codigos['imc']),
+        'interpretacion_porcentaje_grasa': etiquetas_lote(ESCALA_PORCENTAJE_GRASA, codigos['porcentaje_grasa']),
+        'interpretacion_ffmi': etiquetas_lote(ESCALA_FFMI, codigos['ffmi']),
+        'interpretacion_rcc': np.where(metricas['rcc'] != 0.0, etiquetas_lote(ESCALA_RCC, codigos['rcc']), "N/A"),
+        'interpretacion_ratio_cintura_altura': etiquetas_lote(ESCALA_RATIO_CINTURA_ALTURA,
+                                                              codigos['ratio_cintura_altura']),
+        'mensaje_salud': etiquetas_lote(ESCALA_SALUD, codigos['salud']),
+    }
+    filas = {**entradas, **{campo: valores.tolist() for campo, valores in metricas.items()},
+             **{campo: textos.tolist() for campo, textos in interpretaciones.items()}}
+    with np.errstate(invalid='ignore'):
+        validas = np.logical_and.reduce([np.isfinite(valores) for valores in metricas.values()]).tolist()
+
+    resultados = []
+    for valida, valores in zip(validas, (dict(zip(filas, fila)) for fila in zip(*filas.values()))):
+        resultados.append(ResultadoAnalisis(**valores) if valida else None)
+    return resultados
@@ -0,0 +1,164 @@
+"""Análisis por lotes sin interfaz gráfica, para tareas programadas (cron) y servidores.
+
+Lee mediciones en CSV o JSON Lines de uno o varios archivos, o de la entrada estándar, las analiza por
+bloques con calculadora.analizar (el mismo cálculo que el botón Calcular) y escribe entradas, métricas e
+interpretaciones en CSV o JSON Lines. Con --guardar, además, guarda cada bloque en clientes.db con una
+inserción masiva. Este módulo no importa tkinter.
+
+    python cli.py mediciones.csv -o resultados.jsonl
+    cat mediciones.jsonl | python cli.py --formato-entrada jsonl --guardar > resultados.csv
+
+Termina con código 1 si algún registro se ha rechazado por no ser válido.
+"""
+
+import argparse
+import contextlib
+import csv
+import functools
+import io
+import json
+import multiprocessing
+import sys
+from itertools import chain
+
+from calculadora import ResultadoAnalisis, guardar_lote
+from importador import (
+    abrir_rechazos, analizar_bloque, escribir_rechazos, formato_por_extension, iterar_registros, leer_registros,
+    procesar_por_bloques
+)
+
+
+'''Columnas de la salida: entradas, métricas (las de la tabla clientes más el imc) e interpretaciones.'''
+
+COLUMNAS_SALIDA = ResultadoAnalisis.__slots__
+
+FORMATOS = ('csv', 'jsonl')
+
+
+def _fila(resultado):
+    valores = resultado.a_diccionario()
+    valores['fecha'] = valores['fecha'].isoformat(sep=' ')
+    return valores
+
+
+def crear_escritor(destino, formato):
+
+    """Crea una función que escribe bloques de resultados en un archivo de texto abierto.
+
+        Args:
+            destino (io.TextIOBase): Archivo de salida, abierto con newline='' si el formato es CSV.
+            formato (str): 'csv' (con cabecera) o 'jsonl'.
+
+        Returns:
+            callable: Recibe una lista de ResultadoAnalisis y la escribe a continuación de la anterior.
+        """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de salida no válido: {formato!r}")
+    if formato == 'jsonl':
+        def escribir(resultados):
+            destino.writelines(json.dumps(_fila(r), ensure_ascii=False) + '\n' for r in resultados)
+        return escribir
+
+    escritor = csv.DictWriter(destino, fieldnames=COLUMNAS_SALIDA)
+    escritor.writeheader()
+
+    def escribir(resultados):
+        escritor.writerows(_fila(r) for r in resultados)
+    return escribir
+
+
+def analizar_registros(registros, destino, formato_salida='csv', guardar=False, tamano_bloque=1000, procesos=1,
+                       rechazos=None, motor=None):
+
+    """Analiza registros de mediciones por bloques y escribe los resultados.
+
+        Args:
+            registros (iterable): Tuplas (línea, registro) como las de importador.leer_registros.
+            destino (io.TextIOBase): Archivo de salida.
+            formato_salida (str): 'csv' o 'jsonl'.
+            guardar (bool): Si es True, guarda además cada bloque en la tabla clientes con guardar_lote.
+            tamano_bloque (int): Registros por bloque.
+            procesos (int): Procesos de cálculo; con 1 todo se hace en el proceso actual.
+            rechazos (callable, opcional): Recibe la lista de rechazos (línea, registro, motivo) de cada bloque;
+                por defecto se informan por la salida de errores.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar al guardar; por defecto, el de clientes.db.
+
+        Returns:
+            dict: Totales: 'analizados', 'rechazados' y 'guardados'.
+        """
+    escribir = crear_escritor(destino, formato_salida)
+    totales = {'analizados': 0, 'rechazados': 0, 'guardados': 0}
+    with contextlib.closing(procesar_por_bloques(registros, analizar_bloque, tamano_bloque, procesos)) as bloques:
+        for _, (resultados, rechazados) in bloques:
+            escribir(resultados)
+            totales['analizados'] += len(resultados)
+            totales['rechazados'] += len(rechazados)
+            if rechazos is not None:
+                rechazos(rechazados)
+            else:
+                for linea, _, motivo in rechazados:
+                    print(f"Línea {linea} rechazada: {motivo}", file=sys.stderr)
+            if guardar and resultados:
+                # guardar_lote informa por print; la salida estándar queda libre para los resultados
+                with contextlib.redirect_stdout(sys.stderr):
+                    guardados = guardar_lote(resultados, motor=motor)
+                totales['guardados'] += sum(1 for exito, _ in guardados if exito)
+    return totales
+
+
+def _registros(entradas, formato):
+    if entradas == ['-']:
+        entrada = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        return leer_registros(entrada, formato or 'csv')
+    if len(entradas) == 1:
+        return iterar_registros(entradas[0], formato)
+    # Con varios archivos, la línea de cada rechazo indica también de qué archivo viene
+    return chain.from_iterable(
+        ((f"{ruta}:{linea}", registro) for linea, registro in iterar_registros(ruta, formato))
+        for ruta in entradas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analiza mediciones por lotes sin interfaz gráfica.")
+    parser.add_argument('entradas', nargs='*', default=['-'],
+                        help="Archivos CSV o JSON Lines; sin argumentos (o con -) se lee la entrada estándar")
+    parser.add_argument('--formato-entrada', choices=FORMATOS,
+                        help="Formato de las entradas (por defecto, según la extensión; csv en la entrada estándar)")
+    parser.add_argument('-o', '--salida', default='-', help="Archivo de resultados (por defecto, la salida estándar)")
+    parser.add_argument('--formato-salida', choices=FORMATOS,
+                        help="Formato de salida (por defecto, según la extensión; csv en la salida estándar)")
+    parser.add_argument('--guardar', action='store_true', help="Guarda también los análisis en clientes.db")
+    parser.add_argument('--rechazos', help="Archivo CSV donde añadir los registros rechazados")
+    parser.add_argument('--bloque', type=int, default=1000, help="Registros por bloque")
+    parser.add_argument('--procesos', type=int, default=1, help="Procesos de cálculo")
+    args = parser.parse_args(argv)
+
+    formato_salida = args.formato_salida
+    if formato_salida is None:
+        formato_salida = 'csv' if args.salida == '-' else formato_por_extension(args.salida)
+
+    with contextlib.ExitStack() as pila:
+        if args.salida == '-':
+            destino = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=False)
+            pila.callback(destino.detach)
+            pila.callback(destino.flush)
+        else:
+            destino = pila.enter_context(open(args.salida, 'w', encoding='utf-8', newline=''))
+        rechazos = None
+        if args.rechazos:
+            escritor = abrir_rechazos(pila.enter_context(open(args.rechazos, 'a', encoding='utf-8', newline='')))
+            rechazos = functools.partial(escribir_rechazos, escritor)
+
+        totales = analizar_registros(_registros(args.entradas, args.formato_entrada), destino, formato_salida,
+                                     args.guardar, args.bloque, args.procesos, rechazos)
+
+    resumen = f"Analizados: {totales['analizados']}, rechazados: {totales['rechazados']}"
+    if args.guardar:
+        resumen += f", guardados: {totales['guardados']}"
+    print(resumen + ".", file=sys.stderr)
+    return 1 if totales['rechazados'] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
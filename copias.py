@@ -0,0 +1,320 @@
+"""Copias de seguridad de clientes.db con la aplicación abierta.
+
+La copia usa la API de copia en línea de SQLite (sqlite3.Connection.backup) en pasos de PAGINAS_POR_PASO
+páginas desde un hilo aparte, con una pausa entre pasos. Python libera el GIL durante cada paso, de modo
+que la interfaz no se detiene.
+
+En modo WAL (el que usa la aplicación, ver base_datos.py) la copia abre antes una transacción de lectura:
+así todos los pasos ven la misma instantánea, las escrituras de guardar_datos siguen entrando en el WAL
+sin esperar y la copia no se reinicia por ellas; solo el checkpoint espera a que termine. En otros modos,
+cada escritura de otra conexión hace que SQLite vuelva a empezar la copia; tras MAXIMO_REINICIOS
+reinicios se copia en un solo paso.
+
+Cada instantánea se escribe primero en un archivo .parcial y, antes de darla por buena, se comprueba con
+PRAGMA integrity_check, se comprime con gzip y se verifica que el archivo comprimido se descomprime en
+exactamente los mismos bytes. Después solo se conservan las últimas instantáneas.
+
+La aplicación hace una copia cada COACHBODYMETRICS_COPIAS_HORAS horas (24 por defecto) si la variable de
+entorno COACHBODYMETRICS_COPIAS indica el directorio de destino; también puede lanzarse desde la ventana
+principal o desde la línea de comandos:
+
+    python copias.py copias/ --conservar 14
+    python copias.py --verificar copias/clientes-20240601-120000-000.db.gz
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+from base_datos import obtener_motor
+
+
+'''Configuración de las copias programadas (ver MainApplication.programar_copia en main.py).'''
+
+DIRECTORIO_COPIAS = os.environ.get('COACHBODYMETRICS_COPIAS')
+HORAS_ENTRE_COPIAS = float(os.environ.get('COACHBODYMETRICS_COPIAS_HORAS', '24'))
+COPIAS_CONSERVADAS = int(os.environ.get('COACHBODYMETRICS_COPIAS_CONSERVAR', '7'))
+
+'''Páginas copiadas en cada paso (con páginas de 4 KB, 1 MB) y pausa entre pasos, en segundos, que deja
+paso a las escrituras de la aplicación.'''
+
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.002
+MAXIMO_REINICIOS = 3
+
+TAMANO_TROZO = 1 << 20
+
+
+class _Interrupcion(Exception):
+    pass
+
+
+def ruta_base_datos(motor=None):
+
+    """Devuelve la ruta del archivo SQLite del motor de la aplicación.
+
+        Raises:
+            ValueError: Si la base de datos no es un archivo SQLite.
+        """
+    url = (motor or obtener_motor()).url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        raise ValueError(f"Solo se pueden copiar bases de datos SQLite en archivo: {url!r}")
+    return url.database
+
+
+def copiar_base_datos(origen, destino, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS, progreso=None,
+                      cancelar=None):
+
+    """Copia una base de datos SQLite abierta con la API de copia en línea, por pasos.
+
+        Args:
+            origen (str): Archivo de la base de datos.
+            destino (str): Archivo de la copia; se sobrescribe.
+            paginas (int): Páginas copiadas en cada paso.
+            pausa (float): Segundos de espera entre pasos.
+            progreso (callable, opcional): Recibe (páginas copiadas, páginas totales) tras cada paso.
+            cancelar (threading.Event, opcional): Si se activa, la copia se detiene tras el paso en curso.
+
+        Returns:
+            int: Número de reinicios por escrituras concurrentes, o None si la copia se canceló.
+        """
+    reinicios = 0
+    fuente = sqlite3.connect(origen, timeout=30, isolation_level=None)
+    try:
+        if fuente.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+            # La transacción de lectura fija la instantánea de la copia hasta cerrar la conexión
+            fuente.execute("BEGIN")
+            fuente.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        while True:
+            restantes_antes = [None]
+
+            def al_avanzar(estado, restantes, total):
+                if cancelar is not None and cancelar.is_set():
+                    raise _Interrupcion('cancelada')
+                # Si quedan más páginas que en el paso anterior, SQLite ha vuelto a empezar
+                if restantes_antes[0] is not None and restantes > restantes_antes[0]:
+                    raise _Interrupcion('reiniciada')
+                restantes_antes[0] = restantes
+                if progreso is not None:
+                    progreso((total - restantes, total))
+                if pausa and restantes:
+                    time.sleep(pausa)
+
+            copia = sqlite3.connect(destino)
+            try:
+                fuente.backup(copia, pages=paginas if reinicios < MAXIMO_REINICIOS else -1, progress=al_avanzar)
+                # La copia queda en un solo archivo, sin -wal ni -shm
+                copia.execute("PRAGMA journal_mode=DELETE")
+                return reinicios
+            except _Interrupcion as e:
+                if str(e) == 'cancelada':
+                    return None
+                reinicios += 1
+            finally:
+                copia.close()
+    finally:
+        fuente.close()
+
+
+def comprobar_integridad(ruta):
+
+    """Comprueba una base de datos SQLite con PRAGMA integrity_check.
+
+        Raises:
+            ValueError: Si la comprobación encuentra algún problema.
+        """
+    conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    try:
+        problemas = [fila[0] for fila in conexion.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        problemas = [str(e)]
+    finally:
+        conexion.close()
+    if problemas != ['ok']:
+        raise ValueError(f"La copia {ruta} no es válida: {'; '.join(problemas[:5])}")
+
+
+def comprimir(origen, destino):
+
+    """Comprime un archivo con gzip por trozos.
+
+        Returns:
+            str: SHA-256 del contenido sin comprimir.
+        """
+    huella = hashlib.sha256()
+    with open(origen, 'rb') as entrada, gzip.open(destino, 'wb', compresslevel=6) as salida:
+        for trozo in iter(lambda: entrada.read(TAMANO_TROZO), b''):
+            huella.update(trozo)
+            salida.write(trozo)
+    return huella.hexdigest()
+
+
+def huella_comprimido(ruta):
+
+    """Devuelve el SHA-256 del contenido descomprimido de un archivo gzip (gzip comprueba además su CRC)."""
+    huella = hashlib.sha256()
+    with gzip.open(ruta, 'rb') as entrada:
+        for trozo in iter(lambda: entrada.read(TAMANO_TROZO), b''):
+            huella.update(trozo)
+    return huella.hexdigest()
+
+
+def verificar_copia(ruta):
+
+    """Comprueba una instantánea ya guardada (.db o .db.gz) descomprimiéndola en un archivo temporal.
+
+        Raises:
+            ValueError: Si la copia no es válida.
+        """
+    if not ruta.endswith('.gz'):
+        comprobar_integridad(ruta)
+        return
+    descriptor, temporal = tempfile.mkstemp(suffix='.db')
+    try:
+        try:
+            with os.fdopen(descriptor, 'wb') as salida, gzip.open(ruta, 'rb') as entrada:
+                shutil.copyfileobj(entrada, salida, TAMANO_TROZO)
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            raise ValueError(f"La copia {ruta} no es válida: {e}") from e
+        comprobar_integridad(temporal)
+    finally:
+        os.remove(temporal)
+
+
+def _patron_copias(prefijo):
+    return re.compile(re.escape(prefijo) + r'-\d{8}-\d{6}-\d{3}\.db(\.gz)?$')
+
+
+def rotar_copias(directorio, prefijo, conservar=COPIAS_CONSERVADAS):
+
+    """Borra las instantáneas más antiguas de un directorio y deja solo las últimas.
+
+        Args:
+            directorio (str): Directorio de las copias.
+            prefijo (str): Prefijo de los archivos, por ejemplo 'clientes'.
+            conservar (int): Número de instantáneas que se conservan.
+
+        Returns:
+            list: Rutas de las copias borradas.
+        """
+    patron = _patron_copias(prefijo)
+    # El nombre lleva la fecha y la hora, así que el orden alfabético es el cronológico
+    copias = sorted(nombre for nombre in os.listdir(directorio) if patron.match(nombre))
+    borradas = [os.path.join(directorio, nombre) for nombre in copias[:max(len(copias) - conservar, 0)]]
+    for ruta in borradas:
+        os.remove(ruta)
+    return borradas
+
+
+def espera_proxima_copia(directorio=DIRECTORIO_COPIAS, horas=HORAS_ENTRE_COPIAS, motor=None):
+
+    """Calcula cuánto falta para la próxima copia programada según la fecha de la última instantánea.
+
+        Así, aunque la aplicación se cierre cada noche, se hace una copia al abrirla si la última es antigua.
+
+        Args:
+            directorio (str): Directorio de las copias.
+            horas (float): Horas entre copias.
+            motor (sqlalchemy.engine.Engine, opcional): Motor de la base de datos; por defecto, el de la aplicación.
+
+        Returns:
+            float: Segundos hasta la próxima copia; 0 si no hay ninguna o la última ya ha caducado.
+        """
+    prefijo = os.path.splitext(os.path.basename(ruta_base_datos(motor)))[0]
+    patron = _patron_copias(prefijo)
+    copias = sorted(nombre for nombre in os.listdir(directorio) if patron.match(nombre)) \
+        if os.path.isdir(directorio) else []
+    if not copias:
+        return 0.0
+    fecha = datetime.strptime(copias[-1][len(prefijo) + 1:len(prefijo) + 16], '%Y%m%d-%H%M%S')
+    return max((fecha - datetime.now()).total_seconds() + horas * 3600, 0.0)
+
+
+def crear_copia(directorio=DIRECTORIO_COPIAS, comprimir_copia=True, verificar=True, conservar=COPIAS_CONSERVADAS,
+                progreso=None, cancelar=None, motor=None):
+
+    """Crea una instantánea verificada de la base de datos y rota las anteriores.
+
+        Args:
+            directorio (str): Directorio de destino; se crea si no existe.
+            comprimir_copia (bool): Si se comprime la instantánea con gzip.
+            verificar (bool): Si se comprueban la integridad de la copia y el archivo comprimido.
+            conservar (int): Instantáneas que se conservan en el directorio.
+            progreso (callable, opcional): Recibe (páginas copiadas, páginas totales) tras cada paso.
+            cancelar (threading.Event, opcional): Si se activa, la copia se detiene tras el paso en curso.
+            motor (sqlalchemy.engine.Engine, opcional): Motor de la base de datos; por defecto, el de la aplicación.
+
+        Returns:
+            str: Ruta de la instantánea, o None si la copia se canceló.
+
+        Raises:
+            ValueError: Si la copia no supera la verificación; en ese caso no se guarda.
+        """
+    if not directorio:
+        raise ValueError("No se ha indicado el directorio de las copias")
+    origen = ruta_base_datos(motor)
+    prefijo = os.path.splitext(os.path.basename(origen))[0]
+    os.makedirs(directorio, exist_ok=True)
+    ahora = datetime.now()
+    ruta = os.path.join(directorio, f"{prefijo}-{ahora:%Y%m%d-%H%M%S}-{ahora.microsecond // 1000:03d}.db")
+    parcial = ruta + '.parcial'
+    final = ruta + '.gz' if comprimir_copia else ruta
+
+    try:
+        if copiar_base_datos(origen, parcial, progreso=progreso, cancelar=cancelar) is None:
+            os.remove(parcial)
+            return None
+        if verificar:
+            comprobar_integridad(parcial)
+        if comprimir_copia:
+            huella = comprimir(parcial, final + '.parcial')
+            if verificar and huella_comprimido(final + '.parcial') != huella:
+                raise ValueError(f"La copia comprimida {final} no coincide con la base de datos copiada")
+            os.replace(final + '.parcial', final)
+            os.remove(parcial)
+        else:
+            os.replace(parcial, final)
+    except BaseException:
+        for resto in (parcial, final + '.parcial'):
+            if os.path.exists(resto):
+                os.remove(resto)
+        raise
+
+    rotar_copias(directorio, prefijo, conservar)
+    return final
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copias de seguridad en línea de la base de datos.")
+    parser.add_argument('directorio', nargs='?', default=DIRECTORIO_COPIAS, help="Directorio de las copias")
+    parser.add_argument('--conservar', type=int, default=COPIAS_CONSERVADAS, help="Copias que se conservan")
+    parser.add_argument('--sin-comprimir', action='store_true', help="Guarda la copia sin comprimir")
+    parser.add_argument('--verificar', metavar='COPIA', help="Solo comprueba una copia ya guardada")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.verificar:
+            verificar_copia(args.verificar)
+            print(f"Copia válida: {args.verificar}")
+            return 0
+        if not args.directorio:
+            parser.print_usage()
+            return 1
+        print(f"Copia creada: {crear_copia(args.directorio, not args.sin_comprimir, conservar=args.conservar)}")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Estadísticas agregadas de las mediciones por género, tramo de edad y mes.
+
+La tabla estadisticas guarda, para cada grupo y métrica, el número de mediciones, la suma, la suma de
+cuadrados, el mínimo y el máximo. guardar_datos, guardar_lote y el importador la actualizan en la misma
+transacción en que insertan en clientes, así que nunca se desincroniza; consultar_estadisticas responde
+con un coste proporcional al número de grupos y no al de mediciones.
+
+En la misma transacción se actualiza la tabla distribuciones: el histograma exacto (en centésimas) de
+porcentaje_grasa y ffmi por género y tramo de edad, con el que percentiles.py calcula percentiles.
+
+Las sumas usan el INSERT con conflicto de SQLite, PostgreSQL o MySQL (con CASE para el mínimo y el máximo)
+y, en otros motores, un UPDATE seguido de un INSERT. Al abrir una base de datos con mediciones pero con
+estas tablas vacías (anterior a ellas), obtener_motor las reconstruye. Para recalcularlas a mano:
+
+    python estadisticas.py --reconstruir
+    python estadisticas.py ffmi --por genero mes
+"""
+
+import argparse
+import bisect
+import math
+import sys
+
+from types import SimpleNamespace
+
+from sqlalchemy import bindparam, case, delete, func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from calculadora import calcular_imc
+from almacenamiento import columnas_lectura, tabla_datos
+from base_datos import obtener_motor
+from models import Distribucion, Estadistica
+
+
+'''Métricas resumidas. imc no es una columna de clientes: se calcula a partir del peso y la altura
+igual que en calculadora.analizar.'''
+
+METRICAS_ESTADISTICAS = ('porcentaje_grasa', 'ffmi', 'imc', 'calorias_diarias')
+
+DIMENSIONES = ('genero', 'tramo_edad', 'mes')
+
+'''Límites inferiores de los tramos de edad y su etiqueta; una edad cae en el último tramo cuyo límite
+no supera.'''
+
+LIMITES_TRAMOS_EDAD = (0, 18, 30, 40, 50, 60)
+TRAMOS_EDAD = ('<18', '18-29', '30-39', '40-49', '50-59', '60+')
+
+'''Métricas cuyo histograma completo se guarda en distribuciones.'''
+
+METRICAS_DISTRIBUCION = ('porcentaje_grasa', 'ffmi')
+
+
+def tramo_edad(edad):
+
+    """Devuelve la etiqueta del tramo de edad (de TRAMOS_EDAD) al que pertenece una edad."""
+    return TRAMOS_EDAD[max(bisect.bisect_right(LIMITES_TRAMOS_EDAD, edad) - 1, 0)]
+
+
+def _valores_metricas(fila):
+    valores = {
+        'porcentaje_grasa': fila.get('porcentaje_grasa'),
+        'ffmi': fila.get('ffmi'),
+        'calorias_diarias': fila.get('calorias_diarias'),
+        'imc': round(calcular_imc(fila['peso'], fila['altura']), 2) if fila.get('altura') else None,
+    }
+    return {metrica: valor for metrica, valor in valores.items()
+            if valor is not None and math.isfinite(valor)}
+
+
+def acumular(filas, acumulado=None):
+
+    """Resume filas de clientes por grupo y métrica.
+
+        Args:
+            filas (iterable): Diccionarios con al menos fecha, edad, genero, peso, altura y las métricas.
+            acumulado (dict, opcional): Resumen al que añadir las filas; por defecto, uno nuevo.
+
+        Returns:
+            dict: {(genero, tramo_edad, mes, metrica): [n, suma, suma_cuadrados, minimo, maximo]}.
+        """
+    acumulado = {} if acumulado is None else acumulado
+    for fila in filas:
+        grupo = (fila['genero'], tramo_edad(fila['edad']), fila['fecha'].strftime('%Y-%m'))
+        for metrica, valor in _valores_metricas(fila).items():
+            clave = grupo + (metrica,)
+            actual = acumulado.get(clave)
+            if actual is None:
+                acumulado[clave] = [1, valor, valor * valor, valor, valor]
+            else:
+                actual[0] += 1
+                actual[1] += valor
+                actual[2] += valor * valor
+                actual[3] = min(actual[3], valor)
+                actual[4] = max(actual[4], valor)
+    return acumulado
+
+
+def centesimas(valor):
+
+    """Devuelve un valor de métrica en centésimas, la clave con que se guarda en distribuciones."""
+    return int(round(valor * 100))
+
+
+def acumular_distribuciones(filas, acumulado=None):
+
+    """Cuenta las filas de clientes por grupo, métrica y valor.
+
+        Args:
+            filas (iterable): Diccionarios con al menos edad, genero y las métricas de METRICAS_DISTRIBUCION.
+            acumulado (dict, opcional): Recuento al que añadir las filas; por defecto, uno nuevo.
+
+        Returns:
+            dict: {(genero, tramo_edad, metrica, valor en centésimas): n}.
+        """
+    acumulado = {} if acumulado is None else acumulado
+    for fila in filas:
+        grupo = (fila['genero'], tramo_edad(fila['edad']))
+        for metrica in METRICAS_DISTRIBUCION:
+            valor = fila.get(metrica)
+            if valor is not None and math.isfinite(valor):
+                clave = grupo + (metrica, centesimas(valor))
+                acumulado[clave] = acumulado.get(clave, 0) + 1
+    return acumulado
+
+
+def _filas_distribuciones(acumulado):
+    return [{'genero': genero, 'tramo_edad': tramo, 'metrica': metrica, 'valor': valor, 'n': n}
+            for (genero, tramo, metrica, valor), n in acumulado.items()]
+
+
+def _filas_estadisticas(acumulado):
+    return [
+        {'genero': genero, 'tramo_edad': tramo, 'mes': mes, 'metrica': metrica,
+         'n': n, 'suma': suma, 'suma_cuadrados': suma_cuadrados, 'minimo': minimo, 'maximo': maximo}
+        for (genero, tramo, mes, metrica), (n, suma, suma_cuadrados, minimo, maximo) in acumulado.items()
+    ]
+
+
+def actualizar_estadisticas(conexion, filas):
+
+    """Suma unas filas recién insertadas en clientes a las tablas estadisticas y distribuciones.
+
+        Debe llamarse con la misma conexión (y dentro de la misma transacción) que la inserción, para que
+        todo se confirme o se deshaga junto. Solo hace una sentencia por grupo (o valor) afectado.
+
+        Args:
+            conexion (sqlalchemy.engine.Connection): Conexión con la transacción de la inserción.
+            filas (iterable): Diccionarios con las columnas de Cliente que se han insertado.
+        """
+    filas = list(filas)
+    _sumar(conexion, Distribucion.__table__, _filas_distribuciones(acumular_distribuciones(filas)),
+           _sumar_distribucion)
+    _sumar(conexion, Estadistica.__table__, _filas_estadisticas(acumular(filas)), _sumar_estadistica)
+
+
+def _sumar_distribucion(tabla, nuevos):
+    return {'n': tabla.c.n + nuevos.n}
+
+
+def _sumar_estadistica(tabla, nuevos):
+    # CASE en lugar de min() y max() con dos argumentos, que solo SQLite trata como funciones escalares
+    return {
+        'n': tabla.c.n + nuevos.n,
+        'suma': tabla.c.suma + nuevos.suma,
+        'suma_cuadrados': tabla.c.suma_cuadrados + nuevos.suma_cuadrados,
+        'minimo': case((nuevos.minimo < tabla.c.minimo, nuevos.minimo), else_=tabla.c.minimo),
+        'maximo': case((nuevos.maximo > tabla.c.maximo, nuevos.maximo), else_=tabla.c.maximo),
+    }
+
+
+'''Módulo con el INSERT que actualiza la fila si ya existe, por dialecto de SQLAlchemy. En el resto de
+dialectos las sumas se hacen con un UPDATE y, si no había fila, un INSERT.'''
+
+INSERCIONES_CON_CONFLICTO = {'sqlite': sqlite, 'postgresql': postgresql, 'mysql': mysql, 'mariadb': mysql}
+
+
+def sentencia_suma(dialecto, tabla, actualizar):
+
+    """Construye el INSERT que suma una fila a la que ya tenga la misma clave primaria.
+
+        Args:
+            dialecto (str): Nombre del dialecto de SQLAlchemy ('sqlite', 'postgresql', 'mysql'...).
+            tabla (sqlalchemy.Table): Tabla de agregados.
+            actualizar (callable): Recibe (tabla, valores nuevos) y devuelve las columnas a actualizar.
+
+        Returns:
+            sqlalchemy.sql.Insert: La sentencia, o None si el dialecto no tiene INSERT con conflicto.
+        """
+    modulo = INSERCIONES_CON_CONFLICTO.get(dialecto)
+    if modulo is None:
+        return None
+    sentencia = modulo.insert(tabla)
+    if modulo is mysql:
+        return sentencia.on_duplicate_key_update(actualizar(tabla, sentencia.inserted))
+    return sentencia.on_conflict_do_update(index_elements=list(tabla.primary_key.columns),
+                                           set_=actualizar(tabla, sentencia.excluded))
+
+
+def _sumar(conexion, tabla, filas, actualizar):
+    if not filas:
+        return
+    sentencia = sentencia_suma(conexion.dialect.name, tabla, actualizar)
+    if sentencia is None:
+        _sumar_fila_a_fila(conexion, tabla, filas, actualizar)
+    else:
+        conexion.execute(sentencia, filas)
+
+
+def _sumar_fila_a_fila(conexion, tabla, filas, actualizar):
+    claves = [columna.name for columna in tabla.primary_key.columns]
+    for fila in filas:
+        nuevos = SimpleNamespace(**{c: bindparam(None, valor, type_=tabla.c[c].type) for c, valor in fila.items()})
+        sentencia = tabla.update().where(*(tabla.c[c] == fila[c] for c in claves)).values(actualizar(tabla, nuevos))
+        if conexion.execute(sentencia).rowcount == 0:
+            conexion.execute(tabla.insert(), fila)
+
+
+def reconstruir_estadisticas(motor=None, tamano_bloque=10_000):
+
+    """Vuelve a calcular las tablas estadisticas y distribuciones a partir de todas las mediciones guardadas.
+
+        Lee clientes por bloques (la memoria depende del número de grupos y valores, no de filas) y
+        sustituye el contenido de las dos tablas en una sola transacción.
+
+        Args:
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+            tamano_bloque (int): Filas de clientes leídas en cada bloque.
+
+        Returns:
+            int: Número de grupos (filas de estadisticas) resultantes.
+        """
+    motor = motor or obtener_motor()
+    _, columnas, completar = columnas_lectura(
+        ('fecha', 'edad', 'genero', 'peso', 'altura', 'porcentaje_grasa', 'ffmi', 'calorias_diarias'), motor)
+    acumulado, distribuciones = {}, {}
+    with motor.begin() as conexion:
+        resultado = conexion.execution_options(yield_per=tamano_bloque).execute(select(*columnas))
+        for bloque in resultado.partitions():
+            filas = [fila._asdict() for fila in completar(bloque)]
+            acumular(filas, acumulado)
+            acumular_distribuciones(filas, distribuciones)
+        conexion.execute(delete(Estadistica.__table__))
+        conexion.execute(delete(Distribucion.__table__))
+        for tabla, filas in ((Estadistica.__table__, _filas_estadisticas(acumulado)),
+                             (Distribucion.__table__, _filas_distribuciones(distribuciones))):
+            if filas:
+                conexion.execute(tabla.insert(), filas)
+    return len(acumulado)
+
+
+def completar_agregados(motor):
+
+    """Reconstruye las tablas de agregados si alguna está vacía pero ya hay mediciones guardadas.
+
+        En una base de datos anterior a estas tablas las mediciones nunca se sumaron; obtener_motor llama
+        a esta función al comprobar el esquema para que los agregados y percentiles las incluyan. Si no
+        hace falta reconstruir, solo cuesta tres consultas LIMIT 1.
+
+        Args:
+            motor (sqlalchemy.engine.Engine): Motor de la base de datos.
+
+        Returns:
+            bool: Si se han reconstruido las tablas.
+        """
+    with motor.connect() as conexion:
+        if conexion.execute(select(tabla_datos(motor).c.id).limit(1)).first() is None:
+            return False
+        vacias = [tabla for tabla in (Estadistica.__table__, Distribucion.__table__)
+                  if conexion.execute(select(1).select_from(tabla).limit(1)).first() is None]
+    if not vacias:
+        return False
+    reconstruir_estadisticas(motor)
+    return True
+
+
+def consultar_estadisticas(metrica, por=DIMENSIONES, genero=None, tramo_edad=None, desde_mes=None,
+                           hasta_mes=None, motor=None):
+
+    """Devuelve las estadísticas de una métrica agrupadas por las dimensiones pedidas.
+
+        Args:
+            metrica (str): Una de METRICAS_ESTADISTICAS.
+            por (tuple): Dimensiones por las que agrupar, de DIMENSIONES; vacío para el total.
+            genero (str, opcional): Limita a un género.
+            tramo_edad (str, opcional): Limita a un tramo de edad de TRAMOS_EDAD.
+            desde_mes (str, opcional): Primer mes incluido, 'AAAA-MM'.
+            hasta_mes (str, opcional): Último mes incluido, 'AAAA-MM'.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            list: Un diccionario por grupo, ordenados por las dimensiones, con esas dimensiones y n, media,
+                desviacion (muestral; None si n < 2), minimo y maximo.
+        """
+    if metrica not in METRICAS_ESTADISTICAS:
+        raise ValueError(f"Métrica no válida: {metrica!r}")
+    por = tuple(por)
+    if any(dimension not in DIMENSIONES for dimension in por):
+        raise ValueError(f"Dimensiones no válidas: {por!r}")
+
+    tabla = Estadistica.__table__
+    dimensiones = [tabla.c[dimension] for dimension in por]
+    consulta = (select(*dimensiones, func.sum(tabla.c.n), func.sum(tabla.c.suma), func.sum(tabla.c.suma_cuadrados),
+                       func.min(tabla.c.minimo), func.max(tabla.c.maximo))
+                .where(tabla.c.metrica == metrica)
+                .group_by(*dimensiones)
+                .order_by(*dimensiones))
+    if genero is not None:
+        consulta = consulta.where(tabla.c.genero == genero)
+    if tramo_edad is not None:
+        consulta = consulta.where(tabla.c.tramo_edad == tramo_edad)
+    if desde_mes is not None:
+        consulta = consulta.where(tabla.c.mes >= desde_mes)
+    if hasta_mes is not None:
+        consulta = consulta.where(tabla.c.mes <= hasta_mes)
+
+    with (motor or obtener_motor()).connect() as conexion:
+        filas = conexion.execute(consulta).all()
+
+    grupos = []
+    for fila in filas:
+        n, suma, suma_cuadrados, minimo, maximo = fila[len(por):]
+        if not n:
+            continue
+        media = suma / n
+        desviacion = None
+        if n > 1:
+            desviacion = math.sqrt(max(suma_cuadrados - suma * media, 0.0) / (n - 1))
+        grupos.append({**dict(zip(por, fila[:len(por)])), 'n': n, 'media': media, 'desviacion': desviacion,
+                       'minimo': minimo, 'maximo': maximo})
+    return grupos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estadísticas agregadas de las mediciones.")
+    parser.add_argument('metrica', nargs='?', choices=METRICAS_ESTADISTICAS, help="Métrica a consultar")
+    parser.add_argument('--por', nargs='*', choices=DIMENSIONES, default=list(DIMENSIONES),
+                        help="Dimensiones por las que agrupar")
+    parser.add_argument('--reconstruir', action='store_true', help="Recalcula las tablas desde clientes")
+    args = parser.parse_args(argv)
+
+    if args.reconstruir:
+        print(f"Estadísticas reconstruidas: {reconstruir_estadisticas()} grupos.")
+    if args.metrica:
+        for grupo in consultar_estadisticas(args.metrica, args.por):
+            etiqueta = ' '.join(str(grupo[d]) for d in args.por) or 'total'
+            desviacion = '-' if grupo['desviacion'] is None else f"{grupo['desviacion']:.2f}"
+            print(f"{etiqueta:25s} n={grupo['n']:<8d} media={grupo['media']:.2f} desv={desviacion} "
+                  f"min={grupo['minimo']:.2f} max={grupo['maximo']:.2f}")
+    elif not args.reconstruir:
+        parser.print_usage()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Exportación del historial de clientes por bloques, sin cargar la tabla completa en memoria.
+
+Formatos disponibles:
+    csv: texto separado por comas, con las comillas que haga falta (módulo csv).
+    csv.gz: el mismo CSV comprimido con gzip.
+    jsonl: un objeto JSON por línea.
+    columnar: archivo zip con un .npy de NumPy por columna y bloque, compacto y rápido de leer
+        (ver leer_columnar).
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+from sqlalchemy import select
+
+from almacenamiento import columnas_lectura
+from base_datos import obtener_motor
+from instrumentacion import instrumentar
+
+
+'''Columnas exportadas y su cabecera en CSV.'''
+
+COLUMNAS_EXPORTACION = (
+    ('nombre', 'Nombre'),
+    ('fecha', 'Fecha'),
+    ('peso', 'Peso'),
+    ('altura', 'Altura'),
+    ('edad', 'Edad'),
+    ('genero', 'Género'),
+    ('cintura', 'Cintura'),
+    ('cadera', 'Cadera'),
+    ('cuello', 'Cuello'),
+    ('tmb', 'TMB'),
+    ('porcentaje_grasa', 'Porcentaje Grasa'),
+    ('peso_grasa', 'Peso Grasa'),
+    ('masa_muscular', 'Masa Muscular'),
+    ('agua_total', 'Agua Total'),
+    ('ffmi', 'FFMI'),
+    ('peso_min', 'Peso Mínimo'),
+    ('peso_max', 'Peso Máximo'),
+    ('sobrepeso', 'Sobrepeso'),
+    ('rcc', 'RCC'),
+    ('ratio_cintura_altura', 'Ratio Cintura/Altura'),
+    ('calorias_diarias', 'Calorías Diarias'),
+    ('proteinas', 'Proteínas'),
+    ('carbohidratos', 'Carbohidratos'),
+    ('grasas', 'Grasas'),
+)
+
+CAMPOS_EXPORTACION = tuple(campo for campo, _ in COLUMNAS_EXPORTACION)
+
+'''Extensión de archivo asociada a cada formato.'''
+
+FORMATOS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'jsonl': '.jsonl',
+    'columnar': '.zip',
+}
+
+
+def formato_por_extension(ruta):
+
+    """Deduce el formato de exportación a partir de la extensión del archivo.
+
+        Args:
+            ruta (str): Ruta del archivo de destino.
+
+        Returns:
+            str: Uno de los formatos de FORMATOS; 'csv' si la extensión no se reconoce.
+        """
+    ruta = ruta.lower()
+    for formato, extension in sorted(FORMATOS.items(), key=lambda f: -len(f[1])):
+        if ruta.endswith(extension):
+            return formato
+    return 'csv'
+
+
+def iterar_historial(desde=None, hasta=None, nombre=None, tamano_bloque=1000, motor=None):
+
+    """Recorre el historial por bloques, leyendo de la base de datos solo un bloque cada vez.
+
+        Args:
+            desde (datetime, opcional): Fecha mínima (incluida).
+            hasta (datetime, opcional): Fecha máxima (excluida).
+            nombre (str, opcional): Limita la exportación a un cliente.
+            tamano_bloque (int): Filas que se leen de la base de datos en cada bloque.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Yields:
+            list: Bloques de como mucho tamano_bloque filas, ordenadas por (fecha, id).
+        """
+    motor = motor or obtener_motor()
+    tabla, columnas, completar = columnas_lectura(CAMPOS_EXPORTACION, motor)
+    consulta = select(*columnas).order_by(tabla.c.fecha, tabla.c.id)
+    if desde is not None:
+        consulta = consulta.where(tabla.c.fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.where(tabla.c.fecha < hasta)
+    if nombre is not None:
+        consulta = consulta.where(tabla.c.nombre == nombre)
+
+    with motor.connect() as conexion:
+        resultado = conexion.execution_options(yield_per=tamano_bloque).execute(consulta)
+        for bloque in resultado.partitions():
+            yield completar(bloque)
+
+
+def _escribir_csv(archivo, bloques):
+    escritor = csv.writer(archivo)
+    escritor.writerow([cabecera for _, cabecera in COLUMNAS_EXPORTACION])
+    for bloque in bloques:
+        escritor.writerows(bloque)
+        yield len(bloque)
+
+
+def _escribir_jsonl(archivo, bloques):
+    for bloque in bloques:
+        archivo.writelines(
+            json.dumps(dict(zip(CAMPOS_EXPORTACION, fila)), ensure_ascii=False, default=str) + '\n'
+            for fila in bloque)
+        yield len(bloque)
+
+
+def _columnas_bloque(bloque):
+    columnas = list(zip(*bloque))
+    arrays = {}
+    for campo, valores in zip(CAMPOS_EXPORTACION, columnas):
+        if campo in ('nombre', 'genero'):
+            arrays[campo] = np.array(valores, dtype=str)
+        elif campo == 'fecha':
+            arrays[campo] = np.array(valores, dtype='datetime64[us]')
+        elif campo == 'edad':
+            arrays[campo] = np.array(valores, dtype=np.int32)
+        else:
+            arrays[campo] = np.array(valores, dtype=np.float64)
+    return arrays
+
+
+def _escribir_columnar(archivo_zip, bloques):
+    for numero, bloque in enumerate(bloques):
+        for campo, array in _columnas_bloque(bloque).items():
+            with archivo_zip.open(f"{numero:06d}/{campo}.npy", 'w') as destino:
+                np.save(destino, array, allow_pickle=False)
+        yield len(bloque)
+
+
+@instrumentar('exportar_historial', filas=lambda filas: filas or 0)
+def exportar_historial(ruta, formato=None, desde=None, hasta=None, nombre=None, tamano_bloque=1000,
+                       progreso=None, cancelar=None, motor=None):
+
+    """Exporta el historial de clientes a un archivo, bloque a bloque.
+
+        La memoria usada depende de tamano_bloque y no del tamaño de la tabla. Si la exportación se
+        cancela o falla, se borra el archivo a medio escribir.
+
+        Args:
+            ruta (str): Archivo de destino.
+            formato (str, opcional): Uno de FORMATOS; por defecto se deduce de la extensión de ruta.
+            desde (datetime, opcional): Fecha mínima (incluida).
+            hasta (datetime, opcional): Fecha máxima (excluida).
+            nombre (str, opcional): Limita la exportación a un cliente.
+            tamano_bloque (int): Filas que se leen y escriben en cada bloque.
+            progreso (callable, opcional): Se llama con el total de filas escritas tras cada bloque.
+            cancelar (threading.Event, opcional): Si se activa, la exportación se detiene tras el bloque en curso.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            int: Número de filas exportadas, o None si la exportación se canceló.
+        """
+    formato = formato or formato_por_extension(ruta)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación no válido: {formato!r}")
+
+    bloques = iterar_historial(desde, hasta, nombre, tamano_bloque, motor)
+    total = 0
+    try:
+        if formato == 'columnar':
+            destino = zipfile.ZipFile(ruta, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif formato == 'csv.gz':
+            destino = gzip.open(ruta, 'wt', encoding='utf-8', newline='')
+        else:
+            destino = open(ruta, 'w', encoding='utf-8', newline='')
+        with destino:
+            if formato == 'columnar':
+                escritos = _escribir_columnar(destino, bloques)
+            elif formato == 'jsonl':
+                escritos = _escribir_jsonl(destino, bloques)
+            else:
+                escritos = _escribir_csv(destino, bloques)
+            for filas in escritos:
+                total += filas
+                if progreso is not None:
+                    progreso(total)
+                if cancelar is not None and cancelar.is_set():
+                    break
+    except BaseException:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+    finally:
+        bloques.close()
+
+    if cancelar is not None and cancelar.is_set():
+        os.remove(ruta)
+        return None
+    return total
+
+
+def leer_columnar(ruta):
+
+    """Lee un archivo exportado en formato columnar.
+
+        Args:
+            ruta (str): Archivo .zip generado por exportar_historial con formato 'columnar'.
+
+        Returns:
+            dict: Un array de NumPy por columna de CAMPOS_EXPORTACION, con todos los bloques concatenados.
+        """
+    partes = {campo: [] for campo in CAMPOS_EXPORTACION}
+    with zipfile.ZipFile(ruta) as archivo_zip:
+        for nombre in sorted(archivo_zip.namelist()):
+            campo = nombre.split('/')[1][:-len('.npy')]
+            with archivo_zip.open(nombre) as origen:
+                partes[campo].append(np.load(io.BytesIO(origen.read()), allow_pickle=False))
+    return {campo: np.concatenate(arrays) if arrays else np.array([]) for campo, arrays in partes.items()}
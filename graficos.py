@@ -0,0 +1,165 @@
+"""Datos y cálculos de los gráficos de evolución de un cliente (peso, porcentaje de grasa y masa muscular).
+
+La ventana del gráfico (GraficoWindow en main.py) dibuja directamente en un Canvas de Tk. Para que los
+clientes con años de mediciones frecuentes se dibujen al instante, en cada redibujado solo se toma el
+tramo visible de cada serie (búsqueda binaria sobre las fechas) y se reduce con
+largest-triangle-three-buckets (LTTB) a unos pocos puntos por píxel de ancho. LTTB conserva los picos y
+valles que un promedio o un muestreo regular perderían.
+
+Este módulo no importa tkinter, así que puede probarse sin pantalla.
+"""
+
+import math
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+from almacenamiento import columnas_lectura
+from base_datos import obtener_motor
+
+
+'''Series del gráfico, en el orden en que se dibujan los paneles, y su título.'''
+
+SERIES_GRAFICO = (
+    ('peso', "Peso (kg)"),
+    ('porcentaje_grasa', "Grasa (%)"),
+    ('masa_muscular', "Masa muscular (kg)"),
+)
+
+
+def recuperar_series(nombre, motor=None):
+
+    """Lee las series del gráfico de un cliente, en orden de fecha, usando el índice (nombre, fecha).
+
+        Args:
+            nombre (str): Nombre del cliente.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            dict: 'fecha' (segundos desde la época, float64) y un array float64 por serie de SERIES_GRAFICO.
+        """
+    campos = ('fecha',) + tuple(serie for serie, _ in SERIES_GRAFICO)
+    motor = motor or obtener_motor()
+    tabla, columnas, completar = columnas_lectura(campos, motor)
+    consulta = select(*columnas).where(tabla.c.nombre == nombre).order_by(tabla.c.fecha, tabla.c.id)
+    with motor.connect() as conexion:
+        filas = completar(conexion.execute(consulta).all())
+    series = {campo: np.array([getattr(fila, campo) for fila in filas], dtype=np.float64) for campo in campos[1:]}
+    series['fecha'] = np.array([fila.fecha.timestamp() for fila in filas], dtype=np.float64)
+    return series
+
+
+def lttb(x, y, umbral):
+
+    """Elige los puntos de una serie que mejor conservan su forma (largest-triangle-three-buckets).
+
+        El primer y el último punto se conservan; el resto se reparte en umbral - 2 intervalos de tamaño
+        parecido y de cada uno se elige el punto que forma el triángulo de mayor área con el punto elegido
+        en el intervalo anterior y la media del siguiente.
+
+        Args:
+            x (numpy.ndarray): Abscisas en orden creciente.
+            y (numpy.ndarray): Ordenadas.
+            umbral (int): Número de puntos deseado.
+
+        Returns:
+            numpy.ndarray: Índices de los puntos elegidos, en orden creciente; todos si hay umbral o menos.
+        """
+    n = len(x)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+    # limites[i] es el primer índice del intervalo i; el último intervalo es solo el punto final
+    limites = np.minimum(np.arange(umbral) * (n - 2) // (umbral - 2) + 1, n)
+    cuentas = np.diff(limites)
+    medias_x = np.add.reduceat(x, limites[:-1]) / cuentas
+    medias_y = np.add.reduceat(y, limites[:-1]) / cuentas
+
+    indices = np.empty(umbral, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(umbral - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        cx, cy = medias_x[i + 1], medias_y[i + 1]
+        areas = np.abs((x[a] - cx) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (cy - y[a]))
+        a = inicio + int(areas.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def tramo_visible(x, desde, hasta):
+
+    """Devuelve el rango de índices de los puntos entre dos abscisas, más uno a cada lado.
+
+        El punto anterior y el posterior hacen que la línea llegue hasta los bordes del gráfico.
+
+        Args:
+            x (numpy.ndarray): Abscisas en orden creciente.
+            desde (float): Primera abscisa visible.
+            hasta (float): Última abscisa visible.
+
+        Returns:
+            tuple: (inicio, fin) para usar como x[inicio:fin].
+        """
+    inicio = max(int(np.searchsorted(x, desde, side='left')) - 1, 0)
+    fin = min(int(np.searchsorted(x, hasta, side='right')) + 1, len(x))
+    return inicio, fin
+
+
+def reducir_serie(x, y, desde, hasta, puntos):
+
+    """Selecciona los puntos a dibujar de una serie en la ventana [desde, hasta].
+
+        Args:
+            x (numpy.ndarray): Abscisas en orden creciente.
+            y (numpy.ndarray): Ordenadas.
+            desde (float): Primera abscisa visible.
+            hasta (float): Última abscisa visible.
+            puntos (int): Número máximo de puntos, normalmente proporcional al ancho en píxeles.
+
+        Returns:
+            tuple: (x, y) de los puntos elegidos.
+        """
+    inicio, fin = tramo_visible(x, desde, hasta)
+    x, y = x[inicio:fin], y[inicio:fin]
+    indices = lttb(x, y, puntos)
+    return x[indices], y[indices]
+
+
+def marcas_eje(minimo, maximo, cantidad=5):
+
+    """Calcula marcas redondas (1, 2 o 5 por una potencia de diez) para un eje numérico.
+
+        Args:
+            minimo (float): Valor mínimo del eje.
+            maximo (float): Valor máximo del eje.
+            cantidad (int): Número aproximado de marcas.
+
+        Returns:
+            list: Valores de las marcas dentro de [minimo, maximo].
+        """
+    if not maximo > minimo:
+        return [minimo]
+    paso_aproximado = (maximo - minimo) / max(cantidad, 1)
+    potencia = 10 ** math.floor(math.log10(paso_aproximado))
+    # Las tolerancias evitan que un error de redondeo (0.06 / 3 = 0.019999...) cambie el paso o la primera marca
+    paso = next(m * potencia for m in (1, 2, 5, 10) if m * potencia >= paso_aproximado * (1 - 1e-9))
+    primera = math.ceil(minimo / paso - 1e-9) * paso
+    return [round(primera + i * paso, 10) for i in range(int((maximo - primera) / paso + 1e-9) + 1)]
+
+
+def formato_fecha_eje(desde, hasta):
+
+    """Elige el formato de las fechas del eje horizontal según el intervalo visible (en segundos)."""
+    dias = (hasta - desde) / 86400
+    if dias <= 3:
+        return '%d/%m %H:%M'
+    if dias <= 400:
+        return '%d/%m/%y'
+    return '%m/%Y'
+
+
+def etiqueta_fecha(segundos, formato):
+
+    """Convierte una abscisa del gráfico en el texto de su fecha."""
+    return datetime.fromtimestamp(segundos).strftime(formato)
@@ -0,0 +1,259 @@
+"""Análisis de composición corporal como grafo de dependencias con valores memorizados.
+
+Cada métrica es un nodo cuyas dependencias son los nombres de los parámetros de su función
+(tmb ← peso, altura, edad, genero; calorias_diarias ← tmb, objetivo; proteinas ← macronutrientes ←
+calorias_diarias, objetivo...). GrafoAnalisis guarda el último valor de cada nodo y, al cambiar una
+entrada, solo recalcula los nodos que dependen de ella; si un nodo recalculado no cambia, sus
+dependientes tampoco se recalculan. Cambiar el objetivo, por ejemplo, solo recalcula las calorías y
+los macronutrientes.
+
+Los nodos replican paso a paso calculadora.analizar, con los mismos redondeos, de modo que
+GrafoAnalisis.resultado devuelve el mismo ResultadoAnalisis. La interfaz lo usa para recalcular
+mientras se escribe (ver MainApplication.programar_recalculo en main.py).
+"""
+
+import inspect
+from datetime import datetime
+from graphlib import TopologicalSorter
+
+from calculadora import (
+    OBJETIVOS, ResultadoAnalisis, calcular_agua_total, calcular_calorias_diarias, calcular_ffmi, calcular_imc,
+    calcular_macronutrientes, calcular_masa_muscular, calcular_peso_saludable, calcular_porcentaje_grasa,
+    calcular_ratio_cintura_altura, calcular_rcc, calcular_tmb, interpretar_ffmi, interpretar_imc,
+    interpretar_porcentaje_grasa, interpretar_ratio_cintura_altura, interpretar_rcc, interpretar_salud
+)
+
+
+ENTRADAS = ('peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello', 'objetivo')
+
+'''Nodos calculados: {nombre: (función, dependencias)}. Se rellena con el decorador _nodo.'''
+
+NODOS = {}
+
+
+def _nodo(funcion):
+    NODOS[funcion.__name__] = (funcion, tuple(inspect.signature(funcion).parameters))
+    return funcion
+
+
+@_nodo
+def cadera_efectiva(cadera, genero):
+    # analizar ignora la cadera de los hombres
+    return cadera if genero == 'm' else 0.0
+
+
+@_nodo
+def tmb(peso, altura, edad, genero):
+    return round(calcular_tmb(peso, altura, edad, genero), 2)
+
+
+@_nodo
+def imc(peso, altura):
+    return round(calcular_imc(peso, altura), 2)
+
+
+@_nodo
+def porcentaje_grasa(cintura, cadera_efectiva, cuello, altura, genero):
+    return round(calcular_porcentaje_grasa(cintura, cadera_efectiva, cuello, altura, genero), 2)
+
+
+@_nodo
+def peso_grasa(porcentaje_grasa, peso):
+    return round((porcentaje_grasa / 100) * peso, 2)
+
+
+@_nodo
+def masa_muscular(peso, porcentaje_grasa):
+    return round(calcular_masa_muscular(peso, porcentaje_grasa), 2)
+
+
+@_nodo
+def ffmi(masa_muscular, altura):
+    return round(calcular_ffmi(masa_muscular, altura), 2)
+
+
+@_nodo
+def agua_total(peso, altura, edad, genero):
+    return round(calcular_agua_total(peso, altura, edad, genero), 2)
+
+
+@_nodo
+def peso_saludable(altura):
+    peso_min, peso_max = calcular_peso_saludable(altura)
+    return round(peso_min, 2), round(peso_max, 2)
+
+
+@_nodo
+def peso_min(peso_saludable):
+    return peso_saludable[0]
+
+
+@_nodo
+def peso_max(peso_saludable):
+    return peso_saludable[1]
+
+
+@_nodo
+def sobrepeso(peso, peso_max):
+    return round(max(0, peso - peso_max), 2)
+
+
+@_nodo
+def rcc(cintura, cadera_efectiva):
+    return round(calcular_rcc(cintura, cadera_efectiva), 2)
+
+
+@_nodo
+def ratio_cintura_altura(cintura, altura):
+    return round(calcular_ratio_cintura_altura(cintura, altura), 2)
+
+
+@_nodo
+def calorias_diarias(tmb, objetivo):
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo no válido: {objetivo!r}")
+    return round(calcular_calorias_diarias(tmb, objetivo), 2)
+
+
+@_nodo
+def macronutrientes(calorias_diarias, objetivo):
+    return tuple(round(gramos, 2) for gramos in calcular_macronutrientes(calorias_diarias, objetivo))
+
+
+@_nodo
+def proteinas(macronutrientes):
+    return macronutrientes[0]
+
+
+@_nodo
+def carbohidratos(macronutrientes):
+    return macronutrientes[1]
+
+
+@_nodo
+def grasas(macronutrientes):
+    return macronutrientes[2]
+
+
+@_nodo
+def interpretacion_imc(imc, ffmi, genero):
+    return interpretar_imc(imc, ffmi, genero)
+
+
+@_nodo
+def interpretacion_porcentaje_grasa(porcentaje_grasa, genero):
+    return interpretar_porcentaje_grasa(porcentaje_grasa, genero)
+
+
+@_nodo
+def interpretacion_ffmi(ffmi, genero):
+    return interpretar_ffmi(ffmi, genero)
+
+
+@_nodo
+def interpretacion_rcc(rcc, genero):
+    return interpretar_rcc(rcc, genero) if rcc != 0.0 else "N/A"
+
+
+@_nodo
+def interpretacion_ratio_cintura_altura(ratio_cintura_altura):
+    return interpretar_ratio_cintura_altura(ratio_cintura_altura)
+
+
+@_nodo
+def mensaje_salud(porcentaje_grasa, genero):
+    return interpretar_salud(porcentaje_grasa, genero)
+
+
+'''Orden topológico de los nodos calculados y dependientes directos de cada entrada o nodo.'''
+
+ORDEN = tuple(nombre for nombre in TopologicalSorter({n: d for n, (_, d) in NODOS.items()}).static_order()
+              if nombre in NODOS)
+DEPENDIENTES = {nombre: tuple(n for n in ORDEN if nombre in NODOS[n][1]) for nombre in ENTRADAS + ORDEN}
+
+
+def afectados(entradas):
+
+    """Devuelve los nodos que dependen (directa o indirectamente) de alguna de las entradas indicadas.
+
+        Args:
+            entradas (iterable): Nombres de entradas o nodos.
+
+        Returns:
+            set: Nombres de los nodos afectados, sin incluir las propias entradas.
+        """
+    pendientes = list(entradas)
+    resultado = set()
+    while pendientes:
+        for dependiente in DEPENDIENTES[pendientes.pop()]:
+            if dependiente not in resultado:
+                resultado.add(dependiente)
+                pendientes.append(dependiente)
+    return resultado
+
+
+class GrafoAnalisis:
+    """Estado de un análisis que se actualiza de forma incremental al cambiar las entradas.
+
+        Un nodo vale None si falta alguna de sus dependencias o si su cálculo no es posible con las
+        entradas actuales (por ejemplo, un cuello mayor que la cintura); así se puede recalcular con los
+        campos a medio escribir.
+
+        Atributos:
+            valores (dict): Valor actual de cada entrada y de cada nodo.
+            calculos (int): Nodos evaluados desde la creación del grafo (para diagnóstico y pruebas).
+        """
+
+    def __init__(self):
+        self.valores = dict.fromkeys(ENTRADAS + ORDEN)
+        self.calculos = 0
+
+    def asignar(self, **entradas):
+
+        """Cambia entradas del análisis y recalcula solo los nodos afectados.
+
+            Args:
+                **entradas: Valores nuevos de entradas de ENTRADAS; None si el campo no es válido.
+
+            Returns:
+                set: Entradas y nodos cuyo valor ha cambiado.
+            """
+        cambiados = {nombre for nombre, valor in entradas.items() if self.valores[nombre] != valor}
+        for nombre in cambiados:
+            self.valores[nombre] = entradas[nombre]
+
+        pendientes = afectados(cambiados)
+        for nombre in (n for n in ORDEN if n in pendientes):
+            funcion, dependencias = NODOS[nombre]
+            if not cambiados.intersection(dependencias):
+                continue
+            argumentos = [self.valores[d] for d in dependencias]
+            valor = None
+            if None not in argumentos:
+                self.calculos += 1
+                try:
+                    valor = funcion(*argumentos)
+                except (ArithmeticError, ValueError):
+                    valor = None
+            if valor != self.valores[nombre]:
+                self.valores[nombre] = valor
+                cambiados.add(nombre)
+        return cambiados
+
+    def resultado(self, nombre, fecha=None):
+
+        """Devuelve el análisis completo como ResultadoAnalisis, igual que calculadora.analizar.
+
+            Args:
+                nombre (str): Nombre del cliente.
+                fecha (datetime, opcional): Fecha del análisis; por defecto, el momento actual.
+
+            Returns:
+                ResultadoAnalisis: El análisis, o None si falta alguna métrica.
+            """
+        campos = [c for c in ResultadoAnalisis.__slots__ if c not in ('nombre', 'fecha')]
+        valores = {campo: self.valores[campo] for campo in campos if campo != 'cadera'}
+        valores['cadera'] = self.valores['cadera_efectiva']
+        if None in valores.values():
+            return None
+        return ResultadoAnalisis(nombre=nombre, fecha=fecha or datetime.now(), **valores)
@@ -0,0 +1,395 @@
+"""Importación masiva de archivos de mediciones (CSV o JSON Lines) a la tabla clientes.
+
+Cada registro trae los datos de entrada de un análisis: nombre, fecha, peso, altura, edad, genero, cintura,
+cadera, cuello y objetivo. El archivo se lee por bloques; cada bloque se valida y se analiza con
+calculadora.analizar en un grupo de procesos, y las filas resultantes se insertan en bloque desde el proceso
+principal. Los registros no válidos se escriben, con el motivo, en un archivo CSV de rechazos que se puede
+corregir y volver a importar.
+
+El avance se guarda en la tabla importaciones en la misma transacción que cada bloque, de modo que una
+importación interrumpida continúa donde se quedó, y volver a importar un archivo ya completado no duplica
+nada:
+
+    python importador.py mediciones.csv --rechazos rechazos.csv
+"""
+
+import argparse
+import csv
+import functools
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from itertools import islice
+
+from calculadora import OBJETIVOS, analizar, configurar_sqlite_rendimiento
+from estadisticas import actualizar_estadisticas
+from almacenamiento import insertar
+from base_datos import obtener_motor
+from models import Importacion
+
+
+'''Campos de entrada de cada registro, en el orden en que se escriben en el archivo de rechazos.'''
+
+CAMPOS_IMPORTACION = ('nombre', 'fecha', 'peso', 'altura', 'edad', 'genero', 'cintura', 'cadera', 'cuello',
+                      'objetivo')
+
+FORMATOS_FECHA = ('%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y')
+
+
+@functools.lru_cache(maxsize=256)
+def _normalizar_clave(clave):
+    # 'Género ' -> 'genero', para aceptar las cabeceras tal como las escriben las hojas de cálculo
+    sin_tildes = unicodedata.normalize('NFKD', str(clave)).encode('ascii', 'ignore').decode('ascii')
+    return sin_tildes.strip().lower().replace(' ', '_')
+
+
+def formato_por_extension(ruta):
+
+    """Deduce el formato del archivo de mediciones: 'jsonl' para .jsonl y .json, 'csv' en otro caso."""
+    return 'jsonl' if ruta.lower().endswith(('.jsonl', '.json')) else 'csv'
+
+
+def iterar_registros(ruta, formato=None):
+
+    """Lee un archivo de mediciones registro a registro, sin cargarlo entero en memoria.
+
+        Args:
+            ruta (str): Archivo CSV (con cabecera) o JSON Lines.
+            formato (str, opcional): 'csv' o 'jsonl'; por defecto se deduce de la extensión.
+
+        Yields:
+            tuple: (línea, registro), como leer_registros.
+        """
+    formato = formato or formato_por_extension(ruta)
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        yield from leer_registros(archivo, formato)
+
+
+def leer_registros(archivo, formato):
+
+    """Lee registros de mediciones de un archivo de texto ya abierto (por ejemplo, la entrada estándar).
+
+        Args:
+            archivo (io.TextIOBase): Archivo abierto con newline='' para que el CSV respete los saltos de línea
+                entre comillas.
+            formato (str): 'csv' (con cabecera) o 'jsonl'.
+
+        Yields:
+            tuple: (línea, registro), con el número de línea en el archivo y un diccionario cuyas claves
+                se han normalizado (minúsculas, sin tildes).
+        """
+    if formato not in ('csv', 'jsonl'):
+        raise ValueError(f"Formato de importación no válido: {formato!r}")
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for registro in lector:
+            yield lector.line_num, {_normalizar_clave(k): v for k, v in registro.items() if k is not None}
+    else:
+        for linea, texto in enumerate(archivo, start=1):
+            if not texto.strip():
+                continue
+            try:
+                registro = json.loads(texto)
+            except json.JSONDecodeError as e:
+                registro = {'_error': f"JSON no válido: {e.msg}"}
+            if not isinstance(registro, dict):
+                registro = {'_error': "Cada línea debe ser un objeto JSON"}
+            yield linea, {_normalizar_clave(k): v for k, v in registro.items()}
+
+
+def _numero(registro, campo, tipo=float):
+    valor = registro.get(campo)
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        raise ValueError(f"Falta el campo '{campo}'")
+    if isinstance(valor, str):
+        valor = valor.strip().replace(',', '.')
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"El campo '{campo}' no es numérico: {registro.get(campo)!r}") from None
+    if not math.isfinite(numero) or numero <= 0:
+        raise ValueError(f"El campo '{campo}' debe ser un número mayor que cero")
+    if tipo is int:
+        # Se admite 30.0 (las hojas de cálculo guardan así los enteros), pero no se trunca 30.9
+        if not numero.is_integer():
+            raise ValueError(f"El campo '{campo}' debe ser un número entero: {registro.get(campo)!r}")
+        return int(numero)
+    return tipo(numero)
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor
+    if valor is None or not str(valor).strip():
+        raise ValueError("Falta el campo 'fecha'")
+    texto = str(valor).strip()
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        pass
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha no válida: {texto!r}")
+
+
+def convertir_registro(registro):
+
+    """Valida un registro leído del archivo y lo convierte en argumentos para calculadora.analizar.
+
+        Acepta comas decimales y fechas ISO o dd/mm/aaaa. La cadera solo es obligatoria en mujeres.
+
+        Args:
+            registro (dict): Registro con claves normalizadas, como lo devuelve iterar_registros.
+
+        Returns:
+            dict: Argumentos de analizar, con los tipos ya convertidos.
+
+        Raises:
+            ValueError: Si falta un campo o algún valor no es válido.
+        """
+    if '_error' in registro:
+        raise ValueError(registro['_error'])
+    nombre = str(registro.get('nombre') or '').strip()
+    if not nombre:
+        raise ValueError("Falta el campo 'nombre'")
+    genero = str(registro.get('genero') or '').strip().lower()
+    if genero not in ('h', 'm'):
+        raise ValueError(f"Género no válido: {registro.get('genero')!r}")
+    objetivo = str(registro.get('objetivo') or '').strip().lower()
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo no válido: {registro.get('objetivo')!r}")
+    return {
+        'nombre': nombre,
+        'fecha': _fecha(registro.get('fecha')),
+        'peso': _numero(registro, 'peso'),
+        'altura': _numero(registro, 'altura'),
+        'edad': _numero(registro, 'edad', int),
+        'genero': genero,
+        'cintura': _numero(registro, 'cintura'),
+        'cadera': _numero(registro, 'cadera') if genero == 'm' else 0.0,
+        'cuello': _numero(registro, 'cuello'),
+        'objetivo': objetivo,
+    }
+
+
+def analizar_bloque(bloque):
+
+    """Valida y analiza un bloque de registros; se ejecuta en los procesos del grupo.
+
+        Args:
+            bloque (list): Tuplas (línea, registro) de iterar_registros.
+
+        Returns:
+            tuple: (resultados, rechazos). resultados son los ResultadoAnalisis de los registros válidos;
+                rechazos son tuplas (línea, registro, motivo).
+        """
+    resultados = []
+    rechazos = []
+    for linea, registro in bloque:
+        try:
+            resultados.append(analizar(**convertir_registro(registro)))
+        except (ValueError, ZeroDivisionError, OverflowError) as e:
+            rechazos.append((linea, registro, str(e)))
+    return resultados, rechazos
+
+
+def procesar_bloque(bloque):
+
+    """Como analizar_bloque, pero devuelve directamente las columnas de Cliente (y el objetivo), que pesan menos
+        entre procesos."""
+    resultados, rechazos = analizar_bloque(bloque)
+    return [resultado.datos_guardado() for resultado in resultados], rechazos
+
+
+def calcular_huella(ruta, tamano_bloque=1 << 20):
+
+    """Calcula el SHA-256 del contenido de un archivo, que identifica su importación en la tabla importaciones."""
+    huella = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for trozo in iter(lambda: archivo.read(tamano_bloque), b''):
+            huella.update(trozo)
+    return huella.hexdigest()
+
+
+def procesar_por_bloques(registros, funcion, tamano_bloque, procesos):
+
+    """Aplica funcion a bloques consecutivos de registros, en un grupo de procesos si procesos > 1.
+
+        Los resultados salen en el mismo orden que los bloques y nunca hay más de dos bloques por proceso
+        en vuelo, así que la memoria no depende del número de registros. Los procesos se crean con el
+        método 'spawn', que es seguro aunque la aplicación tenga otros hilos (Tk, TrabajadorBD).
+
+        Args:
+            registros (iterable): Registros a procesar.
+            funcion (callable): Función de nivel de módulo que recibe una lista de registros.
+            tamano_bloque (int): Registros por bloque.
+            procesos (int): Procesos del grupo; con 1 o menos, todo se procesa en el proceso actual.
+
+        Yields:
+            tuple: (registros del bloque, resultado de funcion para ese bloque).
+        """
+    if tamano_bloque < 1:
+        raise ValueError("tamano_bloque debe ser mayor que cero")
+    registros = iter(registros)
+    bloques = iter(lambda: list(islice(registros, tamano_bloque)), [])
+    if procesos <= 1:
+        for bloque in bloques:
+            yield len(bloque), funcion(bloque)
+        return
+
+    ejecutor = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'))
+    en_vuelo = deque()
+    try:
+        while True:
+            while len(en_vuelo) < 2 * procesos:
+                bloque = next(bloques, None)
+                if bloque is None:
+                    break
+                en_vuelo.append((len(bloque), ejecutor.submit(funcion, bloque)))
+            if not en_vuelo:
+                return
+            leidos, futuro = en_vuelo.popleft()
+            yield leidos, futuro.result()
+    finally:
+        ejecutor.shutdown(wait=True, cancel_futures=True)
+
+
+def abrir_rechazos(archivo):
+
+    """Prepara un escritor CSV de rechazos sobre un archivo abierto, escribiendo la cabecera si está vacío."""
+    escritor = csv.DictWriter(archivo, fieldnames=('linea', 'motivo') + CAMPOS_IMPORTACION)
+    if archivo.tell() == 0:
+        escritor.writeheader()
+    return escritor
+
+
+def escribir_rechazos(escritor, rechazos):
+
+    """Escribe los rechazos de analizar_bloque o procesar_bloque con el escritor de abrir_rechazos."""
+    for linea, registro, motivo in rechazos:
+        fila = {campo: registro.get(campo, '') for campo in CAMPOS_IMPORTACION}
+        escritor.writerow({'linea': linea, 'motivo': motivo, **fila})
+
+
+def importar_archivo(ruta, formato=None, ruta_rechazos=None, tamano_bloque=2000, procesos=None, progreso=None,
+                     cancelar=None, motor=None):
+
+    """Importa un archivo de mediciones a la tabla clientes, reanudando si ya se había empezado.
+
+        Los bloques se analizan en paralelo (ver procesar_por_bloques) pero se guardan en orden, cada uno
+        en su propia transacción junto con el avance en la tabla importaciones.
+
+        Args:
+            ruta (str): Archivo CSV o JSON Lines con los datos de entrada.
+            formato (str, opcional): 'csv' o 'jsonl'; por defecto se deduce de la extensión.
+            ruta_rechazos (str, opcional): Archivo CSV donde se añaden los registros rechazados;
+                por defecto, ruta + '.rechazos.csv'.
+            tamano_bloque (int): Registros por bloque.
+            procesos (int, opcional): Procesos del grupo; por defecto, uno por CPU. Con 1 o menos se
+                procesa todo en el proceso actual.
+            progreso (callable, opcional): Se llama con el total de registros procesados tras cada bloque.
+            cancelar (threading.Event, opcional): Si se activa, la importación se detiene tras el bloque en
+                curso y puede reanudarse más tarde.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            dict: Totales de la importación: 'procesados', 'importados', 'rechazados', 'omitidos'
+                (registros ya procesados en una ejecución anterior) y 'completada'.
+        """
+    motor = motor or obtener_motor()
+    ruta_rechazos = ruta_rechazos or ruta + '.rechazos.csv'
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    huella = calcular_huella(ruta)
+    tabla = Importacion.__table__
+
+    with motor.begin() as conexion:
+        estado = conexion.execute(tabla.select().where(tabla.c.huella == huella)).first()
+        if estado is None:
+            conexion.execute(tabla.insert().values(huella=huella, archivo=os.path.abspath(ruta),
+                                                   actualizada=datetime.now()))
+            estado = conexion.execute(tabla.select().where(tabla.c.huella == huella)).first()
+    omitidos = estado.registros_procesados
+    totales = {'procesados': omitidos, 'importados': estado.importados, 'rechazados': estado.rechazados,
+               'omitidos': omitidos, 'completada': estado.completada}
+    if estado.completada:
+        return totales
+
+    registros = islice(iterar_registros(ruta, formato), omitidos, None)
+    cancelado = False
+    with open(ruta_rechazos, 'a', encoding='utf-8', newline='') as archivo_rechazos, \
+            closing(procesar_por_bloques(registros, procesar_bloque, tamano_bloque, procesos)) as bloques:
+        escritor = abrir_rechazos(archivo_rechazos)
+        for leidos, (filas, rechazos) in bloques:
+            # Los rechazos se escriben antes de confirmar el bloque: si se interrumpe justo entre
+            # ambos pasos, al reanudar pueden repetirse en el archivo de rechazos, pero nunca perderse.
+            escribir_rechazos(escritor, rechazos)
+            archivo_rechazos.flush()
+
+            totales['procesados'] += leidos
+            totales['importados'] += len(filas)
+            totales['rechazados'] += len(rechazos)
+            with motor.connect() as conexion:
+                configurar_sqlite_rendimiento(conexion)
+                if filas:
+                    insertar(conexion, filas)
+                    actualizar_estadisticas(conexion, filas)
+                conexion.execute(tabla.update().where(tabla.c.huella == huella).values(
+                    archivo=os.path.abspath(ruta), registros_procesados=totales['procesados'],
+                    importados=totales['importados'], rechazados=totales['rechazados'],
+                    actualizada=datetime.now()))
+                conexion.commit()
+
+            if progreso is not None:
+                progreso(totales['procesados'])
+            if cancelar is not None and cancelar.is_set():
+                cancelado = True
+                break
+
+    if not cancelado:
+        with motor.begin() as conexion:
+            conexion.execute(tabla.update().where(tabla.c.huella == huella).values(
+                completada=True, actualizada=datetime.now()))
+        totales['completada'] = True
+    return totales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa un archivo de mediciones a clientes.db.")
+    parser.add_argument('archivo', help="Archivo CSV o JSON Lines")
+    parser.add_argument('--formato', choices=('csv', 'jsonl'),
+                        help="Formato del archivo (por defecto, según la extensión)")
+    parser.add_argument('--rechazos', help="Archivo CSV de rechazos (por defecto, <archivo>.rechazos.csv)")
+    parser.add_argument('--bloque', type=int, default=2000, help="Registros por bloque")
+    parser.add_argument('--procesos', type=int, help="Procesos de cálculo (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+
+    def mostrar_progreso(procesados):
+        print(f"\r{procesados} registros procesados", end='', file=sys.stderr, flush=True)
+
+    totales = importar_archivo(args.archivo, args.formato, args.rechazos, args.bloque, args.procesos,
+                               progreso=mostrar_progreso)
+    print(file=sys.stderr)
+    if totales['completada'] and totales['procesados'] == totales['omitidos']:
+        print("El archivo ya se había importado por completo; no se ha guardado nada nuevo.")
+        return 0
+    if totales['omitidos']:
+        print(f"Reanudada: se omitieron {totales['omitidos']} registros ya procesados.")
+    print(f"Importados: {totales['importados']}, rechazados: {totales['rechazados']}.")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
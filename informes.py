@@ -0,0 +1,227 @@
+"""Informes HTML imprimibles de cada cliente, generados por lotes con plantillas Jinja2.
+
+Cada informe muestra la última medición del cliente con las interpretaciones de calculadora.py, su
+nutrición y la evolución de todas sus visitas. La plantilla (plantillas/informe_cliente.html) incluye
+una hoja de estilos para imprimir, así que el navegador puede imprimir o guardar en PDF cada informe.
+
+Las mediciones se leen ordenadas por nombre con el índice (nombre, fecha) y se agrupan por cliente sin
+cargar el historial completo. Los clientes se reparten por bloques entre un grupo de procesos (ver
+importador.procesar_por_bloques); cada proceso compila la plantilla una sola vez, la guarda también
+compilada en la caché de bytecode de Jinja2 para las siguientes ejecuciones, y escribe cada informe en
+el disco en cuanto lo genera. El proceso principal solo recibe el número de informes escritos:
+
+    python informes.py informes/ --desde 2024-06-01 --procesos 4
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import re
+import sys
+import unicodedata
+from contextlib import closing
+from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, StrictUndefined, select_autoescape
+from sqlalchemy import select
+
+from almacenamiento import columnas_lectura
+from base_datos import obtener_motor
+from calculadora import (
+    calcular_imc, interpretar_ffmi, interpretar_imc, interpretar_porcentaje_grasa, interpretar_ratio_cintura_altura,
+    interpretar_rcc, interpretar_salud
+)
+from exportador import CAMPOS_EXPORTACION
+from importador import procesar_por_bloques
+
+
+DIRECTORIO_PLANTILLAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plantillas')
+PLANTILLA_INFORME = 'informe_cliente.html'
+
+GENEROS = {'h': 'Hombre', 'm': 'Mujer'}
+
+
+def _formatear_numero(valor, decimales=2):
+    return '-' if valor is None else f"{valor:.{decimales}f}"
+
+
+def _formatear_fecha(valor):
+    return valor.strftime('%d/%m/%Y') if valor is not None else '-'
+
+
+@functools.lru_cache(maxsize=None)
+def cargar_plantilla(directorio=DIRECTORIO_PLANTILLAS, nombre=PLANTILLA_INFORME):
+
+    """Devuelve la plantilla compilada, creando el entorno de Jinja2 una sola vez por proceso.
+
+        La caché de bytecode (en el directorio temporal del sistema) evita volver a compilar la plantilla
+        en cada proceso y en cada ejecución mientras el archivo no cambie.
+
+        Args:
+            directorio (str): Directorio de las plantillas.
+            nombre (str): Archivo de la plantilla dentro del directorio.
+
+        Returns:
+            jinja2.Template: La plantilla.
+        """
+    entorno = Environment(
+        loader=FileSystemLoader(directorio), autoescape=select_autoescape(), undefined=StrictUndefined,
+        bytecode_cache=FileSystemBytecodeCache(), auto_reload=False, trim_blocks=True, lstrip_blocks=True)
+    entorno.filters.update(numero=_formatear_numero, fecha=_formatear_fecha)
+    entorno.globals['generos'] = GENEROS
+    return entorno.get_template(nombre)
+
+
+def contexto_informe(nombre, filas):
+
+    """Prepara las variables de la plantilla para un cliente.
+
+        Args:
+            nombre (str): Nombre del cliente.
+            filas (list): Diccionarios con las columnas de CAMPOS_EXPORTACION, en orden de fecha.
+
+        Returns:
+            dict: nombre, ultima (la última medición), imc, interpretaciones e historial.
+        """
+    ultima = filas[-1]
+    genero = ultima['genero']
+    imc = round(calcular_imc(ultima['peso'], ultima['altura']), 2)
+    interpretaciones = {
+        'imc': interpretar_imc(imc, ultima['ffmi'], genero),
+        'porcentaje_grasa': interpretar_porcentaje_grasa(ultima['porcentaje_grasa'], genero),
+        'ffmi': interpretar_ffmi(ultima['ffmi'], genero),
+        'rcc': interpretar_rcc(ultima['rcc'], genero) if ultima['rcc'] else "N/A",
+        'ratio_cintura_altura': interpretar_ratio_cintura_altura(ultima['ratio_cintura_altura']),
+        'salud': interpretar_salud(ultima['porcentaje_grasa'], genero),
+    }
+    return {'nombre': nombre, 'ultima': ultima, 'imc': imc, 'interpretaciones': interpretaciones, 'historial': filas}
+
+
+def renderizar_bloque(directorio_plantillas, bloque):
+
+    """Escribe los informes de un bloque de clientes; se ejecuta en los procesos del grupo.
+
+        Args:
+            directorio_plantillas (str): Directorio de la plantilla.
+            bloque (list): Tuplas (ruta de destino, nombre, filas del cliente).
+
+        Returns:
+            int: Informes escritos.
+        """
+    plantilla = cargar_plantilla(directorio_plantillas)
+    for ruta, nombre, filas in bloque:
+        # Un informe ocupa unos KB: generarlo entero es más rápido que ir volcando cada fragmento
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(plantilla.render(contexto_informe(nombre, filas)))
+    return len(bloque)
+
+
+def nombre_archivo(nombre, usados):
+
+    """Convierte el nombre de un cliente en un nombre de archivo sin tildes ni espacios, único en usados.
+
+        Args:
+            nombre (str): Nombre del cliente, por ejemplo 'María García'.
+            usados (set): Nombres de archivo ya asignados; se añade el nuevo.
+
+        Returns:
+            str: Por ejemplo 'maria-garcia.html', o 'maria-garcia-2.html' si ya estaba usado.
+        """
+    base = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+    base = re.sub(r'[^a-z0-9]+', '-', base.lower()).strip('-') or 'cliente'
+    candidato, n = base, 1
+    while candidato in usados:
+        n += 1
+        candidato = f"{base}-{n}"
+    usados.add(candidato)
+    return candidato + '.html'
+
+
+def iterar_clientes(nombre=None, desde=None, tamano_bloque=1000, motor=None):
+
+    """Recorre las mediciones agrupadas por cliente, leyendo de la base de datos un bloque cada vez.
+
+        Args:
+            nombre (str, opcional): Limita el recorrido a un cliente.
+            desde (datetime, opcional): Solo los clientes con alguna medición desde esa fecha (incluida);
+                de ellos se devuelve el historial completo.
+            tamano_bloque (int): Filas que se leen de la base de datos en cada bloque.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Yields:
+            tuple: (nombre, lista de diccionarios con las columnas de CAMPOS_EXPORTACION en orden de fecha).
+        """
+    motor = motor or obtener_motor()
+    tabla, columnas, completar = columnas_lectura(CAMPOS_EXPORTACION, motor)
+    consulta = select(*columnas).order_by(tabla.c.nombre, tabla.c.fecha, tabla.c.id)
+    if nombre is not None:
+        consulta = consulta.where(tabla.c.nombre == nombre)
+    if desde is not None:
+        consulta = consulta.where(tabla.c.nombre.in_(select(tabla.c.nombre).where(tabla.c.fecha >= desde)))
+
+    with motor.connect() as conexion:
+        resultado = conexion.execution_options(yield_per=tamano_bloque).execute(consulta)
+        filas = (fila._asdict() for bloque in resultado.partitions() for fila in completar(bloque))
+        for cliente, grupo in groupby(filas, key=itemgetter('nombre')):
+            yield cliente, list(grupo)
+
+
+def generar_informes(directorio, nombre=None, desde=None, procesos=None, clientes_por_bloque=50,
+                     directorio_plantillas=DIRECTORIO_PLANTILLAS, maximo=None, progreso=None, motor=None):
+
+    """Genera un informe HTML por cliente en un directorio.
+
+        Args:
+            directorio (str): Directorio de destino; se crea si no existe y los informes se sobrescriben.
+            nombre (str, opcional): Genera solo el informe de un cliente.
+            desde (datetime, opcional): Solo los clientes con alguna medición desde esa fecha.
+            procesos (int, opcional): Procesos de renderizado; por defecto, uno por CPU.
+            clientes_por_bloque (int): Clientes que se envían juntos a cada proceso.
+            directorio_plantillas (str): Directorio con informe_cliente.html.
+            maximo (int, opcional): Número máximo de informes.
+            progreso (callable, opcional): Recibe el número de informes escritos tras cada bloque.
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+        Returns:
+            int: Informes escritos.
+        """
+    os.makedirs(directorio, exist_ok=True)
+    # Compila la plantilla antes de lanzar los procesos para que un error se vea enseguida
+    cargar_plantilla(directorio_plantillas)
+    usados = set()
+    tareas = ((os.path.join(directorio, nombre_archivo(cliente, usados)), cliente, filas)
+              for cliente, filas in islice(iterar_clientes(nombre, desde, motor=motor), maximo))
+    funcion = functools.partial(renderizar_bloque, directorio_plantillas)
+    escritos = 0
+    procesos = procesos or os.cpu_count() or 1
+    with closing(procesar_por_bloques(tareas, funcion, clientes_por_bloque, procesos)) as bloques:
+        for _, n in bloques:
+            escritos += n
+            if progreso is not None:
+                progreso(escritos)
+    return escritos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un informe HTML imprimible por cliente.")
+    parser.add_argument('directorio', help="Directorio donde se escriben los informes")
+    parser.add_argument('--cliente', help="Genera solo el informe de este cliente")
+    parser.add_argument('--desde', type=datetime.fromisoformat,
+                        help="Solo clientes con alguna medición desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument('--procesos', type=int, help="Procesos de renderizado (por defecto, uno por CPU)")
+    parser.add_argument('--plantillas', default=DIRECTORIO_PLANTILLAS,
+                        help="Directorio con una plantilla informe_cliente.html propia")
+    args = parser.parse_args(argv)
+
+    escritos = generar_informes(args.directorio, args.cliente, args.desde, args.procesos,
+                                directorio_plantillas=args.plantillas)
+    print(f"Informes generados: {escritos}.")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""Contadores e histogramas de latencia de las operaciones principales de la aplicación.
+
+Las funciones marcadas con @instrumentar (calcular, guardar_datos, guardar_lote, recuperar_historial y
+las páginas del historial, exportar_historial, autenticar y el cifrado con bcrypt) registran, para cada
+operación, el número de llamadas, los errores, las filas procesadas y un histograma de la duración. Mientras la instrumentación
+está desactivada cada llamada solo comprueba un atributo, así que el coste es despreciable.
+
+Se activa con la variable de entorno COACHBODYMETRICS_METRICAS=1 o desde la ventana de diagnóstico.
+Si además se indica COACHBODYMETRICS_METRICAS_ARCHIVO, las métricas se guardan en ese archivo al cerrar
+la aplicación: en formato JSON si termina en .json y en el formato de texto de Prometheus si no. También
+pueden consultarse en formato Prometheus en la ruta /metricas de la API (servidor.py).
+
+Este módulo solo usa la biblioteca estándar para que pueda importarse durante el arranque.
+"""
+
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+RUTA_VOLCADO = os.environ.get('COACHBODYMETRICS_METRICAS_ARCHIVO')
+ACTIVA = os.environ.get('COACHBODYMETRICS_METRICAS', '') not in ('', '0') or bool(RUTA_VOLCADO)
+
+'''Límites superiores (en segundos) de los intervalos del histograma de latencia; el último intervalo no
+tiene límite. Cubren desde una fórmula (microsegundos) hasta una exportación completa (segundos).'''
+
+LIMITES_LATENCIA = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIJO_PROMETHEUS = 'coachbodymetrics'
+
+
+class Histograma:
+    """Histograma de intervalos fijos, con la misma semántica que los de Prometheus.
+
+        Atributos:
+            limites (tuple): Límites superiores de los intervalos, en orden creciente.
+            cuentas (list): Observaciones de cada intervalo (una más que limites, para el desbordamiento).
+            n (int): Número total de observaciones.
+            suma (float): Suma de los valores observados.
+            maximo (float): Valor máximo observado.
+        """
+
+    __slots__ = ('limites', 'cuentas', 'n', 'suma', 'maximo')
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        self.cuentas = [0] * (len(self.limites) + 1)
+        self.n = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        # bisect_left: un valor igual a un límite cuenta en ese intervalo (le="límite" en Prometheus)
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.n += 1
+        self.suma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, q):
+
+        """Estima un percentil interpolando linealmente dentro de su intervalo.
+
+            Args:
+                q (float): Percentil entre 0 y 1.
+
+            Returns:
+                float: Valor estimado, o None si no hay observaciones.
+            """
+        if not self.n:
+            return None
+        objetivo = q * self.n
+        acumuladas = 0
+        for i, cuenta in enumerate(self.cuentas):
+            if cuenta and acumuladas + cuenta >= objetivo:
+                inferior = self.limites[i - 1] if i else 0.0
+                superior = self.limites[i] if i < len(self.limites) else self.maximo
+                return min(inferior + (superior - inferior) * (objetivo - acumuladas) / cuenta, self.maximo)
+            acumuladas += cuenta
+        return self.maximo
+
+
+class Operacion:
+    """Métricas acumuladas de una operación instrumentada.
+
+        Atributos:
+            llamadas (int): Llamadas terminadas (con o sin error).
+            errores (int): Llamadas que han terminado con una excepción.
+            filas (int): Filas procesadas en total (registros guardados, leídos o exportados).
+            latencia (Histograma): Duración de las llamadas, en segundos.
+        """
+
+    __slots__ = ('llamadas', 'errores', 'filas', 'latencia')
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.filas = 0
+        self.latencia = Histograma()
+
+
+class Registro:
+    """Conjunto de operaciones instrumentadas, seguro para usarse desde varios hilos.
+
+        Atributos:
+            activo (bool): Si se registran las llamadas; se puede cambiar en cualquier momento.
+        """
+
+    def __init__(self, activo=False):
+        self.activo = activo
+        self._operaciones = {}
+        self._cerrojo = threading.Lock()
+
+    def registrar(self, nombre, segundos, filas=None, error=False):
+
+        """Añade una llamada terminada a las métricas de una operación.
+
+            Args:
+                nombre (str): Nombre de la operación, por ejemplo 'guardar_datos'.
+                segundos (float): Duración de la llamada.
+                filas (int, opcional): Filas procesadas por la llamada.
+                error (bool): Si la llamada terminó con una excepción.
+            """
+        with self._cerrojo:
+            operacion = self._operaciones.get(nombre)
+            if operacion is None:
+                operacion = self._operaciones[nombre] = Operacion()
+            operacion.llamadas += 1
+            operacion.errores += error
+            operacion.filas += filas or 0
+            operacion.latencia.observar(segundos)
+
+    def reiniciar(self):
+
+        """Descarta todas las métricas registradas."""
+        with self._cerrojo:
+            self._operaciones.clear()
+
+    def resumen(self):
+
+        """Devuelve una copia de las métricas, ordenada por nombre de operación.
+
+            Returns:
+                dict: {operacion: {'llamadas', 'errores', 'filas', 'suma_segundos', 'media_segundos',
+                    'p50_segundos', 'p95_segundos', 'maximo_segundos', 'intervalos'}}; intervalos es una
+                    lista de (límite superior o None, observaciones).
+            """
+        with self._cerrojo:
+            resumen = {}
+            for nombre in sorted(self._operaciones):
+                operacion = self._operaciones[nombre]
+                latencia = operacion.latencia
+                resumen[nombre] = {
+                    'llamadas': operacion.llamadas,
+                    'errores': operacion.errores,
+                    'filas': operacion.filas,
+                    'suma_segundos': latencia.suma,
+                    'media_segundos': latencia.suma / latencia.n if latencia.n else None,
+                    'p50_segundos': latencia.percentil(0.5),
+                    'p95_segundos': latencia.percentil(0.95),
+                    'maximo_segundos': latencia.maximo,
+                    'intervalos': list(zip(latencia.limites + (None,), latencia.cuentas)),
+                }
+            return resumen
+
+    def a_json(self):
+
+        """Devuelve las métricas como texto JSON."""
+        return json.dumps(self.resumen(), indent=2, ensure_ascii=False)
+
+    def a_prometheus(self):
+
+        """Devuelve las métricas en el formato de texto de Prometheus (versión 0.0.4)."""
+        resumen = self.resumen()
+        lineas = []
+        for metrica, campo, ayuda in (('llamadas_total', 'llamadas', "Llamadas terminadas"),
+                                      ('errores_total', 'errores', "Llamadas terminadas con una excepción"),
+                                      ('filas_total', 'filas', "Filas procesadas")):
+            lineas += [f"# HELP {PREFIJO_PROMETHEUS}_{metrica} {ayuda}.",
+                       f"# TYPE {PREFIJO_PROMETHEUS}_{metrica} counter"]
+            lineas += [f'{PREFIJO_PROMETHEUS}_{metrica}{{operacion="{nombre}"}} {datos[campo]}'
+                       for nombre, datos in resumen.items()]
+
+        metrica = f"{PREFIJO_PROMETHEUS}_duracion_segundos"
+        lineas += [f"# HELP {metrica} Duración de las llamadas.", f"# TYPE {metrica} histogram"]
+        for nombre, datos in resumen.items():
+            acumuladas = 0
+            for limite, cuenta in datos['intervalos']:
+                acumuladas += cuenta
+                le = '+Inf' if limite is None else repr(limite)
+                lineas.append(f'{metrica}_bucket{{operacion="{nombre}",le="{le}"}} {acumuladas}')
+            lineas += [f'{metrica}_sum{{operacion="{nombre}"}} {datos["suma_segundos"]!r}',
+                       f'{metrica}_count{{operacion="{nombre}"}} {datos["llamadas"]}']
+        return '\n'.join(lineas) + '\n'
+
+    def volcar(self, ruta):
+
+        """Guarda las métricas en un archivo: JSON si la ruta termina en .json y Prometheus si no.
+
+            Args:
+                ruta (str): Archivo de destino; se sobrescribe.
+            """
+        texto = self.a_json() if ruta.lower().endswith('.json') else self.a_prometheus()
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+
+
+registro = Registro(activo=ACTIVA)
+
+
+def instrumentar(nombre, filas=None):
+
+    """Decorador que registra la duración, los errores y las filas de cada llamada a una función.
+
+        Args:
+            nombre (str): Nombre de la operación en las métricas.
+            filas (callable, opcional): Recibe el resultado de la función y devuelve las filas procesadas.
+
+        Returns:
+            callable: El decorador.
+        """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not registro.activo:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                resultado = funcion(*args, **kwargs)
+            except BaseException:
+                registro.registrar(nombre, time.perf_counter() - inicio, error=True)
+                raise
+            registro.registrar(nombre, time.perf_counter() - inicio, filas(resultado) if filas else None)
+            return resultado
+        return envoltura
+    return decorador
+
+
+@contextlib.contextmanager
+def medir(nombre):
+
+    """Como instrumentar, para un bloque de código: with medir('operacion'): ..."""
+    if not registro.activo:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registro.registrar(nombre, time.perf_counter() - inicio, error=True)
+        raise
+    registro.registrar(nombre, time.perf_counter() - inicio)
+
+
+def volcar_al_salir(ruta=None):
+
+    """Guarda las métricas en RUTA_VOLCADO (o en la ruta indicada) si hay alguna; se llama al cerrar."""
+    ruta = ruta or RUTA_VOLCADO
+    if ruta and registro.activo:
+        registro.volcar(ruta)
+
+
+def formatear_segundos(segundos):
+
+    """Da formato a una duración con la unidad más legible (µs, ms o s); '-' si no hay valor."""
+    if segundos is None:
+        return '-'
+    if segundos < 0.001:
+        return f"{segundos * 1e6:.0f} µs"
+    if segundos < 1:
+        return f"{segundos * 1e3:.1f} ms"
+    return f"{segundos:.2f} s"
+
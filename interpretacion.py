@@ -0,0 +1,132 @@
+"""Tablas de umbrales con las que se interpretan las métricas del análisis.
+
+Cada Escala guarda, por género, los umbrales ordenados a partir de los cuales empieza cada categoría,
+y la etiqueta de cada categoría. Clasificar un valor es una búsqueda binaria que devuelve un código
+entero (0 para la primera categoría); el texto solo se consulta al mostrarlo. Las funciones
+interpretar_* de calculadora.py usan estas tablas con bisect y calculadora_lote.codigos_lote, con
+np.searchsorted, así que ambas versiones clasifican igual.
+
+Los umbrales se comparan siempre con "valor >= umbral". Una condición estricta como "rcc > 0.95" se
+escribe con mayor_que(0.95), el siguiente número de coma flotante, lo que da exactamente el mismo
+resultado.
+"""
+
+import bisect
+import math
+
+
+def mayor_que(umbral):
+
+    """Devuelve el menor número de coma flotante mayor que umbral, para expresar "valor > umbral"."""
+    return math.nextafter(umbral, math.inf)
+
+
+def clave_genero(genero):
+
+    """Clave de las tablas para un género: las fórmulas tratan como 'm' todo lo que no es 'h'."""
+    return 'h' if genero == 'h' else 'm'
+
+
+class Escala:
+    """Categorías de una métrica delimitadas por umbrales ordenados, que pueden depender del género.
+
+        Atributos:
+            limites (dict): Para 'h' y 'm', tupla ordenada con el valor a partir del cual empieza cada
+                categoría salvo la primera.
+            etiquetas (tuple): Texto de cada categoría, en el orden de los códigos.
+        """
+    __slots__ = ('limites', 'etiquetas')
+
+    def __init__(self, limites, etiquetas):
+        if not isinstance(limites, dict):
+            limites = {'h': limites, 'm': limites}
+        for umbrales in limites.values():
+            if list(umbrales) != sorted(umbrales) or len(umbrales) != len(etiquetas) - 1:
+                raise ValueError("Los umbrales deben estar ordenados y ser uno menos que las etiquetas")
+        self.limites = {genero: tuple(umbrales) for genero, umbrales in limites.items()}
+        self.etiquetas = tuple(etiquetas)
+
+    def codigo(self, valor, genero='h'):
+
+        """Devuelve el código de la categoría de un valor (búsqueda binaria en los umbrales del género)."""
+        return bisect.bisect_right(self.limites[clave_genero(genero)], valor)
+
+    def etiqueta(self, codigo):
+
+        """Devuelve el texto de un código de categoría."""
+        return self.etiquetas[codigo]
+
+    def interpretar(self, valor, genero='h'):
+
+        """Devuelve directamente el texto de la categoría de un valor."""
+        return self.etiquetas[self.codigo(valor, genero)]
+
+
+ESCALA_FFMI = Escala(
+    {'h': (18, 19, 20, 21, 22.5, 24, 25.5, 27, 29),
+     'm': (13.5, 14.5, 16, 17, 18.5, 20, 21, 22, 23)},
+    ("Lejos del máximo potencial (pobre forma física)",
+     "Cercano a la normalidad",
+     "Normal",
+     "Superior a la normalidad (buena forma física)",
+     "Fuerte (Muy buena forma física)",
+     "Muy fuerte (Excelente forma física). Cerca del máximo potencial.",
+     "Muy cerca del máximo potencial.",
+     "Potencial máximo natural alcanzado. Muy muy pocos llegan naturales",
+     "Prácticamente imposible sin fármacos",
+     "Imposible sin fármacos"))
+
+ESCALA_PORCENTAJE_GRASA = Escala(
+    {'h': (6, mayor_que(25)),
+     'm': (16, mayor_que(32))},
+    ("Bajo", "Normal", "Alto"))
+
+ESCALA_RCC = Escala(
+    {'h': (mayor_que(0.90), mayor_que(0.95)),
+     'm': (mayor_que(0.80), mayor_que(0.85))},
+    ("Bajo riesgo", "Moderado riesgo", "Alto riesgo"))
+
+ESCALA_RATIO_CINTURA_ALTURA = Escala(
+    (0.5, 0.6),
+    ("Bajo riesgo", "Moderado riesgo", "Alto riesgo"))
+
+ESCALA_SALUD = Escala(
+    {'h': (6, mayor_que(26)),
+     'm': (10, mayor_que(32))},
+    ("Bajo porcentaje de grasa. Se recomienda consultar con un profesional de salud.",
+     "Porcentaje de grasa corporal dentro del rango normal.",
+     "Alto porcentaje de grasa. Se recomienda consultar con un profesional de salud."))
+
+'''El IMC se lee junto al FFMI: un IMC alto con un FFMI por encima de lo normal (ver ESCALA_FFMI) se
+atribuye a la masa muscular. Un IMC alto sin FFMI alto se sigue mostrando como rango normal.'''
+
+ESCALA_IMC = Escala(
+    (18.5, mayor_que(25)),
+    ("El IMC es bajo, se recomienda consultar con un profesional de salud.",
+     "El IMC está dentro del rango normal.",
+     "El IMC es alto, pero puede estar influenciado por una alta masa muscular."))
+
+IMC_BAJO, IMC_NORMAL, IMC_ALTO = range(3)
+
+ESCALA_FFMI_MUSCULAR = Escala(
+    {'h': (mayor_que(19),),
+     'm': (mayor_que(16),)},
+    ("Normal", "Alto"))
+
+
+def codigo_imc(imc, ffmi, genero):
+
+    """Devuelve el código de ESCALA_IMC teniendo en cuenta el FFMI.
+
+        Args:
+            imc (float): Índice de Masa Corporal.
+            ffmi (float): Índice de Masa Libre de Grasa.
+            genero (str): Género del usuario ('h' para hombre, 'm' para mujer).
+
+        Returns:
+            int: IMC_BAJO, IMC_NORMAL o IMC_ALTO.
+        """
+    codigo = ESCALA_IMC.codigo(imc, genero)
+    if codigo == IMC_ALTO and not ESCALA_FFMI_MUSCULAR.codigo(ffmi, genero):
+        return IMC_NORMAL
+    return codigo
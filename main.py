@@ -1,25 +1,43 @@
+import arranque
+import instrumentacion
+import multiprocessing
+import os
+import string
 import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime
-from calculadora import (
-    calcular_tmb, calcular_imc, calcular_porcentaje_grasa,
-    calcular_agua_total, interpretar_imc, calcular_peso_saludable,
-    calcular_masa_muscular, calcular_ffmi, interpretar_ffmi,
-    calcular_relacion_cintura_cadera, calcular_calorias_diarias,
-    calcular_macronutrientes, interpretar_rcc,
-    calcular_ratio_cintura_altura, interpretar_ratio_cintura_altura,
-    interpretar_porcentaje_grasa, guardar_datos, recuperar_historial,
-    calcular_peso_min, calcular_peso_max, calcular_sobrepeso, calcular_rcc,
-)
+from tkinter import ttk, messagebox, filedialog
+from instrumentacion import instrumentar
+from trabajador_bd import TrabajadorBD
 
-from models import Usuario, Session, engine
-from sqlalchemy.orm import sessionmaker
+'''Los módulos que cargan SQLAlchemy, NumPy y bcrypt (calculadora, exportador, autenticacion) se importan
+   dentro de las funciones que los usan, para que la ventana de login aparezca cuanto antes.
+   precargar los importa en segundo plano mientras el usuario escribe sus credenciales.'''
 
+arranque.marcar('modulos_interfaz')
 
-'''Configuración de la sesión de la base de datos generada en fichero models.py'''
 
-Session = sessionmaker(bind=engine)
-session = Session()
+def precargar():
+
+    """Importa los módulos pesados, prepara la base de datos y comprueba la sesión recordada.
+
+        Se ejecuta en el trabajador de base de datos una vez dibujada la ventana de login.
+
+        Returns:
+            str: El usuario de la sesión recordada, o None si no hay ninguna vigente.
+        """
+    import autenticacion
+    import calculadora  # noqa: F401
+    import exportador  # noqa: F401
+    import grafo_analisis  # noqa: F401
+    import graficos  # noqa: F401
+    import percentiles  # noqa: F401
+    import tendencias  # noqa: F401
+    import base_datos
+    arranque.marcar('modulos')
+    base_datos.obtener_motor()
+    arranque.marcar('base_datos')
+    username = autenticacion.recuperar_sesion()
+    arranque.marcar('sesion_recordada')
+    return username
 
 
 class MainApplication:
@@ -45,16 +63,101 @@ class MainApplication:
             cintura (tk.StringVar): Variable para almacenar la medida de la cintura.
             cadera (tk.StringVar): Variable para almacenar la medida de la cadera.
             cuello (tk.StringVar): Variable para almacenar la medida del cuello.
+            analisis (ResultadoAnalisis): Último análisis calculado, o None si no hay ninguno.
+            grafo (GrafoAnalisis): Métricas memorizadas que se recalculan al escribir; se crea al primer cambio.
+            trabajador (TrabajadorBD): Ejecuta las operaciones de base de datos fuera del hilo de la interfaz.
+            al_cerrar_sesion (callable): Se llama tras cerrar la sesión y la ventana, o None.
         """
-    def __init__(self, root):
+
+    '''Texto de cada etiqueta de resultados; los campos de la plantilla son nodos de grafo_analisis, así que
+       una etiqueta solo se actualiza si cambia alguno de ellos.'''
+
+    RESULTADOS = {
+        'resultado_tmb': "TMB: {tmb:.2f} kcal/día",
+        'resultado_imc': "IMC: {imc:.2f}",
+        'resultado_porcentaje_grasa': "Porcentaje de Grasa: {porcentaje_grasa:.2f}% "
+                                      "({interpretacion_porcentaje_grasa})",
+        'resultado_peso_grasa': "Peso de Grasa Corporal: {peso_grasa:.2f} kg",
+        'resultado_masa_muscular': "Masa Muscular: {masa_muscular:.2f} kg",
+        'resultado_agua_total': "Agua Total del Cuerpo: {agua_total:.2f} litros",
+        'resultado_ffmi': "FFMI: {ffmi:.2f}",
+        'interpretacion_ffmi': "Interpretación FFMI: {interpretacion_ffmi}",
+        'interpretacion_imc': "Interpretación IMC: {interpretacion_imc}",
+        'resultado_peso_saludable': "Peso Saludable: {peso_min:.2f} kg - {peso_max:.2f} kg",
+        'resultado_sobrepeso': "Sobrepeso: {sobrepeso:.2f} kg",
+        'resultado_rcc': "Relación Cintura/Cadera: {rcc} ({interpretacion_rcc})",
+        'resultado_ratio_cintura_altura': "Ratio Cintura/Altura: {ratio_cintura_altura:.2f} "
+                                          "({interpretacion_ratio_cintura_altura})",
+        'resultado_calorias_diarias': "Calorías Diarias Necesarias: {calorias_diarias:.2f} kcal",
+        'resultado_macronutrientes': "Macronutrientes: Proteínas: {proteinas:.2f}g, "
+                                     "Carbohidratos: {carbohidratos:.2f}g, Grasas: {grasas:.2f}g",
+        'resultado_salud': "{mensaje_salud}",
+    }
+    NODOS_RESULTADOS = {variable: {campo for _, campo, _, _ in string.Formatter().parse(plantilla) if campo}
+                        for variable, plantilla in RESULTADOS.items()}
+
+    '''Etiquetas con el percentil de una métrica entre los clientes del mismo género y tramo de edad, y nodos
+       del grafo de los que depende.'''
+
+    PERCENTILES = {'percentil_porcentaje_grasa': 'porcentaje_grasa', 'percentil_ffmi': 'ffmi'}
+    NODOS_PERCENTILES = {'porcentaje_grasa', 'ffmi', 'genero', 'edad'}
+
+    '''Espera mínima antes de la primera copia de seguridad automática y antes de reintentar una fallida.'''
+
+    RETARDO_PRIMERA_COPIA_MS = 60_000
+    REINTENTO_COPIA_MS = 15 * 60_000
+
+    '''Espera tras la última tecla antes de recalcular, para no recalcular a cada pulsación.'''
+
+    RETARDO_RECALCULO_MS = 250
+
+    def __init__(self, root, al_cerrar_sesion=None):
         """Inicializa la aplicación principal con la ventana raíz dada.
 
                 Args:
                     root (tk.Tk): La ventana raíz de la aplicación.
+                    al_cerrar_sesion (callable, opcional): Se llama tras cerrar la sesión desde la aplicación,
+                        por ejemplo para volver a mostrar la ventana de login.
                 """
         self.root = root
         self.root.title("CoachBodyMetrics")
+        self.al_cerrar_sesion = al_cerrar_sesion
+        self.analisis = None
+        self.grafo = None
+        self._recalculo = None
+        self._consulta_percentiles = 0
+        self.trabajador = TrabajadorBD(self.root)
+        # Las copias de seguridad pueden tardar minutos: van en su propio hilo para no ocupar los del trabajador
+        self.copias = TrabajadorBD(self.root, max_hilos=1)
+        self.root.bind('<Destroy>', self.al_destruir, add='+')
         self.setup_ui()
+        self.programar_copia()
+
+    def al_destruir(self, event):
+
+        """Detiene los trabajadores de base de datos cuando se cierra la ventana principal."""
+
+        if event.widget is self.root:
+            self.trabajador.cerrar()
+            self.copias.cerrar()
+
+    def cerrar_sesion(self):
+
+        """Invalida la sesión recordada del puesto y cierra la ventana principal.
+
+            En un puesto compartido, el siguiente usuario tendrá que volver a iniciar sesión."""
+
+        from autenticacion import cerrar_sesion
+
+        def al_terminar(_):
+            self.root.destroy()
+            if self.al_cerrar_sesion is not None:
+                self.al_cerrar_sesion()
+
+        def al_fallar(error):
+            messagebox.showerror("Error", f"No se pudo cerrar la sesión: {error}")
+
+        self.trabajador.enviar(cerrar_sesion, al_terminar=al_terminar, al_fallar=al_fallar)
 
     def setup_ui(self):
 
@@ -141,6 +244,10 @@ class MainApplication:
         self.cuello = tk.StringVar()
         ttk.Entry(self.frame, textvariable=self.cuello).grid(row=11, column=1, sticky=(tk.W, tk.E))
 
+        for variable in (self.peso, self.altura, self.edad, self.genero, self.objetivo, self.cintura, self.cadera,
+                         self.cuello):
+            variable.trace_add('write', self.programar_recalculo)
+
     def setup_result_labels(self):
 
         """Configura las etiquetas para mostrar los resultados de los cálculos"""
@@ -156,6 +263,8 @@ class MainApplication:
         self.resultado_porcentaje_grasa = tk.StringVar()
         ttk.Label(self.frame, textvariable=self.resultado_porcentaje_grasa).grid(row=15, column=0, columnspan=2,
                                                                                  sticky=(tk.W, tk.E))
+        self.percentil_porcentaje_grasa = tk.StringVar()
+        ttk.Label(self.frame, textvariable=self.percentil_porcentaje_grasa).grid(row=15, column=2, sticky=tk.W)
 
         self.resultado_peso_grasa = tk.StringVar()
         ttk.Label(self.frame, textvariable=self.resultado_peso_grasa).grid(row=16, column=0, columnspan=2,
@@ -176,6 +285,8 @@ class MainApplication:
         self.interpretacion_ffmi = tk.StringVar()
         ttk.Label(self.frame, textvariable=self.interpretacion_ffmi).grid(row=20, column=0, columnspan=2,
                                                                           sticky=(tk.W, tk.E))
+        self.percentil_ffmi = tk.StringVar()
+        ttk.Label(self.frame, textvariable=self.percentil_ffmi).grid(row=20, column=2, sticky=tk.W)
 
         self.interpretacion_imc = tk.StringVar()
         ttk.Label(self.frame, textvariable=self.interpretacion_imc).grid(row=21, column=0, columnspan=2,
@@ -227,8 +338,8 @@ class MainApplication:
         ttk.Button(self.button_frame, text="Exportar", command=self.exportar_historial).grid(row=1, column=1,
                                                                                              sticky=(tk.W, tk.E))
 
-        ttk.Button(self.button_frame, text="", command=self.limpiar_campos).grid(row=1, column=2,
-                                                                                 sticky=(tk.W, tk.E))
+        ttk.Button(self.button_frame, text="Importar", command=self.importar_mediciones).grid(row=1, column=2,
+                                                                                              sticky=(tk.W, tk.E))
 
         ttk.Button(self.button_frame, text="Agregar Cliente", command=self.agregar_cliente).grid(row=2, column=0,
                                                                                                  sticky=(tk.W, tk.E))
@@ -239,6 +350,13 @@ class MainApplication:
         ttk.Button(self.button_frame, text="Limpiar", command=self.limpiar_campos).grid(row=2, column=2,
                                                                                         sticky=(tk.W, tk.E))
 
+        ttk.Button(self.button_frame, text="Diagnóstico", command=self.mostrar_diagnostico).grid(row=3, column=0,
+                                                                                                 sticky=(tk.W, tk.E))
+        ttk.Button(self.button_frame, text="Copia de seguridad", command=self.copia_seguridad).grid(row=3, column=1,
+                                                                                                    sticky=(tk.W, tk.E))
+        ttk.Button(self.button_frame, text="Cerrar sesión", command=self.cerrar_sesion).grid(row=3, column=2,
+                                                                                            sticky=(tk.W, tk.E))
+
     def actualizar_panel(self, event):
 
         """Actualiza los campos de entrada relacionados con las medidas de la cadera según el género seleccionado."""
@@ -269,90 +387,134 @@ class MainApplication:
             self.carbohidrato.set("50")
             self.grasa.set("20")
 
-    def calcular(self):
+    def leer_entradas(self):
 
-        """Calcúla y muestra todos los indicadores de composición corporal, basados en la entrada de usuario"""
+        """Lee los campos de entrada y los devuelve convertidos, listos para calculadora.analizar."""
 
-        if not self.validar_entradas():
-            return
+        genero_val = self.genero.get().lower()
+        return {
+            'nombre': self.nombre.get(),
+            'peso': float(self.peso.get()),
+            'altura': float(self.altura.get()),
+            'edad': int(self.edad.get()),
+            'genero': genero_val,
+            'cintura': float(self.cintura.get()),
+            'cadera': float(self.cadera.get()) if genero_val == 'm' else 0.0,
+            'cuello': float(self.cuello.get()),
+            'objetivo': self.objetivo.get().lower(),
+        }
+
+    def leer_entradas_parciales(self):
+
+        """Lee los campos de entrada para el grafo de análisis; los que no son válidos todavía valen None."""
+
+        def numero(variable, tipo=float):
+            try:
+                return tipo(variable.get())
+            except ValueError:
+                return None
 
-        peso_val = float(self.peso.get())
-        altura_val = float(self.altura.get())
-        edad_val = int(self.edad.get())
         genero_val = self.genero.get().lower()
-        cintura_val = float(self.cintura.get())
-        cadera_val = float(self.cadera.get()) if genero_val == 'm' else 0.0
-        cuello_val = float(self.cuello.get())
-        objetivo_val = self.objetivo.get().lower()
+        return {
+            'peso': numero(self.peso),
+            'altura': numero(self.altura),
+            'edad': numero(self.edad, int),
+            'genero': genero_val if genero_val in ('h', 'm') else None,
+            'cintura': numero(self.cintura),
+            'cadera': numero(self.cadera) if genero_val == 'm' else 0.0,
+            'cuello': numero(self.cuello),
+            'objetivo': self.objetivo.get().lower(),
+        }
 
-        tmb = round(calcular_tmb(peso_val, altura_val, edad_val, genero_val), 2)
-        imc = round(calcular_imc(peso_val, altura_val), 2)
-        porcentaje_grasa = round(calcular_porcentaje_grasa(cintura_val, cadera_val, cuello_val, altura_val, genero_val),
-                                 2)
-        peso_grasa = round((porcentaje_grasa / 100) * peso_val, 2)
-        masa_muscular = round(calcular_masa_muscular(peso_val, porcentaje_grasa), 2)
-        ffmi = round(calcular_ffmi(masa_muscular, altura_val), 2)
-        interpretacion_ffmi_val = interpretar_ffmi(ffmi, genero_val)
-        agua_total = round(calcular_agua_total(peso_val, altura_val, edad_val, genero_val), 2)
-        interpretacion = interpretar_imc(imc, ffmi, genero_val)
-        peso_min, peso_max = calcular_peso_saludable(altura_val)
-        peso_min, peso_max = round(peso_min, 2), round(peso_max, 2)
-        sobrepeso = round(max(0, peso_val - peso_max), 2)
-        rcc = round(calcular_relacion_cintura_cadera(cintura_val, cadera_val) if genero_val == 'm' else 0.0, 2)
-        interpretacion_rcc_val = interpretar_rcc(rcc, genero_val) if rcc != 0.0 else "N/A"
-        ratio_cintura_altura = round(calcular_ratio_cintura_altura(cintura_val, altura_val), 2)
-        interpretacion_ratio_cintura_altura_val = interpretar_ratio_cintura_altura(ratio_cintura_altura)
-        calorias_diarias = round(calcular_calorias_diarias(tmb, objetivo_val), 2)
-        proteinas, carbohidratos, grasas = calcular_macronutrientes(calorias_diarias, objetivo_val)
-        proteinas, carbohidratos, grasas = round(proteinas, 2), round(carbohidratos, 2), round(grasas, 2)
-        interpretacion_porcentaje_grasa = interpretar_porcentaje_grasa(porcentaje_grasa, genero_val)
-
-        #Actualiza los resultados en la interfaz, según los datos ingresados por el usuario
-
-        self.resultado_tmb.set(f"TMB: {tmb:.2f} kcal/día")
-        self.resultado_imc.set(f"IMC: {imc:.2f}")
-        self.resultado_porcentaje_grasa.set(
-            f"Porcentaje de Grasa: {porcentaje_grasa:.2f}% ({interpretacion_porcentaje_grasa})")
-        self.resultado_peso_grasa.set(f"Peso de Grasa Corporal: {peso_grasa:.2f} kg")
-        self.resultado_masa_muscular.set(f"Masa Muscular: {masa_muscular:.2f} kg")
-        self.resultado_agua_total.set(f"Agua Total del Cuerpo: {agua_total:.2f} litros")
-        self.resultado_ffmi.set(f"FFMI: {ffmi:.2f}")
-        self.interpretacion_ffmi.set(f"Interpretación FFMI: {interpretacion_ffmi_val}")
-        self.interpretacion_imc.set(f"Interpretación IMC: {interpretacion}")
-        self.resultado_peso_saludable.set(f"Peso Saludable: {peso_min:.2f} kg - {peso_max:.2f} kg")
-        self.resultado_sobrepeso.set(f"Sobrepeso: {sobrepeso:.2f} kg")
-        self.resultado_rcc.set(f"Relación Cintura/Cadera: {rcc} ({interpretacion_rcc_val})")
-        self.resultado_ratio_cintura_altura.set(
-            f"Ratio Cintura/Altura: {ratio_cintura_altura:.2f} ({interpretacion_ratio_cintura_altura_val})")
-        self.resultado_calorias_diarias.set(f"Calorías Diarias Necesarias: {calorias_diarias:.2f} kcal")
-        self.resultado_macronutrientes.set(
-            f"Macronutrientes: Proteínas: {proteinas:.2f}g, Carbohidratos: {carbohidratos:.2f}g, Grasas: {grasas:.2f}g")
-
-        #Mensaje de salud basado en el porcentaje de grasa corporal
+    def programar_recalculo(self, *args):
 
-        if genero_val == 'h':
-            if porcentaje_grasa > 26:
-                mensaje_salud = "Alto porcentaje de grasa. Se recomienda consultar con un profesional de salud."
-            elif porcentaje_grasa < 6:
-                mensaje_salud = "Bajo porcentaje de grasa. Se recomienda consultar con un profesional de salud."
-            else:
-                mensaje_salud = "Porcentaje de grasa corporal dentro del rango normal."
-        else:
-            if porcentaje_grasa > 32:
-                mensaje_salud = "Alto porcentaje de grasa. Se recomienda consultar con un profesional de salud."
-            elif porcentaje_grasa < 10:
-                mensaje_salud = "Bajo porcentaje de grasa. Se recomienda consultar con un profesional de salud."
-            else:
-                mensaje_salud = ("Porcentaje de grasa corporal muy elevado, "
-                                 "consultar urgente con un profesional de la salud.")
+        """Programa un recálculo de los resultados cuando se deja de escribir durante RETARDO_RECALCULO_MS."""
+
+        if self._recalculo is not None:
+            self.root.after_cancel(self._recalculo)
+        self._recalculo = self.root.after(self.RETARDO_RECALCULO_MS, self.recalcular)
+
+    def recalcular(self):
+
+        """Pasa las entradas actuales al grafo de análisis y actualiza solo las etiquetas afectadas."""
 
-        self.resultado_salud.set(mensaje_salud)
+        from grafo_analisis import GrafoAnalisis
 
+        if self._recalculo is not None:
+            self.root.after_cancel(self._recalculo)
+            self._recalculo = None
+        if self.grafo is None:
+            self.grafo = GrafoAnalisis()
+        cambiados = self.grafo.asignar(**self.leer_entradas_parciales())
+        self.actualizar_resultados(cambiados)
+        if cambiados & self.NODOS_PERCENTILES:
+            self.actualizar_percentiles()
+
+    def actualizar_resultados(self, cambiados):
+
+        """Actualiza las etiquetas de resultados que muestran alguno de los nodos cambiados.
+
+            Una etiqueta queda vacía mientras falte alguno de sus valores.
+
+            Args:
+                cambiados (set): Nodos del grafo cuyo valor ha cambiado.
+            """
+
+        for variable, plantilla in self.RESULTADOS.items():
+            nodos = self.NODOS_RESULTADOS[variable]
+            if not nodos & cambiados:
+                continue
+            valores = {nodo: self.grafo.valores[nodo] for nodo in nodos}
+            getattr(self, variable).set("" if None in valores.values() else plantilla.format(**valores))
+
+    def actualizar_percentiles(self):
+
+        """Pide al trabajador el percentil de grasa y FFMI entre los clientes del mismo género y tramo de edad.
+
+            La búsqueda es inmediata salvo la primera vez para cada grupo (ver percentiles.py); las respuestas
+            de cálculos anteriores se descartan."""
+
+        from percentiles import formatear_percentil, percentiles_analisis
+
+        self._consulta_percentiles += 1
+        consulta = self._consulta_percentiles
+        valores = self.grafo.valores
+        if valores['genero'] is None or valores['edad'] is None:
+            for variable in self.PERCENTILES:
+                getattr(self, variable).set("")
+            return
+
+        def al_terminar(posiciones):
+            if consulta != self._consulta_percentiles:
+                return
+            for variable, metrica in self.PERCENTILES.items():
+                getattr(self, variable).set(formatear_percentil(posiciones[metrica]) if metrica in posiciones else "")
+
+        metricas = {metrica: valores[metrica] for metrica in self.PERCENTILES.values()}
+        self.trabajador.enviar(percentiles_analisis, metricas, valores['genero'], valores['edad'],
+                               al_terminar=al_terminar)
+
+    @instrumentar('calcular')
+    def calcular(self):
+
+        """Calcúla y muestra todos los indicadores de composición corporal, basados en la entrada de usuario.
+
+            Solo se recalculan las métricas cuyas entradas han cambiado desde el último cálculo."""
+
+        if not self.validar_entradas():
+            return
+
+        self.recalcular()
+        self.analisis = self.grafo.resultado(self.nombre.get())
+        if self.analisis is None:
+            messagebox.showerror("Error de entrada", "Las medidas introducidas no permiten calcular el análisis.")
 
     def validar_entradas(self):
 
         """Comprueba que los campos requeridos contienen datos válidos antes de realizar cálculos."""
 
+        from calculadora import OBJETIVOS
+
         try:
             float(self.peso.get())
             float(self.altura.get())
@@ -364,54 +526,46 @@ class MainApplication:
         except ValueError:
             messagebox.showerror("Error de entrada", "Por favor, ingrese valores numéricos válidos.")
             return False
+        if self.objetivo.get().lower() not in OBJETIVOS:
+            messagebox.showerror("Error de entrada", "El objetivo debe ser mantener, perder o ganar.")
+            return False
         return True
 
     def guardar_perfil(self):
 
-        """Guarda los datos del cliente en la base de datos tras validar las entradas."""
+        """Guarda los datos del cliente en la base de datos tras validar las entradas.
+
+        Reutiliza el análisis mostrado por calcular si las entradas no han cambiado desde entonces, con
+        la fecha del momento de guardar. El guardado se hace en el trabajador de base de datos para no
+        bloquear la ventana."""
+
+        from datetime import datetime
+        from calculadora import analizar, guardar_datos
 
         if not self.validar_entradas():
             return
 
-        peso = float(self.peso.get())
-        altura = float(self.altura.get())
-        cintura = float(self.cintura.get())
-        cadera = float(self.cadera.get()) if self.genero.get().lower() == 'm' else 0.0
-        ffmi = float(self.resultado_ffmi.get().split(":")[1].strip())
+        entradas = self.leer_entradas()
+        try:
+            if self.analisis is None or self.analisis.entradas() != entradas:
+                self.analisis = analizar(**entradas)
+        except ValueError:
+            messagebox.showerror("Error de entrada", "Las medidas introducidas no permiten calcular el análisis.")
+            return
 
-        cliente_data = {
-            'nombre': self.nombre.get(),
-            'fecha': datetime.now(),
-            'peso': peso,
-            'altura': altura,
-            'edad': int(self.edad.get()),
-            'genero': self.genero.get().lower(),
-            'cintura': cintura,
-            'cadera': cadera,
-            'cuello': float(self.cuello.get()),
-            'tmb': float(self.resultado_tmb.get().split(":")[1].strip().split()[0]),
-            'porcentaje_grasa': float(self.resultado_porcentaje_grasa.get().split(":")[1].strip().split("%")[0]),
-            'peso_grasa': float(self.resultado_peso_grasa.get().split(":")[1].strip().split()[0]),
-            'masa_muscular': float(self.resultado_masa_muscular.get().split(":")[1].strip().split()[0]),
-            'agua_total': float(self.resultado_agua_total.get().split(":")[1].strip().split()[0]),
-            'ffmi': ffmi,
-            'peso_min': calcular_peso_min(altura),
-            'peso_max': calcular_peso_max(altura),
-            'sobrepeso': calcular_sobrepeso(peso, altura),
-            'rcc': calcular_rcc(cintura, cadera),
-            'ratio_cintura_altura': calcular_ratio_cintura_altura(cintura, altura),
-            'calorias_diarias': float(self.resultado_calorias_diarias.get().split(":")[1].strip().split()[0]),
-            'proteinas': float(self.resultado_macronutrientes.get().split("Proteínas:")[1].split("g")[0].strip()),
-            'carbohidratos': float(
-                self.resultado_macronutrientes.get().split("Carbohidratos:")[1].split("g")[0].strip()),
-            'grasas': float(self.resultado_macronutrientes.get().split("Grasas:")[1].split("g")[0].strip())
-        }
+        def al_terminar(guardado):
+            if guardado:
+                messagebox.showinfo("Éxito", "Datos del cliente guardados con éxito.")
+                self.limpiar_campos()
+            else:
+                messagebox.showerror("Error", "No se pudieron guardar los datos del cliente.")
+
+        def al_fallar(error):
+            messagebox.showerror("Error", f"No se pudieron guardar los datos del cliente: {error}")
+
+        self.trabajador.enviar(guardar_datos, self.analisis.con_fecha(datetime.now()),
+                               al_terminar=al_terminar, al_fallar=al_fallar)
 
-        if guardar_datos(cliente_data):
-            messagebox.showinfo("Éxito", "Datos del cliente guardados con éxito.")
-            self.limpiar_campos()
-        else:
-            messagebox.showerror("Error", "No se pudieron guardar los datos del cliente.")
     def limpiar_campos(self):
 
         """Limpia todos los campos de entrada y resultados para preparar la interfaz para un nuevo análisis"""
@@ -445,6 +599,10 @@ class MainApplication:
         self.resultado_calorias_diarias.set("")
         self.resultado_macronutrientes.set("")
         self.resultado_salud.set("")
+        self.percentil_porcentaje_grasa.set("")
+        self.percentil_ffmi.set("")
+        self._consulta_percentiles += 1
+        self.analisis = None
 
     def agregar_cliente(self):
 
@@ -461,13 +619,276 @@ class MainApplication:
             y en el orden que me queda còmodo
             revisar la información del cliente."""
 
-        historial_window = tk.Toplevel(self.root)
-        historial_window.title("Historial de Clientes")
+        HistorialWindow(tk.Toplevel(self.root), self.trabajador)
+
+    def mostrar_diagnostico(self):
+
+        """Muestra las métricas de rendimiento de las operaciones de la aplicación."""
 
-        tree = ttk.Treeview(historial_window, columns=('Fecha', 'Nombre', 'Edad', 'Altura', 'Peso', 'Porcentaje Grasa',
-                                                       'Peso Graso', 'Masa Muscular', 'FFMI', 'Peso Saludable',
-                                                       'Sobrepeso', 'R cint/cadera',
-                                                       'Ratio C/Alt', 'C.diarias', 'Macros')
+        DiagnosticoWindow(tk.Toplevel(self.root))
+
+    def exportar_historial(self):
+
+        """Exporta el historial de clientes a un archivo (CSV, CSV comprimido, JSON Lines o columnar)
+            para su uso externo. La exportación se hace en un hilo aparte para no bloquear la ventana."""
+
+        import exportador
+
+        ruta = filedialog.asksaveasfilename(
+            parent=self.root, title="Exportar historial", initialfile='historial_clientes.csv',
+            filetypes=[("CSV", "*.csv"), ("CSV comprimido", "*.csv.gz"), ("JSON Lines", "*.jsonl"),
+                       ("Columnar (NumPy)", "*.zip")])
+        if not ruta:
+            return
+
+        dialogo = DialogoProgreso(self.root, "Exportación", "Exportando historial...")
+
+        def al_terminar(filas):
+            dialogo.cerrar()
+            if filas is None:
+                messagebox.showinfo("Exportación", "Exportación cancelada.")
+            else:
+                messagebox.showinfo("Exportación", f"Historial exportado con éxito a '{ruta}' ({filas} registros).")
+
+        def al_fallar(error):
+            dialogo.cerrar()
+            messagebox.showerror("Exportación", f"No se pudo exportar el historial: {error}")
+
+        dialogo.trabajo = self.trabajador.enviar(
+            exportador.exportar_historial, ruta, cancelable=True, al_terminar=al_terminar, al_fallar=al_fallar,
+            al_progresar=lambda filas: dialogo.actualizar(f"Exportados {filas} registros..."))
+
+    def copia_seguridad(self):
+
+        """Hace una copia de seguridad de la base de datos sin cerrar la aplicación (ver copias.py).
+
+            Se puede seguir guardando mientras se copia; la copia se comprueba y se comprime antes de darla
+            por buena."""
+
+        import copias
+
+        directorio = copias.DIRECTORIO_COPIAS or filedialog.askdirectory(
+            parent=self.root, title="Directorio de las copias de seguridad")
+        if not directorio:
+            return
+
+        dialogo = DialogoProgreso(self.root, "Copia de seguridad", "Copiando la base de datos...")
+
+        def al_terminar(ruta):
+            dialogo.cerrar()
+            if ruta is None:
+                messagebox.showinfo("Copia de seguridad", "Copia cancelada.")
+            else:
+                messagebox.showinfo("Copia de seguridad", f"Copia guardada y verificada en '{ruta}'.")
+
+        def al_fallar(error):
+            dialogo.cerrar()
+            messagebox.showerror("Copia de seguridad", f"No se pudo hacer la copia: {error}")
+
+        def al_progresar(avance):
+            copiadas, total = avance
+            dialogo.actualizar(f"Copiadas {copiadas} de {total} páginas...")
+
+        dialogo.trabajo = self.copias.enviar(copias.crear_copia, directorio, cancelable=True,
+                                             al_terminar=al_terminar, al_fallar=al_fallar, al_progresar=al_progresar)
+
+    def programar_copia(self):
+
+        """Programa la próxima copia de seguridad automática si COACHBODYMETRICS_COPIAS indica un directorio."""
+
+        import copias
+
+        if not copias.DIRECTORIO_COPIAS:
+            return
+        try:
+            espera = copias.espera_proxima_copia()
+        except (OSError, ValueError) as e:
+            print(f"No se pueden programar las copias de seguridad: {e}")
+            return
+
+        def copiar():
+            self.copias.enviar(copias.crear_copia, al_terminar=lambda ruta: self.programar_copia(),
+                               al_fallar=al_fallar)
+
+        def al_fallar(error):
+            print(f"Error en la copia de seguridad programada: {error}")
+            self.root.after(self.REINTENTO_COPIA_MS, copiar)
+
+        # Al abrir con una copia caducada se espera un poco para no competir con el arranque
+        self.root.after(max(int(espera * 1000), self.RETARDO_PRIMERA_COPIA_MS), copiar)
+
+    def importar_mediciones(self):
+
+        """Importa un archivo de mediciones (CSV o JSON Lines) enviado por una clínica.
+
+            Los registros no válidos se guardan en un archivo de rechazos junto al original. Si la importación
+            se cancela o se interrumpe, al volver a importar el mismo archivo continúa donde se quedó."""
+
+        import importador
+
+        ruta = filedialog.askopenfilename(
+            parent=self.root, title="Importar mediciones",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Todos los archivos", "*.*")])
+        if not ruta:
+            return
+
+        dialogo = DialogoProgreso(self.root, "Importación", "Importando mediciones...")
+
+        def al_terminar(totales):
+            dialogo.cerrar()
+            if totales is None:
+                messagebox.showinfo("Importación", "Importación cancelada.")
+                return
+            mensaje = f"Importados: {totales['importados']}. Rechazados: {totales['rechazados']}."
+            if totales['rechazados']:
+                mensaje += f"\nLos rechazos se han guardado en '{ruta}.rechazos.csv'."
+            if not totales['completada']:
+                mensaje = "Importación detenida; puede reanudarse más tarde.\n" + mensaje
+            messagebox.showinfo("Importación", mensaje)
+
+        def al_fallar(error):
+            dialogo.cerrar()
+            messagebox.showerror("Importación", f"No se pudo importar el archivo: {error}")
+
+        dialogo.trabajo = self.trabajador.enviar(
+            importador.importar_archivo, ruta, cancelable=True, al_terminar=al_terminar, al_fallar=al_fallar,
+            al_progresar=lambda registros: dialogo.actualizar(f"Procesados {registros} registros..."))
+
+
+class DialogoProgreso:
+    """Ventana pequeña que muestra el avance de un trabajo largo y permite cancelarlo.
+
+        Atributos:
+            window (tk.Toplevel): La ventana del diálogo.
+            mensaje (tk.StringVar): Texto de avance.
+            trabajo (Trabajo): Trabajo que se cancela con el botón Cancelar.
+        """
+
+    def __init__(self, parent, titulo, mensaje):
+
+        """Crea el diálogo con una barra de progreso indeterminada.
+
+                Args:
+                    parent (tk.Misc): Ventana sobre la que se muestra el diálogo.
+                    titulo (str): Título de la ventana.
+                    mensaje (str): Texto inicial.
+                """
+        self.trabajo = None
+        self.window = tk.Toplevel(parent)
+        self.window.title(titulo)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancelar)
+
+        frame = ttk.Frame(self.window, padding="10")
+        frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.mensaje = tk.StringVar(value=mensaje)
+        ttk.Label(frame, textvariable=self.mensaje).grid(row=0, column=0, sticky=tk.W)
+        self.barra = ttk.Progressbar(frame, mode='indeterminate', length=300)
+        self.barra.grid(row=1, column=0, pady=10)
+        self.barra.start(10)
+        self.boton_cancelar = ttk.Button(frame, text="Cancelar", command=self.cancelar)
+        self.boton_cancelar.grid(row=2, column=0)
+
+    def actualizar(self, mensaje):
+
+        """Cambia el texto de avance."""
+        self.mensaje.set(mensaje)
+
+    def cancelar(self):
+
+        """Pide la cancelación del trabajo; el diálogo se cierra cuando el trabajo se detiene."""
+        if self.trabajo is not None:
+            self.trabajo.cancelar()
+        self.boton_cancelar.state(['disabled'])
+        self.mensaje.set("Cancelando...")
+
+    def cerrar(self):
+
+        """Cierra el diálogo."""
+        self.barra.stop()
+        self.window.destroy()
+
+
+def formatear_cambio(valor, decimales=1):
+
+    """Da formato con signo a un cambio entre visitas; vacío si no hay visita anterior."""
+
+    return '' if valor is None else f"{valor:+.{decimales}f}"
+
+
+class HistorialWindow:
+    """Ventana del historial de clientes que carga las filas por páginas a medida que se desplaza.
+
+        Solo se piden a la base de datos las columnas visibles, una página cada vez, usando paginación
+        por clave sobre (fecha, id). Abrir la ventana cuesta lo mismo con cien filas que con un millón.
+        Los cambios respecto a la visita anterior de cada cliente llegan ya calculados en la misma
+        consulta (ver tendencias.py).
+
+        La búsqueda por nombre y el orden por Fecha o Nombre (pulsando la cabecera) también se resuelven en
+        la base de datos: al cambiarlos se vacía la tabla y se vuelve a cargar desde la primera página.
+        Con doble clic en una fila (o el botón Ver gráfico) se abre la evolución de ese cliente.
+
+        Atributos:
+            window (tk.Toplevel): La ventana del historial.
+            tree (ttk.Treeview): Tabla donde se muestran las filas.
+            busqueda (tk.StringVar): Texto de búsqueda por nombre.
+            orden (str): Orden actual, una de las claves de calculadora.ORDENES_HISTORIAL.
+            descendente (bool): Si el orden actual es de mayor a menor.
+            cursor (tuple): Clave de la última fila cargada, o None si aún no se ha cargado nada.
+            agotado (bool): Indica si ya se han cargado todas las filas.
+            consulta (int): Número de la consulta actual; las páginas de consultas anteriores se descartan.
+        """
+
+    TAMANO_PAGINA = 200
+
+    '''Espera tras la última tecla en la búsqueda antes de consultar la base de datos.'''
+
+    RETARDO_BUSQUEDA_MS = 300
+
+    '''Columnas de la tabla que se pueden ordenar pulsando su cabecera, y orden de la base de datos que usan.'''
+
+    ORDENABLES = {'Fecha': 'fecha', 'Nombre': 'nombre'}
+
+    def __init__(self, window, trabajador):
+
+        """Inicializa la ventana, configura la tabla y carga la primera página.
+
+                Args:
+                    window (tk.Toplevel): La ventana donde se muestra el historial.
+                    trabajador (TrabajadorBD): Trabajador que lee las páginas de la base de datos.
+                """
+        self.window = window
+        self.trabajador = trabajador
+        self.window.title("Historial de Clientes")
+        self.busqueda = tk.StringVar()
+        self.orden = 'fecha'
+        self.descendente = False
+        self.cursor = None
+        self.agotado = False
+        self.cargando = True
+        self.consulta = 0
+        self._busqueda_pendiente = None
+        self.setup_ui()
+        self.cargar_pagina()
+
+    def setup_ui(self):
+
+        """Configura la búsqueda, la tabla del historial y sus barras de desplazamiento."""
+
+        barra = ttk.Frame(self.window, padding=5)
+        barra.grid(column=0, row=0, columnspan=2, sticky='ew')
+        ttk.Label(barra, text="Buscar cliente:").pack(side=tk.LEFT)
+        entrada = ttk.Entry(barra, textvariable=self.busqueda, width=40)
+        entrada.pack(side=tk.LEFT, padx=5)
+        entrada.focus_set()
+        self.busqueda.trace_add('write', self.programar_busqueda)
+        ttk.Button(barra, text="Ver gráfico", command=self.abrir_grafico).pack(side=tk.RIGHT)
+
+        tree = ttk.Treeview(self.window, columns=('Fecha', 'Nombre', 'Edad', 'Altura', 'Peso', 'Porcentaje Grasa',
+                                                  'Peso Graso', 'Masa Muscular', 'FFMI', 'Peso Saludable',
+                                                  'Sobrepeso', 'R cint/cadera',
+                                                  'Ratio C/Alt', 'C.diarias', 'Macros', 'Cambio Peso',
+                                                  'Cambio Grasa', 'Cambio Masa', 'Cambio FFMI', 'Peso Semanal')
                             , show='headings')
         tree.heading('Fecha', text='Fecha')
         tree.heading('Nombre', text='Nombre')
@@ -484,6 +905,11 @@ class MainApplication:
         tree.heading('Ratio C/Alt', text='Ratio C/Alt')
         tree.heading('C.diarias', text='Kcal')
         tree.heading('Macros', text='Prot - HC - Grasas')
+        tree.heading('Cambio Peso', text='Δ Peso')
+        tree.heading('Cambio Grasa', text='Δ % Grasa')
+        tree.heading('Cambio Masa', text='Δ Kg Masa')
+        tree.heading('Cambio FFMI', text='Δ FFMI')
+        tree.heading('Peso Semanal', text='Kg/semana')
 
         tree.column('Fecha', width=100)
         tree.column('Nombre', width=150)
@@ -500,55 +926,453 @@ class MainApplication:
         tree.column('Ratio C/Alt', width=100)
         tree.column('C.diarias', width=100)
         tree.column('Macros', width=150)
+        for columna in ('Cambio Peso', 'Cambio Grasa', 'Cambio Masa', 'Cambio FFMI', 'Peso Semanal'):
+            tree.column(columna, width=90)
+        for columna, orden in self.ORDENABLES.items():
+            tree.heading(columna, command=lambda orden=orden: self.ordenar(orden))
 
-        historial = recuperar_historial()
-        for cliente in historial:
-            tree.insert('', 'end', values=(
-                cliente.fecha.strftime('%Y-%m-%d'),
-                cliente.nombre,
-                f"{cliente.edad}",
-                f"{cliente.altura:.1f}",
-                f"{cliente.peso:.1f}",
-                f"{cliente.porcentaje_grasa:.1f}",
-                f"{cliente.peso_grasa:.1f}",
-                f"{cliente.masa_muscular:.1f}",
-                f"{cliente.ffmi:.1f}",
-                f"{cliente.peso_min:.1f} - {cliente.peso_max:.1f}",
-                f"{cliente.sobrepeso:.1f}",
-                f"{cliente.rcc:.2f}",
-                f"{cliente.ratio_cintura_altura:.2f}",
-                f"{cliente.calorias_diarias:.0f}",
-                f"{cliente.proteinas:.0f} - {cliente.carbohidratos:.0f} - {cliente.grasas:.0f}"
-            ))
-
-        vsb = ttk.Scrollbar(historial_window, orient="vertical", command=tree.yview)
-        hsb = ttk.Scrollbar(historial_window, orient="horizontal", command=tree.xview)
-        tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-
-        tree.grid(column=0, row=0, sticky='nsew')
-        vsb.grid(column=1, row=0, sticky='ns')
-        hsb.grid(column=0, row=1, sticky='ew')
-
-        historial_window.grid_columnconfigure(0, weight=1)
-        historial_window.grid_rowconfigure(0, weight=1)
+        self.vsb = ttk.Scrollbar(self.window, orient="vertical", command=tree.yview)
+        hsb = ttk.Scrollbar(self.window, orient="horizontal", command=tree.xview)
+        tree.configure(yscrollcommand=self.al_desplazar, xscrollcommand=hsb.set)
 
-    def exportar_historial(self):
+        tree.grid(column=0, row=1, sticky='nsew')
+        self.vsb.grid(column=1, row=1, sticky='ns')
+        hsb.grid(column=0, row=2, sticky='ew')
+
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_rowconfigure(1, weight=1)
+        tree.bind('<Double-1>', self.abrir_grafico)
+        self.tree = tree
+        self.marcar_orden()
+
+    def abrir_grafico(self, event=None):
+
+        """Abre el gráfico de evolución del cliente de la fila seleccionada."""
+
+        seleccion = self.tree.selection()
+        if not seleccion:
+            messagebox.showinfo("Gráfico", "Seleccione una fila del cliente.", parent=self.window)
+            return
+        nombre = self.tree.item(seleccion[0], 'values')[1]
+        GraficoWindow(tk.Toplevel(self.window), self.trabajador, nombre)
+
+    def programar_busqueda(self, *args):
+
+        """Vuelve a consultar el historial cuando se deja de escribir en la búsqueda."""
+
+        if self._busqueda_pendiente is not None:
+            self.window.after_cancel(self._busqueda_pendiente)
+        self._busqueda_pendiente = self.window.after(self.RETARDO_BUSQUEDA_MS, self.reiniciar)
+
+    def ordenar(self, orden):
+
+        """Ordena por la columna pulsada; pulsarla otra vez invierte el sentido."""
+
+        self.descendente = not self.descendente if orden == self.orden else False
+        self.orden = orden
+        self.marcar_orden()
+        self.reiniciar()
+
+    def marcar_orden(self):
+
+        """Muestra una flecha en la cabecera de la columna por la que se ordena."""
+
+        for columna, orden in self.ORDENABLES.items():
+            flecha = (' ▼' if self.descendente else ' ▲') if orden == self.orden else ''
+            self.tree.heading(columna, text=columna + flecha)
+
+    def reiniciar(self):
+
+        """Vacía la tabla y carga la primera página con la búsqueda y el orden actuales."""
+
+        self._busqueda_pendiente = None
+        self.consulta += 1
+        self.tree.delete(*self.tree.get_children())
+        self.cursor = None
+        self.agotado = False
+        self.cargando = True
+        self.cargar_pagina()
+
+    def al_desplazar(self, primero, ultimo):
+
+        """Actualiza la barra de desplazamiento y pide la página siguiente al acercarse al final."""
+
+        self.vsb.set(primero, ultimo)
+        if float(ultimo) > 0.9 and not self.agotado and not self.cargando:
+            self.cargando = True
+            self.cargar_pagina()
+
+    def cargar_pagina(self):
+
+        """Pide la siguiente página del historial al trabajador de base de datos."""
+
+        from tendencias import recuperar_historial_pagina_tendencias
+
+        consulta = self.consulta
+
+        def al_fallar(error):
+            if not self.window.winfo_exists() or consulta != self.consulta:
+                return
+            # Sin esto la ventana dejaría de pedir páginas; al desplazarse se vuelve a intentar
+            self.cargando = False
+            messagebox.showerror("Historial", f"No se pudo cargar el historial: {error}", parent=self.window)
+
+        self.trabajador.enviar(recuperar_historial_pagina_tendencias, self.cursor, self.TAMANO_PAGINA,
+                               orden=self.orden, descendente=self.descendente, busqueda=self.busqueda.get(),
+                               al_terminar=lambda pagina: self.mostrar_pagina(pagina, consulta), al_fallar=al_fallar)
+
+    def mostrar_pagina(self, pagina, consulta=None):
+
+        """Añade a la tabla una página recibida del trabajador, si sigue siendo de la consulta actual."""
+
+        from calculadora import clave_pagina
+
+        if not self.window.winfo_exists() or consulta not in (None, self.consulta):
+            return
+        for cliente in pagina:
+            self.tree.insert('', 'end', values=self.valores_fila(cliente))
+        if pagina:
+            self.cursor = clave_pagina(pagina[-1], self.orden)
+        self.agotado = len(pagina) < self.TAMANO_PAGINA
+        self.cargando = False
+
+    @staticmethod
+    def valores_fila(cliente):
+
+        """Da formato a una fila del historial para mostrarla en la tabla."""
+
+        return (
+            cliente.fecha.strftime('%Y-%m-%d'),
+            cliente.nombre,
+            f"{cliente.edad}",
+            f"{cliente.altura:.1f}",
+            f"{cliente.peso:.1f}",
+            f"{cliente.porcentaje_grasa:.1f}",
+            f"{cliente.peso_grasa:.1f}",
+            f"{cliente.masa_muscular:.1f}",
+            f"{cliente.ffmi:.1f}",
+            f"{cliente.peso_min:.1f} - {cliente.peso_max:.1f}",
+            f"{cliente.sobrepeso:.1f}",
+            f"{cliente.rcc:.2f}",
+            f"{cliente.ratio_cintura_altura:.2f}",
+            f"{cliente.calorias_diarias:.0f}",
+            f"{cliente.proteinas:.0f} - {cliente.carbohidratos:.0f} - {cliente.grasas:.0f}",
+            formatear_cambio(cliente.peso_cambio),
+            formatear_cambio(cliente.porcentaje_grasa_cambio),
+            formatear_cambio(cliente.masa_muscular_cambio),
+            formatear_cambio(cliente.ffmi_cambio),
+            formatear_cambio(cliente.peso_semanal, 2)
+        )
+
+
+class GraficoWindow:
+    """Gráfico de la evolución del peso, el porcentaje de grasa y la masa muscular de un cliente.
+
+        Se dibuja en un Canvas, un panel por serie con su propia escala y el eje de fechas compartido. En
+        cada redibujado solo se toma el tramo visible de cada serie y se reduce con LTTB a PUNTOS_POR_PIXEL
+        puntos por píxel de ancho (ver graficos.py), así que el coste no depende de los años de historial.
+        La rueda del ratón acerca o aleja alrededor del cursor, arrastrar desplaza y el doble clic vuelve a
+        mostrar todo el historial. Debajo se resume la evolución desde la primera visita y desde la anterior
+        (tendencias.tendencias_cliente, que se recalcula solo si el cliente tiene mediciones nuevas).
+
+        Atributos:
+            window (tk.Toplevel): La ventana del gráfico.
+            canvas (tk.Canvas): Lienzo donde se dibujan los paneles.
+            nombre (str): Cliente cuyo historial se muestra.
+            series (dict): Series de graficos.recuperar_series, o None mientras se cargan.
+            desde (float): Primera fecha visible, en segundos desde la época.
+            hasta (float): Última fecha visible, en segundos desde la época.
+            resumen (tk.StringVar): Resumen de la evolución del cliente.
+        """
+
+    MARGENES = (70, 20, 15, 30)
+    SEPARACION_PANELES = 25
+    PUNTOS_POR_PIXEL = 0.5
+    FACTOR_ZOOM = 1.25
+    INTERVALO_MINIMO = 3600
+    COLORES = ('#1f77b4', '#d62728', '#2ca02c')
+
+    def __init__(self, window, trabajador, nombre):
+
+        """Inicializa la ventana y pide las series del cliente al trabajador de base de datos.
+
+                Args:
+                    window (tk.Toplevel): La ventana donde se muestra el gráfico.
+                    trabajador (TrabajadorBD): Trabajador que lee las series de la base de datos.
+                    nombre (str): Nombre del cliente.
+                """
+        from graficos import recuperar_series
+        from tendencias import tendencias_cliente
+
+        self.window = window
+        self.nombre = nombre
+        self.window.title(f"Evolución de {nombre}")
+        self.series = None
+        self.desde = self.hasta = 0.0
+        self._dibujo = None
+        self._arrastre = None
+        self.estado = tk.StringVar(value="Cargando mediciones...")
+        self.resumen = tk.StringVar()
+        self.setup_ui()
+        trabajador.enviar(recuperar_series, nombre, al_terminar=self.mostrar_series, al_fallar=self.al_fallar)
+        trabajador.enviar(tendencias_cliente, nombre, al_terminar=self.mostrar_resumen)
+
+    def setup_ui(self):
+
+        """Configura el lienzo, la línea de estado y los eventos de zoom y desplazamiento."""
+
+        self.canvas = tk.Canvas(self.window, width=800, height=600, background='white', highlightthickness=0)
+        self.canvas.grid(row=0, column=0, sticky='nsew')
+        ttk.Label(self.window, textvariable=self.estado, padding=5).grid(row=1, column=0, sticky=tk.W)
+        ttk.Label(self.window, textvariable=self.resumen, padding=5).grid(row=2, column=0, sticky=tk.W)
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_rowconfigure(0, weight=1)
+
+        self.canvas.bind('<Configure>', self.programar_dibujo)
+        self.canvas.bind('<MouseWheel>', lambda e: self.zoom(e.x, e.delta > 0))
+        self.canvas.bind('<Button-4>', lambda e: self.zoom(e.x, True))
+        self.canvas.bind('<Button-5>', lambda e: self.zoom(e.x, False))
+        self.canvas.bind('<ButtonPress-1>', self.empezar_arrastre)
+        self.canvas.bind('<B1-Motion>', self.arrastrar)
+        self.canvas.bind('<Double-Button-1>', lambda e: self.ver_todo())
+
+    def mostrar_series(self, series):
+
+        """Recibe las series del trabajador y muestra todo el historial."""
+
+        if not self.window.winfo_exists():
+            return
+        self.series = series
+        self.ver_todo()
+
+    def mostrar_resumen(self, filas):
+
+        """Muestra el resumen de la evolución del cliente recibido del trabajador."""
+
+        from tendencias import resumen_tendencias
+
+        if self.window.winfo_exists():
+            self.resumen.set(resumen_tendencias(filas))
+
+    def al_fallar(self, error):
+
+        """Muestra en la línea de estado que no se han podido leer las mediciones."""
+
+        if self.window.winfo_exists():
+            self.estado.set(f"No se pudieron cargar las mediciones: {error}")
+
+    def ver_todo(self):
+
+        """Ajusta la ventana visible a todo el historial del cliente."""
+
+        if self.series is None or not len(self.series['fecha']):
+            self.programar_dibujo()
+            return
+        fechas = self.series['fecha']
+        self.desde, self.hasta = fechas[0], fechas[-1]
+        if self.hasta - self.desde < self.INTERVALO_MINIMO:
+            self.desde -= 86400
+            self.hasta += 86400
+        self.programar_dibujo()
+
+    def ancho_grafico(self):
+
+        """Devuelve el ancho en píxeles de la zona de los paneles."""
+
+        izquierda, derecha, _, _ = self.MARGENES
+        return max(self.canvas.winfo_width() - izquierda - derecha, 1)
+
+    def zoom(self, x, acercar):
+
+        """Acerca o aleja el gráfico manteniendo fija la fecha bajo el cursor."""
+
+        if self.series is None or not len(self.series['fecha']):
+            return
+        fraccion = min(max((x - self.MARGENES[0]) / self.ancho_grafico(), 0.0), 1.0)
+        centro = self.desde + fraccion * (self.hasta - self.desde)
+        factor = 1 / self.FACTOR_ZOOM if acercar else self.FACTOR_ZOOM
+        intervalo = max((self.hasta - self.desde) * factor, self.INTERVALO_MINIMO)
+        self.desde = centro - fraccion * intervalo
+        self.hasta = self.desde + intervalo
+        self.programar_dibujo()
+
+    def empezar_arrastre(self, event):
+
+        """Guarda la posición inicial de un arrastre."""
+
+        self._arrastre = (event.x, self.desde, self.hasta)
+
+    def arrastrar(self, event):
+
+        """Desplaza la ventana visible lo mismo que se ha movido el ratón."""
+
+        if self._arrastre is None or self.series is None:
+            return
+        x, desde, hasta = self._arrastre
+        desplazamiento = (event.x - x) * (hasta - desde) / self.ancho_grafico()
+        self.desde, self.hasta = desde - desplazamiento, hasta - desplazamiento
+        self.programar_dibujo()
+
+    def programar_dibujo(self, event=None):
+
+        """Redibuja en cuanto Tk quede libre; varios eventos seguidos provocan un solo redibujado."""
+
+        if self._dibujo is None:
+            self._dibujo = self.window.after_idle(self.dibujar)
+
+    def dibujar(self):
+
+        """Dibuja los paneles con el tramo visible de cada serie, reducido con LTTB."""
+
+        from graficos import SERIES_GRAFICO, etiqueta_fecha, formato_fecha_eje, marcas_eje, reducir_serie
+
+        self._dibujo = None
+        if not self.window.winfo_exists():
+            return
+        canvas = self.canvas
+        canvas.delete('all')
+        if self.series is None:
+            return
+        fechas = self.series['fecha']
+        if not len(fechas):
+            canvas.create_text(canvas.winfo_width() / 2, canvas.winfo_height() / 2, text="Sin mediciones")
+            self.estado.set(f"{self.nombre}: sin mediciones.")
+            return
+
+        izquierda, derecha, arriba, abajo = self.MARGENES
+        ancho = self.ancho_grafico()
+        x_derecha = izquierda + ancho
+        alto_panel = max((canvas.winfo_height() - arriba - abajo) / len(SERIES_GRAFICO) - self.SEPARACION_PANELES,
+                         20)
+        escala_x = ancho / (self.hasta - self.desde)
+        puntos = max(int(ancho * self.PUNTOS_POR_PIXEL), 3)
+        marcas_x = marcas_eje(self.desde, self.hasta, 6)
+        formato = formato_fecha_eje(self.desde, self.hasta)
+        dibujados = 0
+
+        for panel, ((campo, titulo), color) in enumerate(zip(SERIES_GRAFICO, self.COLORES)):
+            y_arriba = arriba + panel * (alto_panel + self.SEPARACION_PANELES) + self.SEPARACION_PANELES
+            y_abajo = y_arriba + alto_panel
+            x, y = reducir_serie(fechas, self.series[campo], self.desde, self.hasta, puntos)
+            dibujados += len(x)
+            minimo, maximo = float(y.min()), float(y.max())
+            margen = (maximo - minimo) * 0.05 or 1.0
+            minimo, maximo = minimo - margen, maximo + margen
+            escala_y = alto_panel / (maximo - minimo)
+
+            canvas.create_text(izquierda, y_arriba - 4, text=titulo, anchor=tk.SW, fill=color)
+            for marca in marcas_x:
+                xp = izquierda + (marca - self.desde) * escala_x
+                canvas.create_line(xp, y_arriba, xp, y_abajo, fill='#eeeeee')
+            for marca in marcas_eje(minimo, maximo, 4):
+                yp = y_abajo - (marca - minimo) * escala_y
+                canvas.create_line(izquierda, yp, x_derecha, yp, fill='#eeeeee')
+                canvas.create_text(izquierda - 5, yp, text=f"{marca:g}", anchor=tk.E, tags='etiqueta_y')
+
+            xs = (izquierda + (x - self.desde) * escala_x).tolist()
+            ys = (y_abajo - (y - minimo) * escala_y).tolist()
+            if len(xs) > 1:
+                canvas.create_line(*[c for punto in zip(xs, ys) for c in punto], fill=color, width=2)
+            else:
+                canvas.create_oval(xs[0] - 3, ys[0] - 3, xs[0] + 3, ys[0] + 3, fill=color, outline=color)
+            canvas.create_rectangle(izquierda, y_arriba, x_derecha, y_abajo, outline='#999999')
+
+        # Tapa lo que se sale por los lados al acercar o desplazar, y rotula las fechas debajo
+        alto = canvas.winfo_height()
+        canvas.create_rectangle(0, 0, izquierda - 1, alto, fill='white', outline='')
+        canvas.create_rectangle(x_derecha + 1, 0, canvas.winfo_width(), alto, fill='white', outline='')
+        canvas.tag_raise('etiqueta_y')
+        for marca in marcas_x:
+            xp = izquierda + (marca - self.desde) * escala_x
+            canvas.create_text(xp, y_abajo + 5, text=etiqueta_fecha(marca, formato), anchor=tk.N)
+        self.estado.set(f"{len(fechas)} mediciones ({dibujados} puntos dibujados). "
+                        "Rueda: zoom · Arrastrar: desplazar · Doble clic: ver todo")
+
+
+class DiagnosticoWindow:
+    """Ventana con las métricas de instrumentación: llamadas, errores, filas y latencia de cada operación.
+
+        La tabla se actualiza sola cada INTERVALO_MS mientras la ventana está abierta. Leer las métricas no
+        toca la base de datos, así que se hace en el hilo de Tk.
+
+        Atributos:
+            window (tk.Toplevel): La ventana de diagnóstico.
+            tree (ttk.Treeview): Tabla con una fila por operación.
+            activa (tk.BooleanVar): Si la instrumentación está registrando llamadas.
+        """
+
+    INTERVALO_MS = 1000
+    COLUMNAS = (('Operación', 180), ('Llamadas', 80), ('Errores', 70), ('Filas', 90), ('Media', 90),
+                ('p50', 90), ('p95', 90), ('Máximo', 90))
+
+    def __init__(self, window):
+
+        """Inicializa la ventana y empieza a refrescar las métricas.
+
+                Args:
+                    window (tk.Toplevel): La ventana donde se muestran las métricas.
+                """
+        self.window = window
+        self.window.title("Diagnóstico")
+        self.activa = tk.BooleanVar(value=instrumentacion.registro.activo)
+        self.setup_ui()
+        self.refrescar()
+
+    def setup_ui(self):
+
+        """Configura la tabla de métricas y los botones."""
+
+        self.tree = ttk.Treeview(self.window, columns=[nombre for nombre, _ in self.COLUMNAS], show='headings')
+        for nombre, ancho in self.COLUMNAS:
+            self.tree.heading(nombre, text=nombre)
+            self.tree.column(nombre, width=ancho, anchor=tk.W if nombre == 'Operación' else tk.E)
+        self.tree.grid(row=0, column=0, columnspan=4, sticky='nsew')
+
+        ttk.Checkbutton(self.window, text="Registrar métricas", variable=self.activa,
+                        command=self.cambiar_activa).grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Button(self.window, text="Reiniciar", command=self.reiniciar).grid(row=1, column=2, pady=5)
+        ttk.Button(self.window, text="Guardar...", command=self.guardar).grid(row=1, column=3, pady=5)
+
+        self.window.grid_columnconfigure(1, weight=1)
+        self.window.grid_rowconfigure(0, weight=1)
+
+    def refrescar(self):
+
+        """Vuelve a dibujar la tabla con las métricas actuales y programa el siguiente refresco."""
+
+        if not self.window.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        formatear = instrumentacion.formatear_segundos
+        for nombre, datos in instrumentacion.registro.resumen().items():
+            self.tree.insert('', 'end', values=(
+                nombre, datos['llamadas'], datos['errores'], datos['filas'], formatear(datos['media_segundos']),
+                formatear(datos['p50_segundos']), formatear(datos['p95_segundos']),
+                formatear(datos['maximo_segundos'])))
+        self.window.after(self.INTERVALO_MS, self.refrescar)
+
+    def cambiar_activa(self):
+
+        """Activa o desactiva el registro de métricas según la casilla."""
+
+        instrumentacion.registro.activo = self.activa.get()
 
-        """Exporta el historial de clientes a un archivo CSV para su uso externo."""
+    def reiniciar(self):
 
-        historial = recuperar_historial()
-        with open('historial_clientes.csv', 'w') as file:
-            file.write(
-                "Nombre,Fecha,Peso,Altura,Edad,Género,Cintura,Cadera,Cuello,TMB,Porcentaje Grasa,Peso Grasa,Masa Muscular,"
-                "Agua Total,Peso Mínimo,Peso Máximo,Sobrepeso,RCC,Ratio Cintura/Altura,Calorías Diarias,Proteínas,Carbohidratos,Grasas\n")
-            for cliente in historial:
-                file.write(
-                    f"{cliente.nombre},{cliente.fecha},{cliente.peso},{cliente.altura},{cliente.edad},{cliente.genero},"
-                    f"{cliente.cintura},{cliente.cadera},{cliente.cuello},{cliente.tmb},{cliente.porcentaje_grasa},"
-                    f"{cliente.peso_grasa},{cliente.masa_muscular},{cliente.agua_total},{cliente.peso_min},{cliente.peso_max},"
-                    f"{cliente.sobrepeso},{cliente.rcc},{cliente.ratio_cintura_altura},{cliente.calorias_diarias},{cliente.proteinas},"
-                    f"{cliente.carbohidratos},{cliente.grasas}\n")
-        messagebox.showinfo("Exportación", "Historial exportado con éxito a 'historial_clientes.csv'.")
+        """Descarta las métricas registradas hasta ahora."""
+
+        instrumentacion.registro.reiniciar()
+        self.refrescar()
+
+    def guardar(self):
+
+        """Guarda las métricas en un archivo de texto de Prometheus o JSON."""
+
+        ruta = filedialog.asksaveasfilename(
+            parent=self.window, title="Guardar métricas", initialfile='metricas.prom',
+            filetypes=[("Prometheus", "*.prom"), ("JSON", "*.json")])
+        if ruta:
+            instrumentacion.registro.volcar(ruta)
 
 
 class AdminApplication:
@@ -562,11 +1386,16 @@ class LoginWindow:
         o registrar credenciales
         para acceder a la aplicación de Análisis de Composición Corporal.
 
+        La verificación con bcrypt se hace en el trabajador de base de datos mientras la ventana muestra
+        un indicador de actividad. Si el puesto tiene una sesión recordada vigente, se entra directamente.
+
         Atributos:
             root (tk.Tk): La ventana raíz en la que se ejecuta la interfaz de inicio de sesión.
             frame (ttk.Frame): Contenedor para los widgets de entrada y botones.
             username (tk.StringVar): Variable de control para el nombre de usuario.
             password (tk.StringVar): Variable de control para la contraseña.
+            estado (tk.StringVar): Mensaje que acompaña al indicador de actividad.
+            trabajador (TrabajadorBD): Ejecuta la verificación de credenciales fuera del hilo de la interfaz.
         """
     def __init__(self, root):
         """Inicializa la ventana de login con la configuración básica de la UI.
@@ -576,7 +1405,9 @@ class LoginWindow:
                 """
         self.root = root
         self.root.title("Welcome to CoachBodyMetrics")
+        self.trabajador = TrabajadorBD(self.root)
         self.setup_ui()
+        self.root.after_idle(self.comprobar_sesion_recordada)
 
     def setup_ui(self):
 
@@ -593,31 +1424,118 @@ class LoginWindow:
         self.password = tk.StringVar()
         ttk.Entry(self.frame, textvariable=self.password, show='*').grid(row=1, column=1, sticky=(tk.W, tk.E), pady=5)
 
-        ttk.Button(self.frame, text="Iniciar Sesión", command=self.login).grid(row=2, column=0, pady=10)
-        ttk.Button(self.frame, text="Registrarse", command=self.register).grid(row=2, column=1, pady=10)
+        self.boton_login = ttk.Button(self.frame, text="Iniciar Sesión", command=self.login)
+        self.boton_login.grid(row=2, column=0, pady=10)
+        self.boton_registro = ttk.Button(self.frame, text="Registrarse", command=self.register)
+        self.boton_registro.grid(row=2, column=1, pady=10)
+
+        self.estado = tk.StringVar()
+        ttk.Label(self.frame, textvariable=self.estado).grid(row=3, column=0, columnspan=2, sticky=tk.W)
+        self.actividad = ttk.Progressbar(self.frame, mode='indeterminate')
+        self.actividad.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        self.actividad.grid_remove()
+
+    def ocupado(self, mensaje):
+
+        """Desactiva los botones y muestra el indicador de actividad mientras trabaja bcrypt."""
+
+        self.boton_login.state(['disabled'])
+        self.boton_registro.state(['disabled'])
+        self.estado.set(mensaje)
+        self.actividad.grid()
+        self.actividad.start(10)
+
+    def libre(self):
+
+        """Vuelve a activar los botones y oculta el indicador de actividad."""
+
+        self.actividad.stop()
+        self.actividad.grid_remove()
+        self.estado.set("")
+        self.boton_login.state(['!disabled'])
+        self.boton_registro.state(['!disabled'])
+
+    def comprobar_sesion_recordada(self):
+
+        """Entra directamente en la aplicación si el puesto tiene una sesión recordada vigente.
+
+        Se llama cuando la ventana ya está dibujada; la carga de módulos y la comprobación del esquema
+        (precargar) se hacen a la vez en el trabajador y cierran el informe de arranque."""
+
+        arranque.marcar('ventana_login')
+
+        def informar():
+            try:
+                arranque.guardar_informe()
+            except OSError as e:
+                print(f"No se pudo guardar el informe de arranque: {e}")
+            if os.environ.get('COACHBODYMETRICS_TIEMPOS'):
+                print(arranque.resumen())
+
+        def al_terminar(username):
+            self.libre()
+            informar()
+            if username:
+                self.abrir_aplicacion()
+
+        def al_fallar(error):
+            self.libre()
+            informar()
+
+        self.ocupado("Comprobando sesión...")
+        self.trabajador.enviar(precargar, al_terminar=al_terminar, al_fallar=al_fallar)
 
     def login(self):
 
         """Inicia sesión del usuario verificando las credenciales contra la base de datos."""
 
+        from autenticacion import autenticar, recordar_sesion
+
         username = self.username.get()
         password = self.password.get()
 
-        try:
-            session = Session()
-            user = session.query(Usuario).filter_by(username=username).first()
-            if user and user.check_password(password):
+        def verificar():
+            usuario = autenticar(username, password)
+            if usuario:
+                try:
+                    recordar_sesion(usuario)
+                except Exception as e:
+                    print(f"No se pudo recordar la sesión: {e}")
+            return usuario
+
+        def al_terminar(usuario):
+            self.libre()
+            if usuario:
                 messagebox.showinfo("Éxito", "Inicio de sesión exitoso")
-                self.root.withdraw()  # Oculta la ventana de login
-                main_app_window = tk.Toplevel()
-                MainApplication(main_app_window)
-                main_app_window.protocol("WM_DELETE_WINDOW", self.on_closing)
+                self.abrir_aplicacion()
             else:
                 messagebox.showerror("Error", "Usuario o contraseña incorrectos")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al iniciar sesión: {str(e)}")
-        finally:
-            session.close()
+
+        def al_fallar(error):
+            self.libre()
+            messagebox.showerror("Error", f"Error al iniciar sesión: {str(error)}")
+
+        self.ocupado("Verificando credenciales...")
+        self.trabajador.enviar(verificar, al_terminar=al_terminar, al_fallar=al_fallar)
+
+    def abrir_aplicacion(self):
+
+        """Oculta la ventana de login y abre la aplicación principal."""
+
+        self.trabajador.cerrar()
+        self.root.withdraw()  # Oculta la ventana de login
+        main_app_window = tk.Toplevel()
+        MainApplication(main_app_window, al_cerrar_sesion=self.volver_a_login)
+        main_app_window.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def volver_a_login(self):
+
+        """Vuelve a mostrar la ventana de login, sin la contraseña anterior, tras cerrar la sesión."""
+
+        self.trabajador = TrabajadorBD(self.root)
+        self.password.set("")
+        self.libre()
+        self.root.deiconify()
 
     def on_closing(self):
 
@@ -627,24 +1545,24 @@ class LoginWindow:
     def register(self):
 
         """Registra un nuevo usuario en la base de datos e informa si la creación fue errónea o exitosa"""
+        from autenticacion import registrar
+
         username = self.username.get()
         password = self.password.get()
 
-        try:
-            session = Session()
-            existing_user = session.query(Usuario).filter_by(username=username).first()
-            if existing_user:
-                messagebox.showerror("Error", "El nombre de usuario ya existe")
-            else:
-                new_user = Usuario(username=username)
-                new_user.set_password(password)
-                session.add(new_user)
-                session.commit()
+        def al_terminar(registrado):
+            self.libre()
+            if registrado:
                 messagebox.showinfo("Éxito", "Usuario registrado correctamente")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al registrar el usuario: {str(e)}")
-        finally:
-            session.close()
+            else:
+                messagebox.showerror("Error", "El nombre de usuario ya existe")
+
+        def al_fallar(error):
+            self.libre()
+            messagebox.showerror("Error", f"Error al registrar el usuario: {str(error)}")
+
+        self.ocupado("Registrando usuario...")
+        self.trabajador.enviar(registrar, username, password, al_terminar=al_terminar, al_fallar=al_fallar)
 
 
 def main():
@@ -652,6 +1570,13 @@ def main():
     login_window = LoginWindow(root)
     root.mainloop()
 
+    instrumentacion.volcar_al_salir()
+    from base_datos import cerrar_motor
+    cerrar_motor()
+
 
 if __name__ == "__main__":
+    # En un ejecutable de PyInstaller cada proceso del importador vuelve a lanzar el ejecutable;
+    # freeze_support hace que ejecute su tarea en lugar de abrir otra ventana de inicio de sesión
+    multiprocessing.freeze_support()
     main()
@@ -1,10 +1,47 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Index, ForeignKey, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import os
 import bcrypt
+from instrumentacion import instrumentar
 
 Base = declarative_base()
 
+'''Coste (log2 de las rondas) de bcrypt para las contraseñas nuevas; se puede ajustar con la variable de entorno
+   COACHBODYMETRICS_COSTE_BCRYPT dentro del intervalo que admite bcrypt.'''
+
+COSTE_BCRYPT_POR_DEFECTO = 12
+COSTE_BCRYPT_MINIMO = 4
+COSTE_BCRYPT_MAXIMO = 31
+
+
+def leer_coste_bcrypt(valor):
+
+    """Interpreta el coste de bcrypt indicado en la variable de entorno sin impedir que se importe el módulo.
+
+        Args:
+            valor (str): Valor de la variable de entorno, o None si no está definida.
+
+        Returns:
+            int: El coste, limitado a COSTE_BCRYPT_MINIMO..COSTE_BCRYPT_MAXIMO; COSTE_BCRYPT_POR_DEFECTO si no
+                está definido o no es un número entero (con un aviso por consola).
+        """
+    if valor is None or not valor.strip():
+        return COSTE_BCRYPT_POR_DEFECTO
+    try:
+        coste = int(valor)
+    except ValueError:
+        print(f"COACHBODYMETRICS_COSTE_BCRYPT no es un número entero ({valor!r}); se usa {COSTE_BCRYPT_POR_DEFECTO}.")
+        return COSTE_BCRYPT_POR_DEFECTO
+    limitado = min(max(coste, COSTE_BCRYPT_MINIMO), COSTE_BCRYPT_MAXIMO)
+    if limitado != coste:
+        print(f"COACHBODYMETRICS_COSTE_BCRYPT debe estar entre {COSTE_BCRYPT_MINIMO} y {COSTE_BCRYPT_MAXIMO} "
+              f"({coste}); se usa {limitado}.")
+    return limitado
+
+
+COSTE_BCRYPT = leer_coste_bcrypt(os.environ.get('COACHBODYMETRICS_COSTE_BCRYPT'))
+
 class Usuario(Base):
 
     """
@@ -18,8 +55,9 @@ class Usuario(Base):
             is_admin (Boolean): Indica si el usuario tiene privilegios de administrador.
 
         Métodos:
-            set_password(self, password): Encripta y establece la contraseña del usuario.
+            set_password(self, password, coste): Encripta y establece la contraseña del usuario.
             check_password(self, password): Verifica si una contraseña proporcionada coincide con la almacenada.
+            coste_password(self): Devuelve el coste de bcrypt con el que se guardó la contraseña.
         """
     __tablename__ = 'usuarios'
     id = Column(Integer, primary_key=True)
@@ -27,12 +65,115 @@ class Usuario(Base):
     password = Column(String(255), nullable=False)
     is_admin = Column(Boolean, default=False)
 
-    def set_password(self, password):
-        self.password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    @instrumentar('bcrypt_cifrar')
+    def set_password(self, password, coste=None):
+        rondas = coste or COSTE_BCRYPT
+        self.password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rondas)).decode('utf-8')
 
+    @instrumentar('bcrypt_verificar')
     def check_password(self, password):
         return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
 
+    def coste_password(self):
+        # Formato del hash de bcrypt: $2b$<coste>$<sal y hash>
+        return int(self.password.split('$')[2])
+
+
+class SesionUsuario(Base):
+    """
+        Sesión iniciada en un puesto de trabajo, para no repetir la verificación con bcrypt cada vez que se abre
+        la aplicación.
+
+        Atributos:
+            id (Integer): Clave primaria.
+            usuario_id (Integer): Usuario al que pertenece la sesión.
+            token_hash (String(64)): SHA-256 del token guardado en el puesto; el token en claro no se almacena.
+            expira (DateTime): Momento a partir del cual la sesión deja de ser válida.
+        """
+    __tablename__ = 'sesiones'
+    id = Column(Integer, primary_key=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    expira = Column(DateTime, nullable=False)
+
+class Importacion(Base):
+    """
+        Estado de la importación de un archivo de mediciones, para poder reanudarla si se interrumpe.
+
+        Se actualiza en la misma transacción que inserta cada bloque de clientes, así que registros_procesados
+        nunca cuenta filas que no estén guardadas.
+
+        Atributos:
+            id (Integer): Clave primaria.
+            huella (String(64)): SHA-256 del contenido del archivo; identifica la importación.
+            archivo (String): Ruta del archivo la última vez que se importó.
+            registros_procesados (Integer): Registros leídos del archivo (guardados o rechazados).
+            importados (Integer): Registros guardados en la tabla clientes.
+            rechazados (Integer): Registros descartados y escritos en el archivo de rechazos.
+            completada (Boolean): Indica si se ha llegado al final del archivo.
+            actualizada (DateTime): Momento del último bloque guardado.
+        """
+    __tablename__ = 'importaciones'
+    id = Column(Integer, primary_key=True)
+    huella = Column(String(64), unique=True, nullable=False)
+    archivo = Column(String, nullable=False)
+    registros_procesados = Column(Integer, nullable=False, default=0)
+    importados = Column(Integer, nullable=False, default=0)
+    rechazados = Column(Integer, nullable=False, default=0)
+    completada = Column(Boolean, nullable=False, default=False)
+    actualizada = Column(DateTime, nullable=False)
+
+class Estadistica(Base):
+    """
+        Resumen acumulado de una métrica para un grupo de mediciones (género, tramo de edad y mes).
+
+        Se actualiza en la misma transacción que cada inserción en clientes (ver estadisticas.py), de modo
+        que las medias, desviaciones y rangos se obtienen sin leer la tabla clientes.
+
+        Atributos:
+            genero (String(1)): Género del grupo.
+            tramo_edad (String(10)): Tramo de edad del grupo, por ejemplo '30-39'.
+            mes (String(7)): Mes de las mediciones, en formato 'AAAA-MM'.
+            metrica (String(30)): Nombre de la métrica ('porcentaje_grasa', 'ffmi', 'imc', 'calorias_diarias').
+            n (Integer): Número de mediciones.
+            suma (Float): Suma de los valores.
+            suma_cuadrados (Float): Suma de los cuadrados de los valores.
+            minimo (Float): Valor mínimo.
+            maximo (Float): Valor máximo.
+        """
+    __tablename__ = 'estadisticas'
+    genero = Column(String(1), primary_key=True)
+    tramo_edad = Column(String(10), primary_key=True)
+    mes = Column(String(7), primary_key=True)
+    metrica = Column(String(30), primary_key=True)
+    n = Column(Integer, nullable=False)
+    suma = Column(Float, nullable=False)
+    suma_cuadrados = Column(Float, nullable=False)
+    minimo = Column(Float, nullable=False)
+    maximo = Column(Float, nullable=False)
+
+class Distribucion(Base):
+    """
+        Número de mediciones con cada valor de una métrica, por género y tramo de edad.
+
+        Los valores se guardan en centésimas, la misma resolución con que se redondean las métricas, así que
+        el histograma es exacto. Se actualiza junto con Estadistica (ver estadisticas.py) y percentiles.py lo
+        usa para situar un análisis respecto a los demás clientes de su grupo.
+
+        Atributos:
+            genero (String(1)): Género del grupo.
+            tramo_edad (String(10)): Tramo de edad del grupo, por ejemplo '30-39'.
+            metrica (String(30)): Nombre de la métrica ('porcentaje_grasa', 'ffmi').
+            valor (Integer): Valor de la métrica multiplicado por 100.
+            n (Integer): Número de mediciones con ese valor.
+        """
+    __tablename__ = 'distribuciones'
+    genero = Column(String(1), primary_key=True)
+    tramo_edad = Column(String(10), primary_key=True)
+    metrica = Column(String(30), primary_key=True)
+    valor = Column(Integer, primary_key=True)
+    n = Column(Integer, nullable=False)
+
 class Cliente(Base):
     """
         Representa un cliente en la base de datos, almacenando información detallada
@@ -64,8 +205,16 @@ class Cliente(Base):
             proteinas (Float): Gramos de proteínas recomendados diariamente.
             carbohidratos (Float): Gramos de carbohidratos recomendados diariamente.
             grasas (Float): Gramos de grasas recomendados diariamente.
+
+        Índices:
+            ix_clientes_nombre_fecha: historial de un cliente ordenado por fecha.
+            ix_clientes_fecha: consultas por rango de fechas y paginación del historial por (fecha, id).
         """
     __tablename__ = 'clientes'
+    __table_args__ = (
+        Index('ix_clientes_nombre_fecha', 'nombre', 'fecha'),
+        Index('ix_clientes_fecha', 'fecha'),
+    )
     id = Column(Integer, primary_key=True)
     nombre = Column(String, nullable=False)
     fecha = Column(DateTime, nullable=False)
@@ -93,16 +242,135 @@ class Cliente(Base):
     grasas = Column(Float)
 
 
-'''Configuración de la base de datos'''
+class Medicion(Base):
+    """
+        Medición de un cliente en el almacenamiento compacto: solo las entradas del análisis.
+
+        Las métricas de Cliente (tmb, porcentaje_grasa, macros...) son funciones de estas columnas y se
+        calculan al leer (ver almacenamiento.py).
+
+        Atributos:
+            id (Integer): Clave primaria; se conserva al migrar entre clientes y mediciones.
+            nombre, fecha, peso, altura, edad, genero, cintura, cadera, cuello: como en Cliente.
+            objetivo (String(10)): Objetivo nutricional ('mantener', 'perder', 'ganar').
+
+        Índices:
+            ix_mediciones_nombre_fecha y ix_mediciones_fecha: los mismos que en Cliente.
+        """
+    __tablename__ = 'mediciones'
+    __table_args__ = (
+        Index('ix_mediciones_nombre_fecha', 'nombre', 'fecha'),
+        Index('ix_mediciones_fecha', 'fecha'),
+    )
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String, nullable=False)
+    fecha = Column(DateTime, nullable=False)
+    peso = Column(Float, nullable=False)
+    altura = Column(Float, nullable=False)
+    edad = Column(Integer, nullable=False)
+    genero = Column(String(1), nullable=False)
+    cintura = Column(Float, nullable=False)
+    cadera = Column(Float, nullable=False)
+    cuello = Column(Float, nullable=False)
+    objetivo = Column(String(10), nullable=False)
+
+
+class NombreCliente(Base):
+    """
+        Nombre distinto de cada cliente, para buscar en el historial sin recorrer todas las mediciones.
+
+        Los disparadores que crea crear_busqueda la rellenan al insertar en clientes o mediciones, y la
+        tabla virtual FTS5 busqueda_nombres la indexa por palabras (sin distinguir mayúsculas ni tildes).
+
+        Atributos:
+            nombre (String): Nombre del cliente, tal y como se guarda en las mediciones.
+        """
+    __tablename__ = 'nombres_clientes'
+    nombre = Column(String, primary_key=True)
+
+
+class Ajuste(Base):
+    """
+        Ajuste de la base de datos guardado como pareja clave-valor (por ejemplo, el modo de almacenamiento).
+
+        Atributos:
+            clave (String(50)): Nombre del ajuste.
+            valor (String): Valor del ajuste.
+        """
+    __tablename__ = 'ajustes'
+    clave = Column(String(50), primary_key=True)
+    valor = Column(String, nullable=False)
+
+
+def crear_indices(engine):
+
+    """Crea los índices que falten en una base de datos existente.
+
+        create_all solo crea los índices de las tablas nuevas; esta función los añade también
+        a los archivos clientes.db creados con versiones anteriores.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): Motor de la base de datos a actualizar.
+        """
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(bind=engine, checkfirst=True)
+
+
+'''Sentencias de la búsqueda por nombre. Todas son idempotentes, así que se ejecutan en cada create_all.
+   El índice FTS5 toma el contenido de nombres_clientes (content=) y guarda prefijos de 2 y 3 letras
+   para que la búsqueda mientras se escribe no recorra el índice entero.'''
+
+DDL_BUSQUEDA_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_nombres USING fts5(nombre, content='nombres_clientes', "
+    "content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS nombres_clientes_ai AFTER INSERT ON nombres_clientes BEGIN "
+    "INSERT INTO busqueda_nombres(rowid, nombre) VALUES (new.rowid, new.nombre); END",
+)
+
+DDL_BUSQUEDA = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS {tabla}_nombre_ai AFTER INSERT ON {tabla} BEGIN "
+    f"INSERT OR IGNORE INTO nombres_clientes(nombre) VALUES (new.nombre); END"
+    for tabla in ('clientes', 'mediciones')
+)
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def crear_busqueda(target, connection, **kw):
+
+    """Crea el índice de búsqueda por nombre y sus disparadores, y lo rellena si está vacío.
+
+        Se ejecuta tras cada Base.metadata.create_all, de modo que también prepara los archivos clientes.db
+        creados con versiones anteriores. Si SQLite no tiene FTS5, la búsqueda usa solo nombres_clientes.
+
+        Args:
+            target (sqlalchemy.MetaData): Metadatos de las tablas (Base.metadata).
+            connection (sqlalchemy.engine.Connection): Conexión con la que se han creado las tablas.
+        """
+    if connection.dialect.name != 'sqlite':
+        return
+    try:
+        with connection.begin_nested():
+            for sentencia in DDL_BUSQUEDA_FTS:
+                connection.exec_driver_sql(sentencia)
+    except OperationalError:
+        pass  # SQLite compilado sin FTS5
+    for sentencia in DDL_BUSQUEDA:
+        connection.exec_driver_sql(sentencia)
+    if connection.exec_driver_sql("SELECT 1 FROM nombres_clientes LIMIT 1").first() is None:
+        connection.exec_driver_sql("INSERT OR IGNORE INTO nombres_clientes(nombre) "
+                                   "SELECT nombre FROM clientes UNION SELECT nombre FROM mediciones")
 
-engine = create_engine('sqlite:///clientes.db')
-Base.metadata.create_all(engine)
 
-'''Creo una sesion en la base de datos'''
+def __getattr__(nombre):
+    # models.engine se mantiene por compatibilidad; el motor vive ahora en base_datos
+    if nombre == 'engine':
+        from base_datos import obtener_motor
+        return obtener_motor()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
-Session = sessionmaker(bind=engine)
-session = Session()
 
 if __name__ == "__main__":
-    Base.metadata.create_all(engine)
-    print("Base de datos creada.")
\ No newline at end of file
+    from base_datos import obtener_motor
+    obtener_motor()
+    print("Base de datos creada.")
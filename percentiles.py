@@ -0,0 +1,181 @@
+"""Percentil de un análisis entre los clientes del mismo género y tramo de edad.
+
+La tabla distribuciones guarda el histograma exacto (en centésimas) de porcentaje_grasa y ffmi por grupo y
+se actualiza en la misma transacción que cada inserción (ver estadisticas.py). Para un grupo y una métrica,
+CachePercentiles guarda en memoria los valores distintos ordenados y el número acumulado de mediciones
+hasta cada uno, así que el percentil de un valor nuevo es una búsqueda binaria y no un recorrido de los
+clientes. La caché se recarga sola cuando el grupo tiene mediciones nuevas, también desde otro proceso.
+
+El percentil es el porcentaje de mediciones del grupo por debajo del valor, contando la mitad de las que
+son iguales: un valor en la mediana da 50 aunque muchos clientes lo compartan.
+"""
+
+import bisect
+import threading
+import weakref
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+
+from base_datos import obtener_motor
+from estadisticas import METRICAS_DISTRIBUCION, centesimas, tramo_edad
+from models import Distribucion, Estadistica
+
+
+MAXIMO_CACHE = 256
+
+NOMBRES_GRUPOS = {'h': 'hombres', 'm': 'mujeres'}
+
+
+class CachePercentiles:
+    """Distribución acumulada de cada grupo y métrica, que se recarga cuando el grupo cambia.
+
+        Cada entrada guarda como sello el número de mediciones del grupo según la tabla estadisticas,
+        que solo tiene una fila por mes; comprobarlo cuesta mucho menos que leer la distribución. Las
+        entradas de cada motor se guardan aparte y desaparecen con él.
+
+        Atributos:
+            maximo (int): Número máximo de distribuciones guardadas por motor.
+            aciertos (int): Consultas servidas desde la caché (para diagnóstico).
+            fallos (int): Consultas que han tenido que leer la distribución.
+        """
+
+    def __init__(self, maximo=MAXIMO_CACHE):
+        self.maximo = maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self._motores = weakref.WeakKeyDictionary()
+        self._cerrojo = threading.Lock()
+
+    def _sello(self, conexion, genero, tramo, metrica):
+        tabla = Estadistica.__table__
+        consulta = select(func.coalesce(func.sum(tabla.c.n), 0)).where(
+            tabla.c.genero == genero, tabla.c.tramo_edad == tramo, tabla.c.metrica == metrica)
+        return conexion.execute(consulta).scalar()
+
+    def _leer(self, conexion, genero, tramo, metrica):
+        tabla = Distribucion.__table__
+        consulta = select(tabla.c.valor, tabla.c.n).where(
+            tabla.c.genero == genero, tabla.c.tramo_edad == tramo, tabla.c.metrica == metrica
+        ).order_by(tabla.c.valor)
+        valores, acumulados, total = [], [], 0
+        for valor, n in conexion.execute(consulta):
+            total += n
+            valores.append(valor)
+            acumulados.append(total)
+        return valores, acumulados
+
+    def distribucion(self, genero, tramo, metrica, motor=None):
+
+        """Devuelve la distribución acumulada de una métrica en un grupo.
+
+            Args:
+                genero (str): Género del grupo ('h' o 'm').
+                tramo (str): Tramo de edad, de estadisticas.TRAMOS_EDAD.
+                metrica (str): Métrica de METRICAS_DISTRIBUCION.
+                motor (sqlalchemy.engine.Engine, opcional): Motor de la base de datos.
+
+            Returns:
+                tuple: (valores, acumulados): valores distintos en centésimas, en orden creciente, y
+                    número de mediciones menores o iguales que cada uno.
+            """
+        motor = motor or obtener_motor()
+        clave = (genero, tramo, metrica)
+        with motor.connect() as conexion:
+            sello = self._sello(conexion, genero, tramo, metrica)
+            with self._cerrojo:
+                entradas = self._motores.setdefault(motor, OrderedDict())
+                entrada = entradas.get(clave)
+                if entrada is not None and entrada[0] == sello:
+                    entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                self.fallos += 1
+            distribucion = self._leer(conexion, genero, tramo, metrica)
+
+        with self._cerrojo:
+            entradas = self._motores.setdefault(motor, OrderedDict())
+            entradas[clave] = (sello, distribucion)
+            entradas.move_to_end(clave)
+            while len(entradas) > self.maximo:
+                entradas.popitem(last=False)
+        return distribucion
+
+    def invalidar(self):
+
+        """Descarta todas las distribuciones guardadas."""
+        with self._cerrojo:
+            self._motores.clear()
+
+
+cache_percentiles = CachePercentiles()
+
+
+def rango_percentil(valores, acumulados, valor):
+
+    """Calcula el percentil de un valor en una distribución acumulada mediante búsqueda binaria.
+
+        Args:
+            valores (list): Valores distintos en orden creciente.
+            acumulados (list): Número de observaciones menores o iguales que cada valor.
+            valor (int): Valor a situar, en las mismas unidades que valores.
+
+        Returns:
+            float: Percentil entre 0 y 100, o None si la distribución está vacía.
+        """
+    if not acumulados:
+        return None
+    i = bisect.bisect_left(valores, valor)
+    menores = acumulados[i - 1] if i else 0
+    iguales = acumulados[i] - menores if i < len(valores) and valores[i] == valor else 0
+    return 100 * (menores + iguales / 2) / acumulados[-1]
+
+
+def percentil(metrica, valor, genero, edad, motor=None):
+
+    """Sitúa el valor de una métrica entre las mediciones del mismo género y tramo de edad.
+
+        Args:
+            metrica (str): 'porcentaje_grasa' o 'ffmi'.
+            valor (float): Valor de la métrica.
+            genero (str): Género del cliente ('h' o 'm').
+            edad (int): Edad del cliente.
+            motor (sqlalchemy.engine.Engine, opcional): Motor de la base de datos.
+
+        Returns:
+            dict: {'percentil', 'n', 'genero', 'tramo_edad'}, o None si el grupo no tiene mediciones.
+        """
+    if metrica not in METRICAS_DISTRIBUCION:
+        raise ValueError(f"Métrica sin distribución: {metrica!r}")
+    tramo = tramo_edad(edad)
+    valores, acumulados = cache_percentiles.distribucion(genero, tramo, metrica, motor)
+    posicion = rango_percentil(valores, acumulados, centesimas(valor))
+    if posicion is None:
+        return None
+    return {'percentil': posicion, 'n': acumulados[-1], 'genero': genero, 'tramo_edad': tramo}
+
+
+def percentiles_analisis(valores, genero, edad, motor=None):
+
+    """Devuelve el percentil de cada métrica de METRICAS_DISTRIBUCION presente en un análisis.
+
+        Args:
+            valores (dict): {metrica: valor}; las métricas sin valor se omiten.
+            genero (str): Género del cliente.
+            edad (int): Edad del cliente.
+            motor (sqlalchemy.engine.Engine, opcional): Motor de la base de datos.
+
+        Returns:
+            dict: {metrica: resultado de percentil (o None)}.
+        """
+    return {metrica: percentil(metrica, valor, genero, edad, motor)
+            for metrica, valor in valores.items() if metrica in METRICAS_DISTRIBUCION and valor is not None}
+
+
+def formatear_percentil(posicion):
+
+    """Describe un percentil para la interfaz, por ejemplo 'Percentil 62 de mujeres 30-39 (n=1234)'."""
+    if posicion is None:
+        return "Percentil: sin datos del grupo"
+    grupo = NOMBRES_GRUPOS.get(posicion['genero'], posicion['genero'])
+    return f"Percentil {posicion['percentil']:.0f} de {grupo} {posicion['tramo_edad']} (n={posicion['n']})"
@@ -0,0 +1,82 @@
+"""Utilidades compartidas por las pruebas (test_*.py): bases de datos temporales y datos de ejemplo.
+
+Los módulos de prueba importan de aquí lo que necesitan en lugar de importarse entre sí.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from almacenamiento import modo_almacenamiento
+from base_datos import crear_motor
+from calculadora import analizar, guardar_lote
+from models import Base
+
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+
+
+def crear_motor_temporal(test):
+    """Crea una base de datos SQLite temporal con el esquema completo, que se borra al terminar la prueba."""
+    directorio = tempfile.TemporaryDirectory()
+    test.addCleanup(directorio.cleanup)
+    motor = crear_motor(f"sqlite:///{os.path.join(directorio.name, 'clientes.db')}")
+    test.addCleanup(motor.dispose)
+    Base.metadata.create_all(motor)
+    return motor
+
+
+def analisis_de_prueba(n, inicio=datetime(2024, 1, 1)):
+    """Genera n análisis alternando género y objetivo, uno por día."""
+    objetivos = ('mantener', 'perder', 'ganar')
+    return [
+        analizar(f"Cliente {i % 7}", 60.0 + i % 30, 160.0 + i % 30, 20 + i % 40, 'h' if i % 2 else 'm',
+                 75.0 + i % 20, 95.0, 35.0, objetivos[i % 3], fecha=inicio + timedelta(days=i))
+        for i in range(n)
+    ]
+
+
+def motor_con_analisis(test, n):
+    """Crea una base de datos temporal con n análisis de analisis_de_prueba guardados y los devuelve con ella."""
+    motor = crear_motor_temporal(test)
+    analisis = analisis_de_prueba(n)
+    guardar_lote(analisis, motor=motor)
+    return motor, analisis
+
+
+def romper_historial(motor):
+    """Borra la tabla clientes con el modo de almacenamiento ya leído, para que fallen las lecturas del historial."""
+    modo_almacenamiento(motor)
+    with motor.begin() as conexion:
+        conexion.execute(text("DROP TABLE clientes"))
+
+
+def registro_valido(i):
+    """Devuelve un registro de entrada válido (como los de un archivo a importar), alternando género y objetivo."""
+    return {
+        'nombre': f"Cliente {i % 5}",
+        'fecha': f"2024-01-{1 + i % 28:02d} 10:00",
+        'peso': 60 + i % 30,
+        'altura': 160 + i % 25,
+        'edad': 20 + i % 40,
+        'genero': 'h' if i % 2 else 'm',
+        'cintura': 75 + i % 20,
+        'cadera': 95,
+        'cuello': 36,
+        'objetivo': ('mantener', 'perder', 'ganar')[i % 3],
+    }
+
+
+def ejecutar_en_directorio_vacio(test, codigo):
+    """Ejecuta código Python en un proceso nuevo cuyo directorio de trabajo es una carpeta temporal vacía."""
+    directorio = tempfile.TemporaryDirectory()
+    test.addCleanup(directorio.cleanup)
+    entorno = dict(os.environ, PYTHONPATH=DIRECTORIO_PROYECTO)
+    proceso = subprocess.run([sys.executable, '-c', codigo], cwd=directorio.name, env=entorno,
+                             capture_output=True, text=True)
+    test.assertEqual(proceso.returncode, 0, proceso.stderr)
+    return directorio.name, proceso.stdout
@@ -0,0 +1,261 @@
+"""API HTTP local para el análisis de composición corporal y la consulta del historial.
+
+Permite que las tabletas de recepción usen el mismo cálculo que la aplicación de escritorio sin ejecutar
+Tk. Las peticiones individuales que llegan a la vez se agrupan durante unos milisegundos y se calculan
+juntas con calculadora_lote.analizar_lote (ver AgrupadorAnalisis). Las consultas a clientes.db se
+ejecutan en un grupo de hilos de tamaño fijo para no bloquear el bucle de eventos.
+
+    python servidor.py --host 0.0.0.0 --puerto 8000
+
+Rutas:
+    GET  /salud             comprobación de que el servicio responde.
+    POST /analisis          un análisis; el cuerpo es un objeto JSON con los campos de entrada.
+    POST /analisis/lote     una lista de objetos; devuelve los resultados y los errores por posición.
+    GET  /historial         una página del historial (parámetros limite, despues_fecha, despues_id); 503 si
+                            la base de datos no se puede leer (bloqueada, dañada...).
+    GET  /metricas          métricas de instrumentación en formato Prometheus (ver instrumentacion.py).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from calculadora import recuperar_historial_pagina
+from calculadora_lote import analizar_lote
+from importador import convertir_registro
+from base_datos import cerrar_motor, obtener_motor
+from instrumentacion import registro
+
+
+HILOS_BD = 4
+ESPERA_LOTE = 0.002
+MAXIMO_LOTE = 256
+MAXIMO_LOTE_PETICION = 10_000
+MAXIMO_PAGINA = 1000
+
+ERROR_MEDIDAS = "Las medidas no permiten calcular el análisis (revise cintura, cadera y cuello)"
+
+
+def _entradas(cuerpo):
+    # Mismas reglas que el importador; la fecha es opcional y por defecto es el momento de la petición
+    if not isinstance(cuerpo, dict):
+        raise ValueError("Cada análisis debe ser un objeto JSON")
+    return convertir_registro({**cuerpo, 'fecha': cuerpo.get('fecha') or datetime.now()})
+
+
+def _columnas(lista_entradas):
+    return {campo: [entradas[campo] for entradas in lista_entradas] for campo in lista_entradas[0]}
+
+
+def _a_json(resultado):
+    valores = resultado.a_diccionario()
+    valores['fecha'] = valores['fecha'].isoformat()
+    return valores
+
+
+class AgrupadorAnalisis:
+    """Agrupa las peticiones de análisis individuales que llegan a la vez para calcularlas en un solo lote.
+
+        La primera petición de un lote arranca un temporizador de espera segundos; el lote se calcula al
+        vencer el temporizador o al llegar a maximo peticiones, lo que ocurra antes. Con poca carga la
+        espera añadida es de unos milisegundos; con mucha, el coste por petición baja porque NumPy calcula
+        cientos de filas de una vez.
+
+        Atributos:
+            espera (float): Segundos que se esperan a más peticiones antes de calcular.
+            maximo (int): Tamaño máximo de un lote.
+            lotes (int): Lotes calculados hasta ahora (para diagnóstico).
+        """
+
+    def __init__(self, espera=ESPERA_LOTE, maximo=MAXIMO_LOTE):
+        self.espera = espera
+        self.maximo = maximo
+        self.lotes = 0
+        self._pendientes = []
+        self._temporizador = None
+
+    async def analizar(self, entradas):
+
+        """Añade unas entradas ya validadas al lote en curso y espera su ResultadoAnalisis."""
+        bucle = asyncio.get_running_loop()
+        futuro = bucle.create_future()
+        self._pendientes.append((entradas, futuro))
+        if len(self._pendientes) >= self.maximo:
+            self._calcular()
+        elif self._temporizador is None:
+            self._temporizador = bucle.call_later(self.espera, self._calcular)
+        return await futuro
+
+    def _calcular(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        lote, self._pendientes = self._pendientes, []
+        if not lote:
+            return
+        self.lotes += 1
+        try:
+            resultados = analizar_lote(_columnas([entradas for entradas, _ in lote]))
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        for (_, futuro), resultado in zip(lote, resultados):
+            if futuro.done():
+                continue
+            if resultado is None:
+                futuro.set_exception(ValueError(ERROR_MEDIDAS))
+            else:
+                futuro.set_result(resultado)
+
+
+def crear_app(motor=None, hilos_bd=HILOS_BD, espera=ESPERA_LOTE, maximo_lote=MAXIMO_LOTE):
+
+    """Crea la aplicación Starlette del servicio.
+
+        Crear la aplicación no toca la base de datos: el grupo de hilos se crea al arrancar el servidor
+        y el motor, en la primera consulta.
+
+        Args:
+            motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+            hilos_bd (int): Hilos del grupo que ejecuta las consultas a la base de datos.
+            espera (float): Espera máxima para agrupar análisis individuales (ver AgrupadorAnalisis).
+            maximo_lote (int): Tamaño máximo de un lote de análisis individuales.
+
+        Returns:
+            starlette.applications.Starlette: La aplicación ASGI.
+        """
+
+    async def en_hilo_bd(request, funcion, *args, **kwargs):
+        bucle = asyncio.get_running_loop()
+        return await bucle.run_in_executor(request.app.state.ejecutor_bd,
+                                           functools.partial(funcion, *args, **kwargs))
+
+    async def leer_json(request):
+        try:
+            return await request.json()
+        except ValueError:
+            raise ValueError("El cuerpo de la petición no es JSON válido") from None
+
+    async def salud(request):
+        return JSONResponse({'estado': 'ok', 'lotes': request.app.state.agrupador.lotes})
+
+    async def analisis(request):
+        try:
+            entradas = _entradas(await leer_json(request))
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=422)
+        try:
+            resultado = await request.app.state.agrupador.analizar(entradas)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=422)
+        return JSONResponse(_a_json(resultado))
+
+    async def analisis_lote(request):
+        try:
+            cuerpo = await leer_json(request)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=422)
+        if not isinstance(cuerpo, list):
+            return JSONResponse({'error': "El cuerpo debe ser una lista de análisis"}, status_code=422)
+        if len(cuerpo) > MAXIMO_LOTE_PETICION:
+            return JSONResponse({'error': f"Como máximo {MAXIMO_LOTE_PETICION} análisis por petición"},
+                                status_code=413)
+
+        validas, posiciones, errores = [], [], []
+        for indice, elemento in enumerate(cuerpo):
+            try:
+                validas.append(_entradas(elemento))
+                posiciones.append(indice)
+            except ValueError as e:
+                errores.append({'indice': indice, 'error': str(e)})
+        resultados = [None] * len(cuerpo)
+        if validas:
+            # Un lote grande tarda lo bastante como para no calcularlo en el hilo del bucle de eventos
+            calculados = await run_in_threadpool(analizar_lote, _columnas(validas))
+            for indice, resultado in zip(posiciones, calculados):
+                if resultado is None:
+                    errores.append({'indice': indice, 'error': ERROR_MEDIDAS})
+                else:
+                    resultados[indice] = _a_json(resultado)
+            errores.sort(key=lambda error: error['indice'])
+        return JSONResponse({'resultados': resultados, 'errores': errores})
+
+    async def historial(request):
+        parametros = request.query_params
+        try:
+            limite = int(parametros.get('limite', 200))
+            if limite < 1:
+                # LIMIT -1 en SQLite devolvería todo el historial
+                raise ValueError(limite)
+            limite = min(limite, MAXIMO_PAGINA)
+            cursor = None
+            if 'despues_fecha' in parametros:
+                cursor = (datetime.fromisoformat(parametros['despues_fecha']), int(parametros['despues_id']))
+        except (KeyError, ValueError):
+            return JSONResponse({'error': "Parámetros de paginación no válidos"}, status_code=422)
+
+        try:
+            pagina = await en_hilo_bd(request, recuperar_historial_pagina, cursor, limite,
+                                      motor=request.app.state.motor)
+        except SQLAlchemyError as e:
+            # Con 200 y una página vacía la tableta no podría distinguirlo de un historial vacío
+            print(f"Error al recuperar historial: {e}")
+            return JSONResponse({'error': "No se pudo leer el historial"}, status_code=503)
+        filas = [{**fila._asdict(), 'fecha': fila.fecha.isoformat()} for fila in pagina]
+        siguiente = None
+        if len(pagina) == limite and pagina:
+            siguiente = {'despues_fecha': filas[-1]['fecha'], 'despues_id': filas[-1]['id']}
+        return JSONResponse({'filas': filas, 'siguiente': siguiente})
+
+    async def metricas(request):
+        return PlainTextResponse(registro.a_prometheus(), media_type='text/plain; version=0.0.4')
+
+    @contextlib.asynccontextmanager
+    async def ciclo_de_vida(app):
+        app.state.ejecutor_bd = ThreadPoolExecutor(max_workers=hilos_bd, thread_name_prefix='api-bd')
+        try:
+            yield
+        finally:
+            app.state.ejecutor_bd.shutdown(wait=True)
+            if motor is None:
+                cerrar_motor()
+
+    app = Starlette(routes=[
+        Route('/salud', salud),
+        Route('/analisis', analisis, methods=['POST']),
+        Route('/analisis/lote', analisis_lote, methods=['POST']),
+        Route('/historial', historial),
+        Route('/metricas', metricas),
+    ], lifespan=ciclo_de_vida)
+    app.state.motor = motor
+    app.state.agrupador = AgrupadorAnalisis(espera, maximo_lote)
+    return app
+
+
+app = crear_app()
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API HTTP local de CoachBodyMetrics.")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección en la que escuchar")
+    parser.add_argument('--puerto', type=int, default=8000, help="Puerto en el que escuchar")
+    args = parser.parse_args(argv)
+    obtener_motor()
+    uvicorn.run(app, host=args.host, port=args.puerto, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Evolución de cada cliente entre visitas, calculada en la base de datos con funciones de ventana.
+
+Para cada medición se obtiene, en peso, porcentaje_grasa, masa_muscular y ffmi:
+
+    <metrica>_cambio         diferencia con la visita anterior del mismo cliente.
+    <metrica>_cambio_total   diferencia con la primera visita.
+    <metrica>_media          media de las últimas VENTANA_MEDIA visitas (incluida esta).
+    <metrica>_semanal        ritmo de cambio por semana desde la visita anterior.
+
+además de semanas_desde_anterior y semanas_desde_inicio. Las ventanas se particionan por nombre y se
+ordenan por (fecha, id), de modo que SQLite recorre el índice ix_clientes_nombre_fecha de los clientes
+afectados y no la tabla entera.
+
+En el almacenamiento compacto (ver almacenamiento.py) las métricas no están en la base de datos, así que
+las mismas columnas se calculan en memoria sobre las mediciones de los clientes afectados.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from datetime import timedelta
+
+from sqlalchemy import func, select
+
+from almacenamiento import MODO_COMPACTO, columnas_lectura, modo_almacenamiento, tabla_datos
+from calculadora import COLUMNAS_HISTORIAL, claves_orden, consultar, filtrar_pagina, recuperar_historial_pagina
+from base_datos import obtener_motor
+from instrumentacion import instrumentar
+from models import Cliente
+
+
+'''Métricas cuya evolución se calcula y número de visitas de la media móvil.'''
+
+METRICAS_TENDENCIA = ('peso', 'porcentaje_grasa', 'masa_muscular', 'ffmi')
+VENTANA_MEDIA = 3
+
+COLUMNAS_TENDENCIA = ('semanas_desde_anterior', 'semanas_desde_inicio') + tuple(
+    f"{metrica}_{sufijo}" for metrica in METRICAS_TENDENCIA
+    for sufijo in ('cambio', 'cambio_total', 'media', 'semanal'))
+
+'''Clientes cuya evolución se guarda en memoria (los menos usados recientemente se descartan primero).'''
+
+MAXIMO_CACHE = 256
+
+'''Nombre y unidad de cada métrica en el resumen de la ventana del gráfico.'''
+
+NOMBRES_TENDENCIA = {'peso': ('peso', ' kg'), 'porcentaje_grasa': ('grasa', '%'),
+                     'masa_muscular': ('masa muscular', ' kg'), 'ffmi': ('FFMI', '')}
+
+
+def _columnas_tendencia(tabla):
+    ventana = {'partition_by': tabla.c.nombre, 'order_by': (tabla.c.fecha, tabla.c.id)}
+    dias = func.julianday(tabla.c.fecha)
+    # En SQLite dividir entre cero da NULL, así que dos visitas el mismo día no tienen ritmo semanal
+    semanas_anterior = (dias - func.lag(dias).over(**ventana)) / 7.0
+    columnas = [
+        semanas_anterior.label('semanas_desde_anterior'),
+        ((dias - func.first_value(dias).over(**ventana)) / 7.0).label('semanas_desde_inicio'),
+    ]
+    for metrica in METRICAS_TENDENCIA:
+        valor = tabla.c[metrica]
+        cambio = valor - func.lag(valor).over(**ventana)
+        columnas += [
+            cambio.label(f"{metrica}_cambio"),
+            (valor - func.first_value(valor).over(**ventana)).label(f"{metrica}_cambio_total"),
+            func.avg(valor).over(rows=(-(VENTANA_MEDIA - 1), 0), **ventana).label(f"{metrica}_media"),
+            (cambio / semanas_anterior).label(f"{metrica}_semanal"),
+        ]
+    return columnas
+
+
+FilaTendencia = namedtuple('FilaTendencia', COLUMNAS_HISTORIAL + COLUMNAS_TENDENCIA)
+
+
+def _diferencia(a, b):
+    return None if a is None or b is None else a - b
+
+
+def _tendencias_en_memoria(filas):
+    # Mismo resultado que _columnas_tendencia para filas ordenadas por (nombre, fecha, id)
+    semana = timedelta(weeks=1)
+    resultado = []
+    anterior = primera = None
+    for fila in filas:
+        if anterior is None or fila.nombre != anterior.nombre:
+            anterior, primera = None, fila
+            recientes = {metrica: deque(maxlen=VENTANA_MEDIA) for metrica in METRICAS_TENDENCIA}
+        semanas_anterior = None if anterior is None else (fila.fecha - anterior.fecha) / semana
+        valores = [semanas_anterior, (fila.fecha - primera.fecha) / semana]
+        for metrica in METRICAS_TENDENCIA:
+            valor = getattr(fila, metrica)
+            recientes[metrica].append(valor)
+            presentes = [v for v in recientes[metrica] if v is not None]
+            cambio = None if anterior is None else _diferencia(valor, getattr(anterior, metrica))
+            valores += [
+                cambio,
+                _diferencia(valor, getattr(primera, metrica)),
+                sum(presentes) / len(presentes) if presentes else None,
+                cambio / semanas_anterior if cambio is not None and semanas_anterior else None,
+            ]
+        resultado.append(FilaTendencia(*(getattr(fila, c) for c in COLUMNAS_HISTORIAL), *valores))
+        anterior = fila
+    return resultado
+
+
+def _tendencias_compacto(nombres, motor):
+    tabla, columnas, completar = columnas_lectura(COLUMNAS_HISTORIAL, motor)
+    consulta = (select(*columnas).where(tabla.c.nombre.in_(nombres))
+                .order_by(tabla.c.nombre, tabla.c.fecha, tabla.c.id))
+    return _tendencias_en_memoria(completar(consultar(consulta, motor)))
+
+
+def _consulta_tendencias(condicion):
+    tabla = Cliente.__table__
+    return (select(*(tabla.c[c] for c in COLUMNAS_HISTORIAL), *_columnas_tendencia(tabla))
+            .where(condicion))
+
+
+def recuperar_tendencias(nombre, motor=None):
+
+    """
+            Recupera todas las mediciones de un cliente con su evolución, sin pasar por la caché.
+
+            Args:
+                nombre (str): Nombre del cliente.
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+            Returns:
+                list: Filas con las columnas de COLUMNAS_HISTORIAL y COLUMNAS_TENDENCIA, de la más antigua
+                    a la más reciente. Los cambios de la primera visita son None.
+            """
+    if modo_almacenamiento(motor) == MODO_COMPACTO:
+        return _tendencias_compacto([nombre], motor)
+    tabla = Cliente.__table__
+    consulta = _consulta_tendencias(tabla.c.nombre == nombre).order_by(tabla.c.fecha, tabla.c.id)
+    return consultar(consulta, motor)
+
+
+@instrumentar('recuperar_historial_pagina_tendencias', filas=len)
+def recuperar_historial_pagina_tendencias(despues_de=None, limite=200, motor=None, orden='fecha',
+                                          descendente=False, busqueda=None):
+
+    """
+            Igual que calculadora.recuperar_historial_pagina, pero con las columnas de COLUMNAS_TENDENCIA.
+
+            La página se elige primero con paginación por clave (con el orden y la búsqueda pedidos); después
+            las ventanas se calculan solo sobre las mediciones de los clientes que aparecen en ella.
+
+            Args:
+                despues_de (tuple, opcional): Cursor de la última fila ya leída (ver calculadora.clave_pagina);
+                    None para la primera página.
+                limite (int): Número máximo de filas de la página.
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+                orden (str): Uno de calculadora.ORDENES_HISTORIAL.
+                descendente (bool): Si el orden es de mayor a menor.
+                busqueda (str, opcional): Limita la página a los clientes cuyo nombre coincide.
+
+            Returns:
+                list: Filas accesibles por nombre (fila.peso, fila.peso_cambio...), en el orden pedido.
+            """
+    if modo_almacenamiento(motor) == MODO_COMPACTO:
+        pagina = recuperar_historial_pagina(despues_de, limite, motor, orden, descendente, busqueda)
+        tendencias = {fila.id: fila for fila in _tendencias_compacto(sorted({fila.nombre for fila in pagina}), motor)}
+        return [tendencias[fila.id] for fila in pagina]
+
+    tabla = Cliente.__table__
+    pagina = filtrar_pagina(select(tabla.c.id, tabla.c.nombre), tabla, despues_de, orden, descendente, busqueda,
+                            motor).limit(limite).subquery()
+
+    # Las ventanas se calculan dentro de la subconsulta, antes de quedarse con las filas de la página
+    tendencias = _consulta_tendencias(tabla.c.nombre.in_(select(pagina.c.nombre))).subquery()
+    consulta = (select(tendencias)
+                .where(tendencias.c.id.in_(select(pagina.c.id)))
+                .order_by(*claves_orden(tendencias, orden, descendente)))
+    return consultar(consulta, motor)
+
+
+class CacheTendencias:
+    """Caché de la evolución por cliente que se invalida sola cuando llega una medición nueva.
+
+        Cada entrada guarda junto a las filas un sello (número de mediciones e id más alto del cliente).
+        Comprobar el sello es una consulta sobre el índice (nombre, fecha), mucho más barata que recalcular
+        las ventanas, y detecta también las mediciones guardadas desde otro proceso (importador, API...).
+        Las entradas de cada motor se guardan aparte y desaparecen con él.
+
+        Atributos:
+            maximo (int): Número máximo de clientes guardados por motor.
+            aciertos (int): Consultas servidas desde la caché (para diagnóstico).
+            fallos (int): Consultas que han tenido que recalcular la evolución.
+        """
+
+    def __init__(self, maximo=MAXIMO_CACHE):
+        self.maximo = maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self._motores = weakref.WeakKeyDictionary()
+        self._cerrojo = threading.Lock()
+
+    def _sello(self, nombre, motor):
+        tabla = tabla_datos(motor)
+        consulta = select(func.count(), func.max(tabla.c.id)).where(tabla.c.nombre == nombre)
+        with motor.connect() as conexion:
+            return tuple(conexion.execute(consulta).one())
+
+    def obtener(self, nombre, motor=None):
+
+        """Devuelve la evolución de un cliente (como recuperar_tendencias), recalculándola solo si ha cambiado."""
+        motor = motor or obtener_motor()
+        sello = self._sello(nombre, motor)
+        with self._cerrojo:
+            entradas = self._motores.setdefault(motor, OrderedDict())
+            entrada = entradas.get(nombre)
+            if entrada is not None and entrada[0] == sello:
+                entradas.move_to_end(nombre)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+
+        filas = recuperar_tendencias(nombre, motor)
+        with self._cerrojo:
+            entradas = self._motores.setdefault(motor, OrderedDict())
+            entradas[nombre] = (sello, filas)
+            entradas.move_to_end(nombre)
+            while len(entradas) > self.maximo:
+                entradas.popitem(last=False)
+        return filas
+
+    def invalidar(self, nombre=None):
+
+        """Descarta la evolución guardada de un cliente, o de todos si no se indica ninguno."""
+        with self._cerrojo:
+            if nombre is None:
+                self._motores.clear()
+            else:
+                for entradas in self._motores.values():
+                    entradas.pop(nombre, None)
+
+
+cache_tendencias = CacheTendencias()
+
+
+def tendencias_cliente(nombre, motor=None):
+
+    """
+            Devuelve la evolución de un cliente usando la caché compartida de la aplicación.
+
+            Args:
+                nombre (str): Nombre del cliente.
+                motor (sqlalchemy.engine.Engine, opcional): Motor a utilizar; por defecto, el de clientes.db.
+
+            Returns:
+                list: Las mismas filas que recuperar_tendencias.
+            """
+    return cache_tendencias.obtener(nombre, motor)
+
+
+def resumen_tendencias(filas):
+
+    """Resume la evolución de un cliente en una línea, a partir de su última medición.
+
+        Args:
+            filas (list): Filas de recuperar_tendencias o tendencias_cliente, de la más antigua a la más reciente.
+
+        Returns:
+            str: Por ejemplo 'Desde la primera visita (12 semanas): peso -2.3 kg, ... | Desde la anterior: ...';
+                vacío si el cliente tiene menos de dos mediciones.
+        """
+    if len(filas) < 2:
+        return ""
+    ultima = filas[-1]
+
+    def cambios(sufijo):
+        partes = []
+        for metrica, (nombre, unidad) in NOMBRES_TENDENCIA.items():
+            valor = getattr(ultima, f"{metrica}_{sufijo}")
+            if valor is not None:
+                partes.append(f"{nombre} {valor:+.1f}{unidad}")
+        return ", ".join(partes)
+
+    return (f"Desde la primera visita ({ultima.semanas_desde_inicio:.0f} semanas): {cambios('cambio_total')} | "
+            f"Desde la anterior: {cambios('cambio')}")
@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime
+from sqlalchemy import func, select
+from almacenamiento import MODO_COMPACTO, MODO_COMPLETO, migrar, modo_almacenamiento, objetivo_de
+from calculadora import (
+    guardar_datos, guardar_lote, recuperar_historial_cliente, recuperar_historial_pagina,
+    recuperar_ultimas_mediciones
+)
+from estadisticas import consultar_estadisticas, reconstruir_estadisticas
+from exportador import iterar_historial
+from base_datos import crear_motor
+from models import Cliente, Medicion
+from tendencias import recuperar_historial_pagina_tendencias, recuperar_tendencias
+from pruebas_utiles import analisis_de_prueba, motor_con_analisis
+
+
+class TestAlmacenamiento(unittest.TestCase):
+
+    """Pruebas del almacenamiento compacto y de la migración entre modos."""
+
+    def setUp(self):
+        self.motor, self.analisis = motor_con_analisis(self, 60)
+
+    def contar(self, modelo):
+        with self.motor.connect() as conexion:
+            return conexion.execute(select(func.count()).select_from(modelo)).scalar()
+
+    def lecturas(self):
+        return {
+            'pagina': recuperar_historial_pagina(limite=25, motor=self.motor),
+            'cliente': recuperar_historial_cliente("Cliente 2", motor=self.motor),
+            'ultimas': recuperar_ultimas_mediciones(motor=self.motor),
+            'exportacion': [fila for bloque in iterar_historial(tamano_bloque=16, motor=self.motor) for fila in bloque],
+            'tendencias': recuperar_tendencias("Cliente 4", motor=self.motor),
+            'pagina_tendencias': recuperar_historial_pagina_tendencias(limite=25, motor=self.motor),
+        }
+
+    def assertFilasIguales(self, antes, despues):
+        self.assertEqual(len(antes), len(despues))
+        for fila_antes, fila_despues in zip(antes, despues):
+            for valor_antes, valor_despues in zip(fila_antes, fila_despues):
+                if isinstance(valor_antes, float):
+                    self.assertAlmostEqual(valor_antes, valor_despues)
+                else:
+                    self.assertEqual(valor_antes, valor_despues)
+
+    def test_objetivo_deducido(self):
+
+        """Prueba que el objetivo se deduce de la relación entre calorías diarias y TMB"""
+        for i, resultado in enumerate(self.analisis[:6]):
+            self.assertEqual(objetivo_de(resultado.datos_cliente()), ('mantener', 'perder', 'ganar')[i % 3])
+        self.assertEqual(objetivo_de({'objetivo': 'ganar', 'tmb': None}), 'ganar')
+
+    def test_lecturas_iguales_en_los_dos_modos(self):
+
+        """Prueba que migrar a compacto y volver conserva los ids y las métricas de todas las lecturas"""
+        antes = self.lecturas()
+        self.assertEqual(migrar(MODO_COMPACTO, self.motor), 60)
+        self.assertEqual(modo_almacenamiento(self.motor), MODO_COMPACTO)
+        self.assertEqual((self.contar(Cliente), self.contar(Medicion)), (0, 60))
+        for clave, filas in self.lecturas().items():
+            with self.subTest(clave=clave):
+                self.assertFilasIguales(antes[clave], filas)
+
+        self.assertEqual(migrar(MODO_COMPACTO, self.motor), 0)
+        self.assertEqual(migrar(MODO_COMPLETO, self.motor), 60)
+        self.assertEqual((self.contar(Cliente), self.contar(Medicion)), (60, 0))
+        self.assertFilasIguales(antes['exportacion'], self.lecturas()['exportacion'])
+
+    def test_guardar_en_modo_compacto(self):
+
+        """Prueba que guardar_datos y guardar_lote escriben en mediciones y mantienen las estadísticas"""
+        migrar(MODO_COMPACTO, self.motor, vacuum=False)
+        nuevos = analisis_de_prueba(5, inicio=datetime(2025, 1, 1))
+        self.assertTrue(guardar_datos(nuevos[0].datos_cliente(), motor=self.motor))
+        guardar_lote(nuevos[1:], motor=self.motor)
+        self.assertEqual(self.contar(Medicion), 65)
+        ultima = recuperar_historial_cliente(nuevos[-1].nombre, motor=self.motor)[-1]
+        self.assertAlmostEqual(ultima.calorias_diarias, nuevos[-1].calorias_diarias)
+
+        incrementales = consultar_estadisticas('ffmi', motor=self.motor)
+        reconstruir_estadisticas(motor=self.motor)
+        reconstruidas = consultar_estadisticas('ffmi', motor=self.motor)
+        self.assertEqual([g['n'] for g in incrementales], [g['n'] for g in reconstruidas])
+        for incremental, reconstruida in zip(incrementales, reconstruidas):
+            self.assertAlmostEqual(incremental['media'], reconstruida['media'])
+
+    def test_escrituras_tras_migrar_desde_otro_proceso(self):
+
+        """Prueba que un motor con el modo completo en memoria escribe en mediciones si otro lo ha migrado"""
+        self.assertEqual(modo_almacenamiento(self.motor), MODO_COMPLETO)
+        otro = crear_motor(self.motor.url)
+        self.addCleanup(otro.dispose)
+        migrar(MODO_COMPACTO, otro, vacuum=False)
+
+        nuevos = analisis_de_prueba(4, inicio=datetime(2025, 1, 1))
+        self.assertTrue(guardar_datos(nuevos[0], motor=self.motor))
+        guardar_lote(nuevos[1:], motor=self.motor)
+        self.assertEqual((self.contar(Cliente), self.contar(Medicion)), (0, 64))
+        with self.motor.connect() as conexion:
+            objetivos = conexion.execute(
+                select(Medicion.objetivo).where(Medicion.fecha >= datetime(2025, 1, 1)).order_by(Medicion.fecha)
+            ).scalars().all()
+        self.assertEqual(objetivos, [resultado.objetivo for resultado in nuevos])
+
+
+if __name__ == '__main__':
+    unittest.main()
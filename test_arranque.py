@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+import arranque
+from pruebas_utiles import ejecutar_en_directorio_vacio
+
+
+class TestInicializacionPerezosa(unittest.TestCase):
+
+    """Pruebas de que importar los módulos no crea el motor ni toca la base de datos."""
+
+    def test_importar_no_crea_la_base_de_datos(self):
+
+        """Prueba que clientes.db solo se crea, con su esquema, al pedir el motor por primera vez"""
+        directorio, salida = ejecutar_en_directorio_vacio(self, (
+            "import os, models, base_datos, calculadora, exportador, autenticacion\n"
+            "print(base_datos._motor is None, os.path.exists('clientes.db'))\n"
+            "motor = base_datos.obtener_motor()\n"
+            "print(motor is base_datos.obtener_motor() is models.engine)\n"
+            "from sqlalchemy import inspect\n"
+            "print({'clientes', 'usuarios', 'sesiones'} <= set(inspect(motor).get_table_names()))\n"))
+        self.assertEqual(salida.splitlines(), [
+            'True False',
+            'True',
+            'True',
+        ])
+        self.assertTrue(os.path.exists(os.path.join(directorio, 'clientes.db')))
+
+    @unittest.skipUnless(importlib.util.find_spec('tkinter'), "tkinter no está disponible")
+    def test_importar_main_no_carga_modulos_pesados(self):
+
+        """Prueba que la interfaz se puede importar sin cargar SQLAlchemy, NumPy ni bcrypt"""
+        _, salida = ejecutar_en_directorio_vacio(self, (
+            "import sys, main\n"
+            "print([m for m in ('sqlalchemy', 'numpy', 'bcrypt', 'models', 'base_datos') if m in sys.modules])\n"))
+        self.assertEqual(salida.strip(), '[]')
+
+
+class TestInformeArranque(unittest.TestCase):
+
+    """Pruebas del informe de tiempos de arranque."""
+
+    def test_guardar_y_leer_informe(self):
+
+        """Prueba que cada arranque añade una línea con sus etapas en orden"""
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ruta = os.path.join(directorio.name, 'arranque.jsonl')
+        arranque.marcar('prueba_a')
+        arranque.marcar('prueba_b')
+        arranque.guardar_informe(ruta)
+        arranque.guardar_informe(ruta)
+        registros = arranque.leer_informe(ruta)
+        self.assertEqual(len(registros), 2)
+        etapas = registros[-1]['etapas']
+        self.assertLessEqual(etapas['prueba_a'], etapas['prueba_b'])
+        self.assertIn('prueba_b', arranque.resumen())
+        self.assertEqual(arranque.leer_informe(os.path.join(directorio.name, 'no_existe.jsonl')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
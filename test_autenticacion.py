@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest import mock
+import models
+from base_datos import nueva_sesion
+from autenticacion import autenticar, registrar, recordar_sesion, recuperar_sesion, cerrar_sesion
+from pruebas_utiles import crear_motor_temporal, ejecutar_en_directorio_vacio
+
+
+class TestAutenticacion(unittest.TestCase):
+
+    """Pruebas del inicio de sesión, el cambio de coste de bcrypt y las sesiones recordadas."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta_token = os.path.join(directorio.name, 'sesion')
+        # Coste mínimo de bcrypt para que las pruebas sean rápidas
+        parche = mock.patch.object(models, 'COSTE_BCRYPT', 4)
+        parche.start()
+        self.addCleanup(parche.stop)
+        registrar('coach', 'secreto', motor=self.motor)
+
+    def usuario(self):
+        sesion = nueva_sesion(self.motor)
+        self.addCleanup(sesion.close)
+        return sesion.query(models.Usuario).filter_by(username='coach').one()
+
+    def test_registro_y_autenticacion(self):
+
+        """Prueba que solo las credenciales correctas autentican y que no se repiten usuarios"""
+        self.assertFalse(registrar('coach', 'otra', motor=self.motor))
+        self.assertEqual(autenticar('coach', 'secreto', motor=self.motor), 'coach')
+        self.assertIsNone(autenticar('coach', 'mal', motor=self.motor))
+        self.assertIsNone(autenticar('nadie', 'secreto', motor=self.motor))
+
+    def test_rehash_al_cambiar_el_coste(self):
+
+        """Prueba que la contraseña se vuelve a cifrar con el nuevo coste al iniciar sesión"""
+        self.assertEqual(self.usuario().coste_password(), 4)
+        with mock.patch.object(models, 'COSTE_BCRYPT', 5):
+            self.assertEqual(autenticar('coach', 'secreto', motor=self.motor), 'coach')
+        self.assertEqual(self.usuario().coste_password(), 5)
+        self.assertEqual(autenticar('coach', 'secreto', motor=self.motor), 'coach')
+
+    def test_sesion_recordada(self):
+
+        """Prueba que la sesión recordada se recupera sin contraseña hasta que caduca o se cierra"""
+        self.assertIsNone(recuperar_sesion(self.ruta_token, motor=self.motor))
+        recordar_sesion('coach', self.ruta_token, motor=self.motor)
+        self.assertEqual(recuperar_sesion(self.ruta_token, motor=self.motor), 'coach')
+        cerrar_sesion(self.ruta_token, motor=self.motor)
+        self.assertIsNone(recuperar_sesion(self.ruta_token, motor=self.motor))
+
+        recordar_sesion('coach', self.ruta_token, duracion=timedelta(seconds=-1), motor=self.motor)
+        self.assertIsNone(recuperar_sesion(self.ruta_token, motor=self.motor))
+
+    def test_coste_de_la_variable_de_entorno(self):
+
+        """Prueba que un coste no válido no impide importar models y que se limita al intervalo de bcrypt"""
+        with mock.patch('builtins.print'):
+            for valor, esperado in ((None, 12), ('', 12), ('10', 10), ('doce', 12), ('12.5', 12), ('2', 4),
+                                    ('40', 31)):
+                with self.subTest(valor=valor):
+                    self.assertEqual(models.leer_coste_bcrypt(valor), esperado)
+        with mock.patch.dict(os.environ, COACHBODYMETRICS_COSTE_BCRYPT='doce'):
+            _, salida = ejecutar_en_directorio_vacio(self, "import models; print(models.COSTE_BCRYPT)")
+        self.assertEqual(salida.splitlines()[-1], '12')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import unittest
+from sqlalchemy import func, select
+from sqlalchemy.pool import QueuePool
+from base_datos import nueva_sesion, sesion_bd
+from calculadora import guardar_datos, recuperar_historial_cliente
+from models import Cliente, Usuario
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal, ejecutar_en_directorio_vacio
+
+
+class TestBaseDatos(unittest.TestCase):
+
+    """Pruebas del motor compartido y de las sesiones por operación."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+
+    def contar(self, modelo):
+        with nueva_sesion(self.motor) as sesion:
+            return sesion.scalar(select(func.count()).select_from(modelo))
+
+    def test_sesion_bd_confirma_o_deshace(self):
+
+        """Prueba que sesion_bd confirma al terminar bien y deshace los cambios si hay una excepción"""
+        with sesion_bd(self.motor) as sesion:
+            sesion.add(Usuario(username='coach', password='x'))
+        with self.assertRaises(RuntimeError):
+            with sesion_bd(self.motor) as sesion:
+                sesion.add(Usuario(username='otro', password='x'))
+                sesion.flush()
+                raise RuntimeError("fallo a mitad de la operación")
+        self.assertEqual(self.contar(Usuario), 1)
+
+    def test_varios_hilos_comparten_el_motor(self):
+
+        """Prueba que varios hilos guardan y leen a la vez con el grupo de conexiones del motor"""
+        self.assertIsInstance(self.motor.pool, QueuePool)
+        analisis = analisis_de_prueba(80)
+        errores = []
+
+        def trabajar(inicio):
+            try:
+                for resultado in analisis[inicio::8]:
+                    if not guardar_datos(resultado, motor=self.motor):
+                        errores.append(resultado.nombre)
+                    recuperar_historial_cliente(resultado.nombre, motor=self.motor)
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        self.assertEqual(self.contar(Cliente), 80)
+        self.assertLessEqual(self.motor.pool.checkedout(), 0)
+
+    def test_cerrar_motor(self):
+
+        """Prueba que cerrar_motor libera el motor compartido y que se vuelve a crear al pedirlo"""
+        _, salida = ejecutar_en_directorio_vacio(self, (
+            "import base_datos\n"
+            "motor = base_datos.obtener_motor()\n"
+            "with motor.connect() as conexion:\n"
+            "    print(conexion.exec_driver_sql('PRAGMA journal_mode').scalar())\n"
+            "base_datos.cerrar_motor()\n"
+            "print(base_datos._motor is None, base_datos.obtener_motor() is not motor)\n"))
+        self.assertEqual(salida.splitlines(), ['wal', 'True True'])
+
+
+if __name__ == '__main__':
+    unittest.main()
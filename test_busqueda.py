@@ -0,0 +1,90 @@
+import unittest
+import busqueda
+from calculadora import clave_pagina, guardar_lote, recuperar_historial_pagina
+from models import Base
+from tendencias import recuperar_historial_pagina_tendencias
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal
+
+NOMBRES = ("María García", "Mario López", "José Martín", "Ana Gómez")
+
+
+class TestBusqueda(unittest.TestCase):
+
+    """Pruebas de la búsqueda por nombre y del orden del historial en la base de datos."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+        self.filas = [dict(r.datos_cliente(), nombre=NOMBRES[i % len(NOMBRES)])
+                      for i, r in enumerate(analisis_de_prueba(40))]
+        guardar_lote(self.filas, motor=self.motor)
+
+    def nombres(self, texto):
+        return sorted({f.nombre for f in recuperar_historial_pagina(limite=100, motor=self.motor, busqueda=texto)})
+
+    def test_expresion_fts(self):
+
+        """Prueba que cada palabra se busca como prefijo y que las comillas no rompen la consulta"""
+        self.assertEqual(busqueda.expresion_fts('gar "ma'), '"gar"* "ma"*')
+        self.assertEqual(busqueda.expresion_fts('OR'), '"OR"*')
+        self.assertIsNone(busqueda.expresion_fts('  ,. '))
+
+    def test_busqueda_por_prefijo_sin_tildes(self):
+
+        """Prueba la búsqueda por prefijo de cualquier palabra, sin mayúsculas ni tildes"""
+        self.assertEqual(self.nombres('mar'), sorted(["José Martín", "María García", "Mario López"]))
+        self.assertEqual(self.nombres('garcia'), ["María García"])
+        self.assertEqual(self.nombres('ma ga'), ["María García"])
+        self.assertEqual(self.nombres('zz'), [])
+        self.assertEqual(len(self.nombres('')), len(NOMBRES))
+
+    def test_busqueda_sin_fts(self):
+
+        """Prueba que sin el índice FTS5 la búsqueda recurre a LIKE sobre los nombres"""
+        busqueda._con_fts[self.motor] = False
+        self.assertEqual(self.nombres('mar'), sorted(["José Martín", "María García", "Mario López"]))
+        # Como con FTS5: prefijos de palabra, no subcadenas, y sin comodines de LIKE
+        self.assertEqual(self.nombres('rio'), [])
+        otros = [dict(self.filas[0], nombre=nombre) for nombre in ("Luis a_b", "Luis axb")]
+        guardar_lote(otros, motor=self.motor)
+        self.assertEqual(self.nombres('a_b'), ["Luis a_b"])
+        self.assertEqual(busqueda.escapar_like('50%_\\'), '50\\%\\_\\\\')
+
+    def test_rellena_nombres_de_una_base_existente(self):
+
+        """Prueba que create_all rellena la tabla de nombres de una base de datos anterior a la búsqueda"""
+        with self.motor.begin() as conexion:
+            conexion.exec_driver_sql("DELETE FROM nombres_clientes")
+            conexion.exec_driver_sql("INSERT INTO busqueda_nombres(busqueda_nombres) VALUES ('delete-all')")
+        self.assertEqual(self.nombres('mar'), [])
+        Base.metadata.create_all(self.motor)
+        self.assertEqual(self.nombres('mar'), sorted(["José Martín", "María García", "Mario López"]))
+
+    def test_paginas_ordenadas_por_nombre(self):
+
+        """Prueba que las páginas ordenadas por nombre, en los dos sentidos, recorren todas las filas una vez"""
+        for descendente in (False, True):
+            with self.subTest(descendente=descendente):
+                vistas, cursor = [], None
+                while True:
+                    pagina = recuperar_historial_pagina(cursor, 7, self.motor, orden='nombre', descendente=descendente)
+                    vistas += pagina
+                    if len(pagina) < 7:
+                        break
+                    cursor = clave_pagina(pagina[-1], 'nombre')
+                claves = [(f.nombre, f.fecha, f.id) for f in vistas]
+                self.assertEqual(claves, sorted(claves, reverse=descendente))
+                self.assertEqual(len(claves), len(self.filas))
+
+    def test_tendencias_con_busqueda_y_orden(self):
+
+        """Prueba que la página con tendencias respeta la búsqueda y el orden pedidos"""
+        pagina = recuperar_historial_pagina(limite=5, motor=self.motor, orden='fecha', descendente=True,
+                                            busqueda='gomez')
+        tendencias = recuperar_historial_pagina_tendencias(limite=5, motor=self.motor, orden='fecha',
+                                                           descendente=True, busqueda='gomez')
+        self.assertEqual([f.id for f in tendencias], [f.id for f in pagina])
+        self.assertEqual({f.nombre for f in tendencias}, {"Ana Gómez"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,8 @@ from calculadora import (
     calcular_sobrepeso, calcular_rcc, calcular_masa_muscular, calcular_ffmi,
     interpretar_ffmi, calcular_relacion_cintura_cadera, interpretar_rcc,
     calcular_ratio_cintura_altura, interpretar_ratio_cintura_altura,
-    calcular_calorias_diarias, calcular_macronutrientes, interpretar_porcentaje_grasa
+    calcular_calorias_diarias, calcular_macronutrientes, interpretar_porcentaje_grasa,
+    interpretar_salud, analizar, ResultadoAnalisis
 )
 
 class TestCalculadora(unittest.TestCase):
@@ -67,6 +68,26 @@ class TestCalculadora(unittest.TestCase):
                          "El IMC es alto, pero puede estar influenciado "
                          "por una alta masa muscular.")
 
+    def test_interpretar_imc_sin_masa_muscular(self):
+
+        """Prueba que un FFMI alto solo cambia la interpretación cuando el IMC también es alto"""
+        self.assertEqual(interpretar_imc(22, 21, 'h'), "El IMC está dentro del rango normal.")
+        self.assertEqual(interpretar_imc(17, 18, 'm'),
+                         "El IMC es bajo, se recomienda consultar con un profesional de salud.")
+        self.assertEqual(interpretar_imc(27, 18, 'h'), "El IMC está dentro del rango normal.")
+
+    def test_interpretar_en_los_umbrales(self):
+
+        """Prueba a qué categoría pertenece cada valor justo en un umbral"""
+        self.assertEqual(interpretar_ffmi(18, 'h'), "Cercano a la normalidad")
+        self.assertEqual(interpretar_ffmi(23, 'm'), "Imposible sin fármacos")
+        self.assertEqual(interpretar_rcc(0.95, 'h'), "Moderado riesgo")
+        self.assertEqual(interpretar_rcc(0.80, 'm'), "Bajo riesgo")
+        self.assertEqual(interpretar_ratio_cintura_altura(0.5), "Moderado riesgo")
+        self.assertEqual(interpretar_porcentaje_grasa(25, 'h'), "Normal")
+        self.assertEqual(interpretar_porcentaje_grasa(16, 'm'), "Normal")
+        self.assertEqual(interpretar_salud(20, 'm'), "Porcentaje de grasa corporal dentro del rango normal.")
+
     def test_calcular_peso_saludable(self):
 
         """Prueba la función calcular_peso_saludable"""
@@ -190,5 +211,42 @@ class TestCalculadora(unittest.TestCase):
         genero = 'h'
         self.assertEqual(interpretar_porcentaje_grasa(porcentaje_grasa, genero), "Alto")
 
+    def test_analizar(self):
+
+        """Prueba que analizar reúne en un único registro las métricas redondeadas e interpretaciones"""
+        analisis = analizar('Ana', 60.0, 165.0, 25, 'm', 70.0, 95.0, 32.0, 'perder')
+        tmb = round(calcular_tmb(60.0, 165.0, 25, 'm'), 2)
+        calorias = round(calcular_calorias_diarias(tmb, 'perder'), 2)
+        self.assertIsInstance(analisis, ResultadoAnalisis)
+        self.assertEqual(analisis.tmb, tmb)
+        self.assertEqual(analisis.calorias_diarias, calorias)
+        self.assertEqual(analisis.rcc, round(70.0 / 95.0, 2))
+        self.assertEqual(analisis.interpretacion_rcc, interpretar_rcc(analisis.rcc, 'm'))
+        self.assertEqual(analisis.datos_cliente()['nombre'], 'Ana')
+        self.assertNotIn('imc', analisis.datos_cliente())
+
+    def test_analizar_es_inmutable(self):
+
+        """Prueba que el resultado del análisis no se puede modificar y que ignora la cadera en hombres"""
+        analisis = analizar('Luis', 80.0, 180.0, 30, 'h', 85.0, 100.0, 40.0, 'mantener')
+        self.assertEqual(analisis.cadera, 0.0)
+        self.assertEqual(analisis.interpretacion_rcc, "N/A")
+        with self.assertRaises(AttributeError):
+            analisis.peso = 90.0
+        with self.assertRaises(ValueError):
+            analizar('Luis', 80.0, 180.0, 30, 'h', 85.0, 0.0, 40.0, 'volar')
+
+    def test_con_fecha(self):
+
+        """Prueba que con_fecha devuelve una copia con otra fecha sin tocar el original"""
+        from datetime import datetime
+        analisis = analizar('Luis', 80.0, 180.0, 30, 'h', 85.0, 100.0, 40.0, 'mantener', fecha=datetime(2024, 1, 1))
+        copia = analisis.con_fecha(datetime(2024, 5, 1, 10, 30))
+        self.assertEqual(copia.fecha, datetime(2024, 5, 1, 10, 30))
+        self.assertEqual(analisis.fecha, datetime(2024, 1, 1))
+        self.assertEqual(copia.entradas(), analisis.entradas())
+        with self.assertRaises(ValueError):
+            analizar('Luis', 80.0, 180.0, 30, 'h', 85.0, 100.0, 90.0, 'mantener')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import numpy as np
+from calculadora import (
+    calcular_tmb, calcular_imc, calcular_porcentaje_grasa, calcular_agua_total,
+    calcular_peso_min, calcular_peso_max, calcular_sobrepeso, calcular_masa_muscular,
+    calcular_ffmi, calcular_rcc, calcular_ratio_cintura_altura,
+    calcular_calorias_diarias, calcular_macronutrientes
+)
+from calculadora_lote import (
+    calcular_lote, calcular_calorias_diarias_lote, calcular_macronutrientes_lote, codigos_imc_lote, codigos_lote,
+    etiquetas_lote
+)
+from interpretacion import ESCALA_FFMI, ESCALA_RCC, ESCALA_SALUD, codigo_imc
+
+
+class TestCalculadoraLote(unittest.TestCase):
+
+    """Comprueba que el motor vectorizado devuelve los mismos valores que las funciones escalares."""
+
+    def setUp(self):
+        rng = np.random.default_rng(80)
+        n = 500
+        genero = rng.choice(['h', 'm'], size=n)
+        self.columnas = {
+            'peso': rng.uniform(45, 130, n),
+            'altura': rng.uniform(150, 200, n),
+            'edad': rng.integers(18, 80, n),
+            'genero': genero,
+            'cintura': rng.uniform(70, 120, n),
+            'cadera': np.where(genero == 'm', rng.uniform(85, 130, n), 0.0),
+            'cuello': rng.uniform(30, 45, n),
+            'objetivo': rng.choice(['mantener', 'perder', 'ganar'], size=n),
+        }
+
+    def test_coincide_con_funciones_escalares(self):
+
+        """Cada métrica del lote coincide fila a fila con su función escalar."""
+        resultado = calcular_lote(self.columnas)
+        c = self.columnas
+        for i in range(len(c['peso'])):
+            peso, altura, edad = c['peso'][i], c['altura'][i], int(c['edad'][i])
+            genero, objetivo = str(c['genero'][i]), str(c['objetivo'][i])
+            cintura, cadera, cuello = c['cintura'][i], c['cadera'][i], c['cuello'][i]
+
+            tmb = calcular_tmb(peso, altura, edad, genero)
+            porcentaje_grasa = calcular_porcentaje_grasa(cintura, cadera, cuello, altura, genero)
+            masa_muscular = calcular_masa_muscular(peso, porcentaje_grasa)
+            calorias = calcular_calorias_diarias(tmb, objetivo)
+            proteinas, carbohidratos, grasas = calcular_macronutrientes(calorias, objetivo)
+            esperado = {
+                'tmb': tmb,
+                'imc': calcular_imc(peso, altura),
+                'porcentaje_grasa': porcentaje_grasa,
+                'peso_grasa': (porcentaje_grasa / 100) * peso,
+                'masa_muscular': masa_muscular,
+                'agua_total': calcular_agua_total(peso, altura, edad, genero),
+                'ffmi': calcular_ffmi(masa_muscular, altura),
+                'peso_min': calcular_peso_min(altura),
+                'peso_max': calcular_peso_max(altura),
+                'sobrepeso': calcular_sobrepeso(peso, altura),
+                'rcc': calcular_rcc(cintura, cadera),
+                'ratio_cintura_altura': calcular_ratio_cintura_altura(cintura, altura),
+                'calorias_diarias': calorias,
+                'proteinas': proteinas,
+                'carbohidratos': carbohidratos,
+                'grasas': grasas,
+            }
+            for metrica, valor in esperado.items():
+                self.assertAlmostEqual(resultado[metrica][i], valor, places=9, msg=f"{metrica} fila {i}")
+
+    def test_objetivo_no_valido_devuelve_nan(self):
+
+        """Un objetivo desconocido produce NaN en calorías y macronutrientes en lugar de un error."""
+        calorias = calcular_calorias_diarias_lote([2000.0, 2000.0], ['mantener', 'otro'])
+        self.assertAlmostEqual(calorias[0], 2400.0, places=6)
+        self.assertTrue(np.isnan(calorias[1]))
+        proteinas, _, _ = calcular_macronutrientes_lote([2000.0, 2000.0], ['perder', 'otro'])
+        self.assertAlmostEqual(proteinas[0], (2000.0 * 0.40) / 4, places=6)
+        self.assertTrue(np.isnan(proteinas[1]))
+
+    def test_codigos_igual_que_busqueda_escalar(self):
+
+        """Los códigos vectorizados coinciden con los escalares, también en los propios umbrales."""
+        for escala in (ESCALA_FFMI, ESCALA_RCC, ESCALA_SALUD):
+            umbrales = np.concatenate([escala.limites['h'], escala.limites['m']])
+            valores = np.concatenate([umbrales, np.nextafter(umbrales, -np.inf), np.linspace(0, 40, 200)])
+            genero = np.resize(['h', 'm'], len(valores))
+            codigos = codigos_lote(escala, valores, genero)
+            self.assertEqual(codigos.tolist(), [escala.codigo(v, g) for v, g in zip(valores, genero)])
+            self.assertEqual(etiquetas_lote(escala, codigos).tolist(),
+                             [escala.interpretar(v, g) for v, g in zip(valores, genero)])
+
+        imc, ffmi, genero = np.array([17.0, 25.0, 26.0, 26.0, 26.0]), np.array([22, 22, 22, 17, 17]), 'hhhhm'
+        self.assertEqual(codigos_imc_lote(imc, ffmi, list(genero)).tolist(),
+                         [codigo_imc(*fila) for fila in zip(imc, ffmi, genero)])
+
+    def test_faltan_columnas(self):
+
+        """Se informa de las columnas de entrada que faltan."""
+        columnas = dict(self.columnas)
+        del columnas['cuello']
+        with self.assertRaises(KeyError):
+            calcular_lote(columnas)
+
+
+if __name__ == '__main__':
+    unittest.main()
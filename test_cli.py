@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+from sqlalchemy import func, select
+from models import Cliente
+from calculadora import analizar
+from cli import COLUMNAS_SALIDA, analizar_registros
+from importador import convertir_registro
+from pruebas_utiles import crear_motor_temporal, registro_valido
+
+
+class TestCli(unittest.TestCase):
+
+    """Pruebas del modo por lotes sin interfaz gráfica."""
+
+    def registros(self, n):
+        return [(i + 1, {k: str(v) for k, v in registro_valido(i).items()}) for i in range(n)]
+
+    def test_salida_csv_igual_que_analizar(self):
+
+        """Prueba que cada fila de salida contiene el mismo análisis que el botón Calcular"""
+        destino = io.StringIO(newline='')
+        registros = self.registros(25)
+        registros[4][1]['objetivo'] = 'adelgazar'
+        rechazos = []
+        totales = analizar_registros(registros, destino, 'csv', tamano_bloque=10, rechazos=rechazos.extend)
+        self.assertEqual((totales['analizados'], totales['rechazados'], totales['guardados']), (24, 1, 0))
+        self.assertEqual(rechazos[0][0], 5)
+
+        filas = list(csv.DictReader(io.StringIO(destino.getvalue(), newline='')))
+        self.assertEqual(len(filas), 24)
+        self.assertEqual(tuple(filas[0]), COLUMNAS_SALIDA)
+        esperado = analizar(**convertir_registro(registro_valido(0)))
+        self.assertEqual(float(filas[0]['ffmi']), esperado.ffmi)
+        self.assertEqual(filas[0]['interpretacion_imc'], esperado.interpretacion_imc)
+
+    def test_jsonl_y_guardar(self):
+
+        """Prueba la salida JSON Lines y el guardado opcional en la base de datos"""
+        motor = crear_motor_temporal(self)
+        destino = io.StringIO()
+        totales = analizar_registros(self.registros(12), destino, 'jsonl', guardar=True, tamano_bloque=5,
+                                     motor=motor)
+        self.assertEqual(totales['guardados'], 12)
+        lineas = [json.loads(linea) for linea in destino.getvalue().splitlines()]
+        self.assertEqual([l['nombre'] for l in lineas], [registro_valido(i)['nombre'] for i in range(12)])
+        with motor.connect() as conexion:
+            self.assertEqual(conexion.execute(select(func.count()).select_from(Cliente.__table__)).scalar(), 12)
+
+    def test_entrada_estandar_sin_tkinter(self):
+
+        """Prueba la lectura de la entrada estándar y que el proceso no llega a importar tkinter"""
+        entrada = ''.join(json.dumps(registro_valido(i)) + '\n' for i in range(3))
+        codigo = "import runpy, sys; runpy.run_module('cli', run_name='__main__')"
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codigo, '--formato-entrada', 'jsonl'], input=entrada,
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(proceso.returncode, 0, proceso.stderr)
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(proceso.stdout)))), 3)
+        self.assertNotIn('tkinter', proceso.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
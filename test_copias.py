@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+import copias
+from calculadora import guardar_datos
+from pruebas_utiles import analisis_de_prueba, motor_con_analisis
+
+
+def contar_clientes(ruta):
+    conexion = sqlite3.connect(ruta)
+    try:
+        return conexion.execute("SELECT count(*) FROM clientes").fetchone()[0]
+    finally:
+        conexion.close()
+
+
+class TestCopias(unittest.TestCase):
+
+    """Pruebas de las copias de seguridad en línea."""
+
+    def setUp(self):
+        self.motor, _ = motor_con_analisis(self, 300)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def test_copia_comprimida_y_verificada(self):
+
+        """Prueba que la instantánea comprimida se verifica y contiene todos los registros"""
+        avances = []
+        ruta = copias.crear_copia(self.directorio, progreso=avances.append, motor=self.motor)
+        self.assertTrue(ruta.endswith('.db.gz'))
+        self.assertEqual(os.listdir(self.directorio), [os.path.basename(ruta)])
+        self.assertEqual(avances[-1][0], avances[-1][1])
+        copias.verificar_copia(ruta)
+
+        sin_comprimir = copias.crear_copia(self.directorio, comprimir_copia=False, motor=self.motor)
+        self.assertEqual(contar_clientes(sin_comprimir), 300)
+        self.assertFalse(os.path.exists(sin_comprimir + '-wal'))
+
+    def test_escrituras_durante_la_copia(self):
+
+        """Prueba que se puede guardar durante una copia por pasos y que esta no se reinicia"""
+        origen = copias.ruta_base_datos(self.motor)
+        destino = os.path.join(self.directorio, 'copia.db')
+        nuevos = analisis_de_prueba(20)
+        guardados = []
+
+        def al_avanzar(avance):
+            # Un guardado entre dos pasos, desde otra conexión, como haría la interfaz
+            if len(guardados) < len(nuevos):
+                guardados.append(guardar_datos(nuevos[len(guardados)].datos_cliente(), motor=self.motor))
+
+        reinicios = copias.copiar_base_datos(origen, destino, paginas=1, pausa=0, progreso=al_avanzar)
+        self.assertEqual(reinicios, 0)
+        self.assertTrue(guardados and all(guardados))
+        copias.comprobar_integridad(destino)
+        # La copia es la instantánea del principio; los guardados posteriores no aparecen a medias
+        self.assertEqual(contar_clientes(destino), 300)
+
+    def test_cancelar(self):
+
+        """Prueba que una copia cancelada no deja archivos"""
+        cancelar = threading.Event()
+        cancelar.set()
+        self.assertIsNone(copias.crear_copia(self.directorio, cancelar=cancelar, motor=self.motor))
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_rotacion_y_espera(self):
+
+        """Prueba que solo se conservan las últimas copias y el cálculo de la próxima copia programada"""
+        self.assertEqual(copias.espera_proxima_copia(self.directorio, 24, motor=self.motor), 0)
+        rutas = []
+        for _ in range(4):
+            rutas.append(copias.crear_copia(self.directorio, verificar=False, conservar=2, motor=self.motor))
+            time.sleep(0.002)
+        self.assertEqual(sorted(os.listdir(self.directorio)), [os.path.basename(r) for r in rutas[2:]])
+        self.assertGreater(copias.espera_proxima_copia(self.directorio, 24, motor=self.motor), 23 * 3600)
+
+    def test_copia_danada(self):
+
+        """Prueba que la verificación rechaza una copia dañada"""
+        ruta = copias.crear_copia(self.directorio, comprimir_copia=False, motor=self.motor)
+        with open(ruta, 'r+b') as archivo:
+            archivo.seek(4096)
+            archivo.write(b'\xff' * 4096)
+        with self.assertRaises(ValueError):
+            copias.verificar_copia(ruta)
+        with open(ruta + '.gz', 'wb') as archivo:
+            archivo.write(b'no es gzip')
+        with self.assertRaises(ValueError):
+            copias.verificar_copia(ruta + '.gz')
+
+
+if __name__ == '__main__':
+    unittest.main()
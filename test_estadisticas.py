@@ -0,0 +1,112 @@
+import statistics
+import unittest
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import mysql, postgresql
+from models import Distribucion, Estadistica
+from calculadora import guardar_datos, guardar_lote
+from estadisticas import (
+    _filas_estadisticas, _sumar_estadistica, _sumar_fila_a_fila, acumular, completar_agregados,
+    consultar_estadisticas, reconstruir_estadisticas, sentencia_suma, tramo_edad
+)
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal
+
+
+class TestEstadisticas(unittest.TestCase):
+
+    """Pruebas de las estadísticas agregadas por género, tramo de edad y mes."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+        self.analisis = analisis_de_prueba(120)
+
+    def tabla(self):
+        with self.motor.connect() as conexion:
+            return {tuple(fila[:4]): fila[4:] for fila in conexion.execute(select(Estadistica.__table__))}
+
+    def test_tramo_edad(self):
+
+        """Prueba los límites de los tramos de edad"""
+        self.assertEqual([tramo_edad(e) for e in (15, 18, 29, 30, 59, 60, 85)],
+                         ['<18', '18-29', '18-29', '30-39', '50-59', '60+', '60+'])
+
+    def test_incremental_igual_que_reconstruir(self):
+
+        """Prueba que guardar de uno en uno y en lote deja la misma tabla que recalcularla desde clientes"""
+        for resultado in self.analisis[:10]:
+            with self.subTest(nombre=resultado.nombre):
+                self.assertTrue(guardar_datos(resultado, motor=self.motor))
+        guardar_lote(self.analisis[10:], tamano_lote=32, motor=self.motor)
+        incremental = self.tabla()
+
+        reconstruir_estadisticas(self.motor, tamano_bloque=25)
+        reconstruida = self.tabla()
+        self.assertEqual(incremental.keys(), reconstruida.keys())
+        for clave, valores in incremental.items():
+            n, suma, suma_cuadrados, minimo, maximo = valores
+            self.assertEqual((n, minimo, maximo), (reconstruida[clave][0],) + tuple(reconstruida[clave][3:]))
+            self.assertAlmostEqual(suma, reconstruida[clave][1], places=6)
+            self.assertAlmostEqual(suma_cuadrados, reconstruida[clave][2], places=4)
+
+    def test_consulta_agregada(self):
+
+        """Prueba la media, la desviación y el rango por género frente al cálculo directo"""
+        guardar_lote(self.analisis, motor=self.motor)
+        grupos = consultar_estadisticas('imc', por=('genero',), motor=self.motor)
+        self.assertEqual([g['genero'] for g in grupos], ['h', 'm'])
+        for grupo in grupos:
+            valores = [r.imc for r in self.analisis if r.genero == grupo['genero']]
+            self.assertEqual(grupo['n'], len(valores))
+            self.assertAlmostEqual(grupo['media'], statistics.mean(valores))
+            self.assertAlmostEqual(grupo['desviacion'], statistics.stdev(valores))
+            self.assertEqual((grupo['minimo'], grupo['maximo']), (min(valores), max(valores)))
+
+        enero = consultar_estadisticas('ffmi', por=(), desde_mes='2024-01', hasta_mes='2024-01', motor=self.motor)
+        self.assertEqual(enero[0]['n'], 31)
+        with self.assertRaises(ValueError):
+            consultar_estadisticas('peso', motor=self.motor)
+
+    def test_sentencias_de_otros_motores(self):
+
+        """Prueba que la suma se compila para PostgreSQL y MySQL sin min() ni max() de dos argumentos"""
+        for nombre, dialecto in (('postgresql', postgresql.dialect()), ('mysql', mysql.dialect())):
+            with self.subTest(dialecto=nombre):
+                sql = str(sentencia_suma(nombre, Estadistica.__table__, _sumar_estadistica).compile(dialect=dialecto))
+                self.assertIn('CASE WHEN', sql)
+                self.assertNotIn('min(', sql.lower())
+        self.assertIsNone(sentencia_suma('mssql', Estadistica.__table__, _sumar_estadistica))
+
+    def test_suma_fila_a_fila(self):
+
+        """Prueba que UPDATE seguido de INSERT deja la misma tabla que el INSERT con conflicto"""
+        guardar_lote(self.analisis, motor=self.motor)
+        esperada = self.tabla()
+        with self.motor.begin() as conexion:
+            conexion.execute(delete(Estadistica.__table__))
+            for resultado in self.analisis:
+                filas = _filas_estadisticas(acumular([resultado.datos_cliente()]))
+                _sumar_fila_a_fila(conexion, Estadistica.__table__, filas, _sumar_estadistica)
+        obtenida = self.tabla()
+        self.assertEqual(esperada.keys(), obtenida.keys())
+        for clave, valores in esperada.items():
+            self.assertEqual(valores[0], obtenida[clave][0])
+            self.assertEqual(tuple(valores[3:]), tuple(obtenida[clave][3:]))
+            self.assertAlmostEqual(valores[1], obtenida[clave][1], places=6)
+
+    def test_completa_bases_de_datos_anteriores(self):
+
+        """Prueba que una base de datos con mediciones y sin agregados se reconstruye una sola vez"""
+        self.assertFalse(completar_agregados(self.motor))
+        guardar_lote(self.analisis, motor=self.motor)
+        esperada = self.tabla()
+        self.assertFalse(completar_agregados(self.motor))
+        with self.motor.begin() as conexion:
+            conexion.execute(delete(Estadistica.__table__))
+            conexion.execute(delete(Distribucion.__table__))
+        self.assertTrue(completar_agregados(self.motor))
+        self.assertEqual(self.tabla().keys(), esperada.keys())
+        with self.motor.connect() as conexion:
+            self.assertIsNotNone(conexion.execute(select(Distribucion.__table__).limit(1)).first())
+
+
+if __name__ == '__main__':
+    unittest.main()
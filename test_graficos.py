@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from almacenamiento import MODO_COMPACTO, migrar
+from calculadora import guardar_lote
+from graficos import lttb, marcas_eje, recuperar_series, reducir_serie, tramo_visible
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal
+
+
+class TestLttb(unittest.TestCase):
+
+    """Pruebas de la reducción de series con largest-triangle-three-buckets."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(1000, dtype=np.float64) * 3600
+        self.y = np.cumsum(rng.normal(size=1000))
+
+    def test_conserva_extremos(self):
+
+        """Prueba que se conservan el primer y el último punto y los picos aislados"""
+        self.y[500] = 100.0
+        self.y[700] = -100.0
+        indices = lttb(self.x, self.y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(500, indices)
+        self.assertIn(700, indices)
+
+    def test_series_cortas(self):
+
+        """Prueba que una serie con menos puntos que el umbral se devuelve entera"""
+        np.testing.assert_array_equal(lttb(self.x[:10], self.y[:10], 50), np.arange(10))
+        self.assertEqual(len(lttb(self.x[:0], self.y[:0], 50)), 0)
+
+    def test_tramo_visible(self):
+
+        """Prueba que se toma el tramo visible más un punto a cada lado"""
+        self.assertEqual(tramo_visible(self.x, 3600 * 10.5, 3600 * 20.5), (10, 22))
+        self.assertEqual(tramo_visible(self.x, -1e9, 1e12), (0, 1000))
+        x, _ = reducir_serie(self.x, self.y, 3600 * 100, 3600 * 900, 100)
+        self.assertEqual(len(x), 100)
+        self.assertEqual((x[0], x[-1]), (3600 * 99, 3600 * 901))
+
+    def test_marcas_eje(self):
+
+        """Prueba que las marcas son valores redondos dentro del intervalo"""
+        self.assertEqual(marcas_eje(61.3, 78.9), [65, 70, 75])
+        self.assertEqual(marcas_eje(10.02, 10.08, 3), [10.02, 10.04, 10.06, 10.08])
+        self.assertEqual(marcas_eje(5.0, 5.0), [5.0])
+
+
+class TestRecuperarSeries(unittest.TestCase):
+
+    """Pruebas de la lectura de las series de un cliente."""
+
+    def test_series_en_los_dos_modos(self):
+
+        """Prueba que las series salen en orden de fecha y son iguales en almacenamiento compacto"""
+        motor = crear_motor_temporal(self)
+        analisis = analisis_de_prueba(40)
+        guardar_lote(analisis, motor=motor)
+        del_cliente = [r for r in analisis if r.nombre == "Cliente 3"]
+        series = recuperar_series("Cliente 3", motor=motor)
+        self.assertEqual(list(series['fecha']), [r.fecha.timestamp() for r in del_cliente])
+        np.testing.assert_allclose(series['masa_muscular'], [r.masa_muscular for r in del_cliente])
+
+        migrar(MODO_COMPACTO, motor, vacuum=False)
+        compacto = recuperar_series("Cliente 3", motor=motor)
+        for campo, valores in series.items():
+            np.testing.assert_allclose(compacto[campo], valores)
+        self.assertEqual(len(recuperar_series("Nadie", motor=motor)['peso']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from datetime import datetime
+from calculadora import analizar
+from grafo_analisis import ENTRADAS, ORDEN, GrafoAnalisis, afectados
+from pruebas_utiles import analisis_de_prueba
+
+
+class TestGrafoAnalisis(unittest.TestCase):
+
+    """Pruebas del análisis incremental por grafo de dependencias."""
+
+    def test_igual_que_analizar(self):
+
+        """Prueba que el grafo, actualizado entrada a entrada, da el mismo resultado que analizar"""
+        grafo = GrafoAnalisis()
+        for esperado in analisis_de_prueba(60):
+            entradas = {campo: getattr(esperado, campo) for campo in ENTRADAS}
+            grafo.asignar(**entradas)
+            self.assertEqual(grafo.resultado(esperado.nombre, esperado.fecha), esperado)
+
+    def test_solo_recalcula_lo_afectado(self):
+
+        """Prueba que cambiar el objetivo solo recalcula las calorías y los macronutrientes"""
+        self.assertEqual(afectados(['objetivo']),
+                         {'calorias_diarias', 'macronutrientes', 'proteinas', 'carbohidratos', 'grasas'})
+        self.assertNotIn('porcentaje_grasa', afectados(['peso']))
+
+        grafo = GrafoAnalisis()
+        grafo.asignar(peso=80.0, altura=180.0, edad=30, genero='h', cintura=85.0, cadera=0.0, cuello=38.0,
+                      objetivo='mantener')
+        self.assertEqual(grafo.calculos, len(ORDEN))
+        cambiados = grafo.asignar(objetivo='ganar')
+        self.assertEqual(grafo.calculos, len(ORDEN) + 5)
+        self.assertIn('proteinas', cambiados)
+        self.assertNotIn('tmb', cambiados)
+
+        # Sin cambios no se recalcula nada
+        self.assertEqual(grafo.asignar(objetivo='ganar'), set())
+        self.assertEqual(grafo.calculos, len(ORDEN) + 5)
+
+    def test_entradas_incompletas_o_imposibles(self):
+
+        """Prueba que los nodos sin datos suficientes valen None sin afectar a los demás"""
+        grafo = GrafoAnalisis()
+        grafo.asignar(peso=80.0, altura=180.0, edad=None, genero='h', cintura=85.0, cadera=0.0, cuello=38.0,
+                      objetivo='mantener')
+        self.assertIsNone(grafo.valores['tmb'])
+        self.assertIsNone(grafo.valores['proteinas'])
+        self.assertIsNotNone(grafo.valores['porcentaje_grasa'])
+        self.assertIsNone(grafo.resultado("Cliente"))
+
+        grafo.asignar(edad=30, cuello=90.0)
+        self.assertIsNone(grafo.valores['porcentaje_grasa'])
+        self.assertIsNotNone(grafo.valores['tmb'])
+
+        grafo.asignar(cuello=38.0)
+        fecha = datetime(2024, 5, 1)
+        self.assertEqual(grafo.resultado("Cliente", fecha),
+                         analizar("Cliente", 80.0, 180.0, 30, 'h', 85.0, 0.0, 38.0, 'mantener', fecha=fecha))
+
+
+if __name__ == '__main__':
+    unittest.main()
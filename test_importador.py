@@ -0,0 +1,123 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from sqlalchemy import func, select
+from models import Cliente
+from calculadora import analizar
+from importador import importar_archivo, convertir_registro
+from pruebas_utiles import crear_motor_temporal, registro_valido
+
+
+CABECERA = ['Nombre', 'Fecha', 'Peso', 'Altura', 'Edad', 'Género', 'Cintura', 'Cadera', 'Cuello', 'Objetivo']
+
+
+class TestImportador(unittest.TestCase):
+
+    """Pruebas de la importación masiva de archivos de mediciones."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def contar(self):
+        with self.motor.connect() as conexion:
+            return conexion.execute(select(func.count()).select_from(Cliente.__table__)).scalar()
+
+    def escribir_csv(self, nombre, filas):
+        with open(self.ruta(nombre), 'w', encoding='utf-8', newline='') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(CABECERA)
+            escritor.writerows(filas)
+        return self.ruta(nombre)
+
+    def test_convertir_registro(self):
+
+        """Prueba la conversión de comas decimales y fechas dd/mm/aaaa, y que la cadera se ignora en hombres"""
+        datos = convertir_registro({'nombre': ' Ana ', 'fecha': '05/03/2024', 'peso': '62,5', 'altura': '165',
+                                    'edad': '31', 'genero': 'M', 'cintura': '70', 'cadera': '96,0', 'cuello': '33',
+                                    'objetivo': 'Perder'})
+        self.assertEqual(datos['nombre'], 'Ana')
+        self.assertEqual(datos['fecha'], datetime(2024, 3, 5))
+        self.assertEqual((datos['peso'], datos['cadera'], datos['genero'], datos['objetivo']),
+                         (62.5, 96.0, 'm', 'perder'))
+        sin_cadera = dict(registro_valido(1), cadera='')
+        self.assertEqual(convertir_registro(sin_cadera)['cadera'], 0.0)
+        with self.assertRaises(ValueError):
+            convertir_registro(dict(registro_valido(0), cadera=''))
+        self.assertEqual(convertir_registro(dict(registro_valido(0), edad='30.0'))['edad'], 30)
+        with self.assertRaisesRegex(ValueError, 'entero'):
+            convertir_registro(dict(registro_valido(0), edad='30,9'))
+
+    def test_csv_con_rechazos(self):
+
+        """Prueba que los registros válidos se guardan con las métricas de analizar y los demás se rechazan"""
+        filas = [list(registro_valido(i).values()) for i in range(20)]
+        filas[3][2] = 'mucho'
+        filas[7][9] = 'adelgazar'
+        filas[12][6] = '-80'
+        ruta = self.escribir_csv('mediciones.csv', filas)
+
+        totales = importar_archivo(ruta, tamano_bloque=6, procesos=1, motor=self.motor)
+        self.assertEqual((totales['importados'], totales['rechazados'], totales['completada']), (17, 3, True))
+        self.assertEqual(self.contar(), 17)
+
+        with open(ruta + '.rechazos.csv', encoding='utf-8', newline='') as archivo:
+            rechazos = list(csv.DictReader(archivo))
+        self.assertEqual([r['linea'] for r in rechazos], ['5', '9', '14'])
+        self.assertIn('peso', rechazos[0]['motivo'])
+        self.assertEqual(rechazos[1]['objetivo'], 'adelgazar')
+
+        esperado = analizar(**convertir_registro(registro_valido(0)))
+        with self.motor.connect() as conexion:
+            guardado = conexion.execute(select(Cliente.__table__).order_by(Cliente.id)).first()
+        self.assertEqual(guardado.ffmi, esperado.ffmi)
+        self.assertEqual(guardado.calorias_diarias, esperado.calorias_diarias)
+
+    def test_reanudar_tras_cancelar(self):
+
+        """Prueba que una importación cancelada continúa sin duplicar filas y que repetirla no guarda nada"""
+        ruta = self.escribir_csv('mediciones.csv', [list(registro_valido(i).values()) for i in range(50)])
+        cancelar = threading.Event()
+
+        def progreso(procesados):
+            if procesados >= 20:
+                cancelar.set()
+
+        parcial = importar_archivo(ruta, tamano_bloque=10, procesos=1, progreso=progreso, cancelar=cancelar,
+                                   motor=self.motor)
+        self.assertFalse(parcial['completada'])
+        self.assertEqual(self.contar(), 20)
+
+        reanudada = importar_archivo(ruta, tamano_bloque=10, procesos=1, motor=self.motor)
+        self.assertEqual((reanudada['omitidos'], reanudada['importados'], reanudada['completada']), (20, 50, True))
+        self.assertEqual(self.contar(), 50)
+
+        repetida = importar_archivo(ruta, procesos=1, motor=self.motor)
+        self.assertTrue(repetida['completada'])
+        self.assertEqual(self.contar(), 50)
+
+    def test_jsonl_en_varios_procesos(self):
+
+        """Prueba la importación de JSON Lines repartida en un grupo de procesos"""
+        with open(self.ruta('mediciones.jsonl'), 'w', encoding='utf-8') as archivo:
+            for i in range(40):
+                archivo.write(json.dumps(registro_valido(i)) + '\n')
+            archivo.write('{esto no es json\n')
+        totales = importar_archivo(self.ruta('mediciones.jsonl'), tamano_bloque=7, procesos=2, motor=self.motor)
+        self.assertEqual((totales['importados'], totales['rechazados']), (40, 1))
+        with self.motor.connect() as conexion:
+            nombres = conexion.execute(select(Cliente.nombre).order_by(Cliente.id)).scalars().all()
+        self.assertEqual(nombres, [registro_valido(i)['nombre'] for i in range(40)])
+
+
+if __name__ == '__main__':
+    unittest.main()
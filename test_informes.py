@@ -0,0 +1,75 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from calculadora import guardar_lote
+from pruebas_utiles import analisis_de_prueba, motor_con_analisis
+
+if importlib.util.find_spec('jinja2'):
+    import informes
+
+
+@unittest.skipUnless(importlib.util.find_spec('jinja2'), "Jinja2 no está instalado")
+class TestInformes(unittest.TestCase):
+
+    """Pruebas de la generación de informes por cliente."""
+
+    def setUp(self):
+        self.motor, self.analisis = motor_con_analisis(self, 30)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def leer(self, archivo):
+        with open(os.path.join(self.directorio, archivo), encoding='utf-8') as f:
+            return f.read()
+
+    def test_nombre_archivo(self):
+
+        """Prueba que los nombres de archivo no tienen tildes ni espacios y no se repiten"""
+        usados = set()
+        self.assertEqual(informes.nombre_archivo("María García", usados), 'maria-garcia.html')
+        self.assertEqual(informes.nombre_archivo("Maria  Garcia", usados), 'maria-garcia-2.html')
+        self.assertEqual(informes.nombre_archivo("<>", usados), 'cliente.html')
+
+    def test_un_informe_por_cliente(self):
+
+        """Prueba que cada cliente tiene un informe con su última medición, interpretaciones e historial"""
+        escritos = informes.generar_informes(self.directorio, procesos=1, clientes_por_bloque=3, motor=self.motor)
+        self.assertEqual(escritos, 7)
+        self.assertEqual(sorted(os.listdir(self.directorio)), [f'cliente-{i}.html' for i in range(7)])
+
+        ultima = [r for r in self.analisis if r.nombre == "Cliente 3"][-1]
+        html = self.leer('cliente-3.html')
+        self.assertIn(ultima.fecha.strftime('%d/%m/%Y'), html)
+        self.assertIn(f"{ultima.ffmi:.2f}", html)
+        self.assertIn(ultima.interpretacion_ffmi, html)
+        self.assertIn("@media print", html)
+
+    def test_filtros_y_escape(self):
+
+        """Prueba los filtros por cliente y fecha y que el nombre se escapa en el HTML"""
+        nuevo = analisis_de_prueba(1, inicio=datetime(2030, 1, 1))[0].datos_cliente()
+        nuevo['nombre'] = "<b>Ana</b>"
+        guardar_lote([nuevo], motor=self.motor)
+        self.assertEqual(informes.generar_informes(self.directorio, desde=datetime(2029, 1, 1), procesos=1,
+                                                   motor=self.motor), 1)
+        self.assertIn("&lt;b&gt;Ana&lt;/b&gt;", self.leer('b-ana-b.html'))
+        self.assertEqual(informes.generar_informes(self.directorio, nombre="Cliente 1", procesos=1,
+                                                   motor=self.motor), 1)
+
+    def test_en_varios_procesos(self):
+
+        """Prueba que el reparto entre procesos genera los mismos informes que un solo proceso"""
+        progreso = []
+        escritos = informes.generar_informes(self.directorio, procesos=2, clientes_por_bloque=2,
+                                             progreso=progreso.append, motor=self.motor)
+        self.assertEqual((escritos, progreso[-1]), (7, 7))
+        en_paralelo = self.leer('cliente-5.html')
+        informes.generar_informes(self.directorio, nombre="Cliente 5", procesos=1, motor=self.motor)
+        self.assertEqual(self.leer('cliente-5.html'), en_paralelo)
+
+
+if __name__ == '__main__':
+    unittest.main()
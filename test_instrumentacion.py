@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from sqlalchemy.exc import OperationalError
+from calculadora import guardar_lote, recuperar_historial, recuperar_historial_pagina
+from instrumentacion import Histograma, Registro, instrumentar, registro
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal, romper_historial
+
+
+class TestInstrumentacion(unittest.TestCase):
+
+    """Pruebas de los contadores e histogramas de latencia."""
+
+    def setUp(self):
+        activo = registro.activo
+        self.addCleanup(setattr, registro, 'activo', activo)
+        self.addCleanup(registro.reiniciar)
+        registro.reiniciar()
+
+    def test_histograma(self):
+
+        """Prueba los intervalos (un valor igual a un límite cuenta en ese intervalo) y los percentiles"""
+        histograma = Histograma((1.0, 2.0, 4.0))
+        for valor in (0.5, 1.0, 1.5, 3.0, 10.0):
+            histograma.observar(valor)
+        self.assertEqual(histograma.cuentas, [2, 1, 1, 1])
+        self.assertEqual((histograma.n, histograma.suma, histograma.maximo), (5, 16.0, 10.0))
+        self.assertAlmostEqual(histograma.percentil(0.5), 1.5)
+        self.assertEqual(histograma.percentil(1.0), 10.0)
+        self.assertIsNone(Histograma().percentil(0.5))
+
+    def test_decorador_activo_y_desactivado(self):
+
+        """Prueba que solo se registran llamadas con la instrumentación activa, incluidos los errores"""
+        @instrumentar('prueba', filas=len)
+        def operacion(valores):
+            if not valores:
+                raise ValueError("vacío")
+            return valores
+
+        registro.activo = False
+        operacion([1, 2])
+        self.assertEqual(registro.resumen(), {})
+
+        registro.activo = True
+        operacion([1, 2, 3])
+        with self.assertRaises(ValueError):
+            operacion([])
+        datos = registro.resumen()['prueba']
+        self.assertEqual((datos['llamadas'], datos['errores'], datos['filas']), (2, 1, 3))
+
+    def test_operaciones_de_la_aplicacion(self):
+
+        """Prueba que el guardado y la lectura del historial registran las filas procesadas"""
+        motor = crear_motor_temporal(self)
+        registro.activo = True
+        guardar_lote(analisis_de_prueba(20), motor=motor)
+        recuperar_historial(motor=motor)
+        resumen = registro.resumen()
+        self.assertEqual(resumen['guardar_lote']['filas'], 20)
+        self.assertEqual(resumen['recuperar_historial']['filas'], 20)
+
+    def test_lecturas_fallidas_cuentan_como_errores(self):
+
+        """Prueba que una lectura del historial que falla suma un error, también si se devuelve []"""
+        motor = crear_motor_temporal(self)
+        romper_historial(motor)
+        registro.activo = True
+        self.assertEqual(recuperar_historial(motor=motor), [])
+        with self.assertRaises(OperationalError):
+            recuperar_historial_pagina(motor=motor)
+        resumen = registro.resumen()
+        self.assertEqual(resumen['recuperar_historial']['errores'], 1)
+        self.assertEqual(resumen['recuperar_historial_pagina']['errores'], 1)
+
+    def test_formatos_de_volcado(self):
+
+        """Prueba el texto de Prometheus (intervalos acumulados) y el volcado JSON"""
+        propio = Registro(activo=True)
+        for segundos in (0.002, 0.02, 60.0):
+            propio.registrar('exportar_historial', segundos, filas=10)
+        texto = propio.a_prometheus()
+        self.assertIn('coachbodymetrics_filas_total{operacion="exportar_historial"} 30', texto)
+        self.assertIn('coachbodymetrics_duracion_segundos_bucket{operacion="exportar_historial",le="0.005"} 1',
+                      texto)
+        self.assertIn('coachbodymetrics_duracion_segundos_bucket{operacion="exportar_historial",le="+Inf"} 3',
+                      texto)
+        self.assertIn('coachbodymetrics_duracion_segundos_count{operacion="exportar_historial"} 3', texto)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'metricas.json')
+            propio.volcar(ruta)
+            with open(ruta, encoding='utf-8') as archivo:
+                self.assertEqual(json.load(archivo)['exportar_historial']['llamadas'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
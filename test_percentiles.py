@@ -0,0 +1,68 @@
+import unittest
+from datetime import datetime
+from calculadora import guardar_datos
+from estadisticas import reconstruir_estadisticas, tramo_edad
+from percentiles import cache_percentiles, formatear_percentil, percentil, percentiles_analisis, rango_percentil
+from pruebas_utiles import analisis_de_prueba, motor_con_analisis
+
+
+class TestPercentiles(unittest.TestCase):
+
+    """Pruebas del percentil por género y tramo de edad."""
+
+    def setUp(self):
+        self.motor, self.analisis = motor_con_analisis(self, 120)
+
+    def percentil_directo(self, metrica, valor, genero, edad):
+        grupo = [getattr(r, metrica) for r in self.analisis
+                 if r.genero == genero and tramo_edad(r.edad) == tramo_edad(edad)]
+        menores = sum(v < valor for v in grupo)
+        iguales = sum(v == valor for v in grupo)
+        return 100 * (menores + iguales / 2) / len(grupo), len(grupo)
+
+    def test_rango_percentil(self):
+
+        """Prueba el percentil con valores repetidos, por debajo y por encima de la distribución"""
+        valores, acumulados = [10, 20, 30], [1, 3, 4]
+        self.assertEqual(rango_percentil(valores, acumulados, 20), 50.0)
+        self.assertEqual(rango_percentil(valores, acumulados, 25), 75.0)
+        self.assertEqual(rango_percentil(valores, acumulados, 5), 0.0)
+        self.assertEqual(rango_percentil(valores, acumulados, 40), 100.0)
+        self.assertIsNone(rango_percentil([], [], 10))
+
+    def test_igual_que_recorrer_los_clientes(self):
+
+        """Prueba que el percentil coincide con el calculado recorriendo todas las mediciones del grupo"""
+        for resultado in self.analisis[:10]:
+            for metrica in ('porcentaje_grasa', 'ffmi'):
+                valor = getattr(resultado, metrica)
+                posicion = percentil(metrica, valor, resultado.genero, resultado.edad, motor=self.motor)
+                esperado, n = self.percentil_directo(metrica, valor, resultado.genero, resultado.edad)
+                self.assertAlmostEqual(posicion['percentil'], esperado)
+                self.assertEqual(posicion['n'], n)
+
+    def test_se_actualiza_al_guardar(self):
+
+        """Prueba que las mediciones nuevas se cuentan sin reconstruir y que la reconstrucción da lo mismo"""
+        nuevo = analisis_de_prueba(1, inicio=datetime(2025, 1, 1))[0]
+        antes = percentil('ffmi', nuevo.ffmi, nuevo.genero, nuevo.edad, motor=self.motor)
+        self.assertTrue(guardar_datos(nuevo.datos_cliente(), motor=self.motor))
+        despues = percentil('ffmi', nuevo.ffmi, nuevo.genero, nuevo.edad, motor=self.motor)
+        self.assertEqual(despues['n'], antes['n'] + 1)
+
+        cache_percentiles.invalidar()
+        reconstruir_estadisticas(motor=self.motor)
+        self.assertEqual(percentil('ffmi', nuevo.ffmi, nuevo.genero, nuevo.edad, motor=self.motor), despues)
+
+    def test_grupo_sin_datos(self):
+
+        """Prueba que un grupo sin mediciones no tiene percentil y que las métricas sin valor se omiten"""
+        posiciones = percentiles_analisis({'porcentaje_grasa': 20.0, 'ffmi': None}, 'h', 75, motor=self.motor)
+        self.assertEqual(posiciones, {'porcentaje_grasa': None})
+        self.assertEqual(formatear_percentil(None), "Percentil: sin datos del grupo")
+        with self.assertRaises(ValueError):
+            percentil('imc', 22.0, 'h', 30, motor=self.motor)
+
+
+if __name__ == '__main__':
+    unittest.main()
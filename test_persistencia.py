@@ -0,0 +1,233 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+from sqlalchemy import func, inspect, select
+from sqlalchemy.exc import OperationalError
+from models import Cliente, crear_indices
+import main
+from calculadora import (
+    analizar, guardar_lote, recuperar_historial, recuperar_historial_pagina, recuperar_historial_cliente,
+    recuperar_ultima_medicion, recuperar_ultimas_mediciones, recuperar_historial_rango
+)
+from exportador import exportar_historial, leer_columnar
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal, motor_con_analisis, romper_historial
+
+
+class TestGuardarLote(unittest.TestCase):
+
+    """Pruebas del guardado masivo de clientes."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+
+    def contar(self):
+        with self.motor.connect() as conexion:
+            return conexion.execute(select(func.count()).select_from(Cliente.__table__)).scalar()
+
+    def test_guarda_todos_los_registros(self):
+
+        """Prueba que un lote válido se guarda completo en bloques y activa el modo WAL"""
+        resultados = guardar_lote(analisis_de_prueba(250), tamano_lote=64, motor=self.motor)
+        self.assertEqual(resultados, [(True, None)] * 250)
+        self.assertEqual(self.contar(), 250)
+        with self.motor.connect() as conexion:
+            self.assertEqual(conexion.exec_driver_sql("PRAGMA journal_mode").scalar(), 'wal')
+
+    def test_registros_invalidos_no_afectan_al_resto(self):
+
+        """Prueba que se informa del error de cada fila inválida y se guardan las demás"""
+        validos = [a.datos_cliente() for a in analisis_de_prueba(3)]
+        sin_peso = dict(validos[0])
+        del sin_peso['peso']
+        peso_texto = dict(validos[0], peso='mucho')
+        resultados = guardar_lote([validos[0], sin_peso, validos[1], peso_texto, validos[2]], motor=self.motor)
+        self.assertEqual([exito for exito, _ in resultados], [True, False, True, False, True])
+        self.assertIn('peso', resultados[1][1])
+        self.assertEqual(self.contar(), 3)
+
+
+class TestHistorialPaginado(unittest.TestCase):
+
+    """Pruebas de la paginación por clave del historial."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+        analisis = analisis_de_prueba(45)
+        # Dos registros con la misma fecha, para comprobar el desempate por id
+        analisis.append(analizar('Empate', 70.0, 170.0, 30, 'h', 80.0, 0.0, 38.0, 'mantener',
+                                 fecha=analisis[10].fecha))
+        guardar_lote(analisis, motor=self.motor)
+
+    def test_recorre_todas_las_filas_sin_repetir(self):
+
+        """Prueba que las páginas cubren el historial completo en orden (fecha, id)"""
+        vistas = []
+        cursor = None
+        while True:
+            pagina = recuperar_historial_pagina(cursor, limite=10, motor=self.motor)
+            if not pagina:
+                break
+            vistas.extend(pagina)
+            cursor = (pagina[-1].fecha, pagina[-1].id)
+        self.assertEqual(len(vistas), 46)
+        self.assertEqual(len({fila.id for fila in vistas}), 46)
+        claves = [(fila.fecha, fila.id) for fila in vistas]
+        self.assertEqual(claves, sorted(claves))
+
+    def test_solo_columnas_del_historial(self):
+
+        """Prueba que la página devuelve filas con las columnas visibles y no objetos Cliente"""
+        fila = recuperar_historial_pagina(limite=1, motor=self.motor)[0]
+        self.assertNotIsInstance(fila, Cliente)
+        self.assertIn('ffmi', fila._fields)
+        self.assertNotIn('cuello', fila._fields)
+
+    def test_error_de_lectura(self):
+
+        """Prueba que la página propaga el error de la base de datos y recuperar_historial sigue devolviendo []"""
+        romper_historial(self.motor)
+        with self.assertRaises(OperationalError):
+            recuperar_historial_pagina(limite=10, motor=self.motor)
+        self.assertEqual(recuperar_historial(motor=self.motor), [])
+
+    def test_ventana_informa_del_error(self):
+
+        """Prueba que la ventana de historial avisa del error y no da el historial por terminado"""
+        class TrabajadorSincrono:
+            def enviar(self, funcion, *args, al_terminar=None, al_fallar=None, **kwargs):
+                try:
+                    resultado = funcion(*args, **kwargs)
+                except Exception as e:
+                    al_fallar(e)
+                else:
+                    al_terminar(resultado)
+
+        ventana = main.HistorialWindow.__new__(main.HistorialWindow)
+        ventana.window = mock.Mock()
+        ventana.window.winfo_exists.return_value = True
+        ventana.trabajador = TrabajadorSincrono()
+        ventana.busqueda = mock.Mock(get=mock.Mock(return_value=''))
+        ventana.orden, ventana.descendente, ventana.cursor, ventana.consulta = 'fecha', False, None, 0
+        ventana.agotado, ventana.cargando = False, True
+
+        romper_historial(self.motor)
+        with mock.patch('base_datos._motor', self.motor), mock.patch.object(main.messagebox, 'showerror') as error:
+            ventana.cargar_pagina()
+        error.assert_called_once()
+        self.assertFalse(ventana.agotado)
+        self.assertFalse(ventana.cargando)
+
+
+class TestConsultasCliente(unittest.TestCase):
+
+    """Pruebas de los índices y las consultas por cliente y por fechas."""
+
+    def setUp(self):
+        self.motor, _ = motor_con_analisis(self, 70)
+
+    def test_crear_indices_en_base_existente(self):
+
+        """Prueba que los índices se añaden a una base de datos creada sin ellos"""
+        with self.motor.begin() as conexion:
+            conexion.exec_driver_sql("DROP INDEX ix_clientes_nombre_fecha")
+            conexion.exec_driver_sql("DROP INDEX ix_clientes_fecha")
+        crear_indices(self.motor)
+        indices = {i['name'] for i in inspect(self.motor).get_indexes('clientes')}
+        self.assertTrue({'ix_clientes_nombre_fecha', 'ix_clientes_fecha'} <= indices)
+        with self.motor.connect() as conexion:
+            plan = conexion.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM clientes WHERE nombre = 'Cliente 1' ORDER BY fecha").all()
+        self.assertIn('ix_clientes_nombre_fecha', str(plan))
+
+    def test_historial_y_ultima_medicion_de_un_cliente(self):
+
+        """Prueba el historial ordenado de un cliente y su última medición"""
+        historial = recuperar_historial_cliente('Cliente 2', motor=self.motor)
+        self.assertEqual(len(historial), 10)
+        self.assertEqual([f.fecha for f in historial], sorted(f.fecha for f in historial))
+        self.assertEqual(recuperar_ultima_medicion('Cliente 2', motor=self.motor).id, historial[-1].id)
+        self.assertIsNone(recuperar_ultima_medicion('Nadie', motor=self.motor))
+
+    def test_ultimas_mediciones_y_rango(self):
+
+        """Prueba la última medición de cada cliente y la consulta por rango de fechas"""
+        ultimas = recuperar_ultimas_mediciones(motor=self.motor)
+        self.assertEqual([f.nombre for f in ultimas], [f"Cliente {i}" for i in range(7)])
+        for fila in ultimas:
+            self.assertEqual(fila.id, recuperar_ultima_medicion(fila.nombre, motor=self.motor).id)
+        rango = recuperar_historial_rango(datetime(2024, 2, 1), datetime(2024, 2, 8), motor=self.motor)
+        self.assertEqual(len(rango), 7)
+
+
+class TestExportador(unittest.TestCase):
+
+    """Pruebas de la exportación del historial por bloques."""
+
+    def setUp(self):
+        self.motor = crear_motor_temporal(self)
+        analisis = analisis_de_prueba(30)
+        analisis.append(analizar('Pérez, Juan "JP"', 70.0, 170.0, 30, 'h', 80.0, 0.0, 38.0, 'mantener',
+                                 fecha=datetime(2024, 3, 1)))
+        guardar_lote(analisis, motor=self.motor)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def test_csv_con_comillas(self):
+
+        """Prueba que los nombres con comas y comillas no rompen el CSV"""
+        progreso = []
+        filas = exportar_historial(self.ruta('h.csv'), tamano_bloque=7, progreso=progreso.append, motor=self.motor)
+        self.assertEqual(filas, 31)
+        self.assertEqual(progreso[-1], 31)
+        with open(self.ruta('h.csv'), encoding='utf-8', newline='') as archivo:
+            lineas = list(csv.reader(archivo))
+        self.assertEqual(len(lineas), 32)
+        self.assertTrue(all(len(linea) == len(lineas[0]) for linea in lineas))
+        self.assertIn('Pérez, Juan "JP"', [linea[0] for linea in lineas])
+
+    def test_csv_gz_y_jsonl_con_filtros(self):
+
+        """Prueba los formatos comprimido y JSON Lines con filtros de fecha y cliente"""
+        filas = exportar_historial(self.ruta('h.csv.gz'), desde=datetime(2024, 1, 11), hasta=datetime(2024, 1, 21),
+                                   motor=self.motor)
+        self.assertEqual(filas, 10)
+        with gzip.open(self.ruta('h.csv.gz'), 'rt', encoding='utf-8', newline='') as archivo:
+            self.assertEqual(len(list(csv.reader(archivo))), 11)
+
+        filas = exportar_historial(self.ruta('h.jsonl'), nombre='Cliente 3', motor=self.motor)
+        with open(self.ruta('h.jsonl'), encoding='utf-8') as archivo:
+            registros = [json.loads(linea) for linea in archivo]
+        self.assertEqual(len(registros), filas)
+        self.assertTrue(all(r['nombre'] == 'Cliente 3' for r in registros))
+
+    def test_columnar(self):
+
+        """Prueba que el formato columnar conserva los valores y tipos de cada columna"""
+        exportar_historial(self.ruta('h.zip'), tamano_bloque=8, motor=self.motor)
+        columnas = leer_columnar(self.ruta('h.zip'))
+        self.assertEqual(len(columnas['peso']), 31)
+        self.assertEqual(columnas['fecha'].dtype.kind, 'M')
+        self.assertEqual(columnas['nombre'][-1], 'Pérez, Juan "JP"')
+
+    def test_cancelar_borra_el_archivo(self):
+
+        """Prueba que al cancelar no queda un archivo a medio escribir"""
+        cancelar = threading.Event()
+        cancelar.set()
+        self.assertIsNone(exportar_historial(self.ruta('h.csv'), tamano_bloque=5, cancelar=cancelar,
+                                             motor=self.motor))
+        self.assertFalse(os.path.exists(self.ruta('h.csv')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import importlib.util
+import unittest
+from calculadora import analizar, guardar_lote
+from calculadora_lote import analizar_lote
+from importador import convertir_registro
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal, registro_valido, romper_historial
+
+DEPENDENCIAS_HTTP = importlib.util.find_spec('starlette') and importlib.util.find_spec('httpx')
+
+
+class TestAnalizarLote(unittest.TestCase):
+
+    """Pruebas del análisis vectorizado que usa el servicio HTTP."""
+
+    def test_igual_que_analizar(self):
+
+        """Prueba que cada fila del lote es idéntica al resultado de analizar, incluidos los redondeos"""
+        entradas = [convertir_registro(registro_valido(i)) for i in range(300)]
+        columnas = {campo: [e[campo] for e in entradas] for campo in entradas[0]}
+        self.assertEqual(analizar_lote(columnas), [analizar(**e) for e in entradas])
+
+    def test_medidas_imposibles(self):
+
+        """Prueba que las filas que analizar no puede calcular devuelven None sin afectar al resto"""
+        entradas = [convertir_registro(registro_valido(i)) for i in range(3)]
+        entradas[1]['cuello'] = entradas[1]['cintura'] + 10
+        columnas = {campo: [e[campo] for e in entradas] for campo in entradas[0]}
+        resultados = analizar_lote(columnas)
+        self.assertIsNone(resultados[1])
+        self.assertEqual(resultados[2], analizar(**entradas[2]))
+
+
+@unittest.skipUnless(DEPENDENCIAS_HTTP, "starlette o httpx no están instalados")
+class TestServidor(unittest.TestCase):
+
+    """Pruebas de la API HTTP."""
+
+    def setUp(self):
+        from starlette.testclient import TestClient
+        from servidor import crear_app
+        self.motor = crear_motor_temporal(self)
+        self.app = crear_app(motor=self.motor, espera=0.05)
+        self.cliente = TestClient(self.app)
+        self.cliente.__enter__()
+        self.addCleanup(self.cliente.__exit__, None, None, None)
+
+    def test_analisis_individual(self):
+
+        """Prueba un análisis individual y el error de validación"""
+        respuesta = self.cliente.post('/analisis', json=registro_valido(4))
+        self.assertEqual(respuesta.status_code, 200)
+        esperado = analizar(**convertir_registro(registro_valido(4)))
+        self.assertEqual(respuesta.json()['ffmi'], esperado.ffmi)
+        self.assertEqual(respuesta.json()['interpretacion_imc'], esperado.interpretacion_imc)
+
+        respuesta = self.cliente.post('/analisis', json=dict(registro_valido(4), objetivo='adelgazar'))
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertIn('Objetivo', respuesta.json()['error'])
+
+    def test_peticiones_simultaneas_se_agrupan(self):
+
+        """Prueba que varias peticiones individuales simultáneas se calculan en un solo lote"""
+        import httpx
+
+        async def enviar_todas():
+            transporte = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transporte, base_url='http://api') as cliente:
+                return await asyncio.gather(*(cliente.post('/analisis', json=registro_valido(i)) for i in range(20)))
+
+        lotes_antes = self.app.state.agrupador.lotes
+        respuestas = asyncio.run(enviar_todas())
+        self.assertEqual([r.json()['nombre'] for r in respuestas], [registro_valido(i)['nombre'] for i in range(20)])
+        self.assertEqual(self.app.state.agrupador.lotes - lotes_antes, 1)
+
+    def test_lote_con_errores(self):
+
+        """Prueba que el endpoint de lote devuelve los errores por posición y el resto de resultados"""
+        cuerpo = [registro_valido(0), dict(registro_valido(1), peso='x'), registro_valido(2)]
+        respuesta = self.cliente.post('/analisis/lote', json=cuerpo).json()
+        self.assertIsNone(respuesta['resultados'][1])
+        self.assertEqual(respuesta['errores'][0]['indice'], 1)
+        self.assertEqual(respuesta['resultados'][2]['nombre'], registro_valido(2)['nombre'])
+
+    def test_historial_paginado(self):
+
+        """Prueba que las páginas del historial cubren todas las filas siguiendo el cursor"""
+        guardar_lote(analisis_de_prueba(25), motor=self.motor)
+        vistas = []
+        parametros = {'limite': 10}
+        while True:
+            respuesta = self.cliente.get('/historial', params=parametros).json()
+            vistas.extend(fila['id'] for fila in respuesta['filas'])
+            if respuesta['siguiente'] is None:
+                break
+            parametros = dict(respuesta['siguiente'], limite=10)
+        self.assertEqual(sorted(vistas), list(range(1, 26)))
+        self.assertEqual(len(vistas), 25)
+
+        for limite in (-1, 0, 'x'):
+            with self.subTest(limite=limite):
+                self.assertEqual(self.cliente.get('/historial', params={'limite': limite}).status_code, 422)
+
+    def test_historial_con_error_de_base_de_datos(self):
+
+        """Prueba que un fallo al leer el historial devuelve 503 y no una página vacía"""
+        romper_historial(self.motor)
+        respuesta = self.cliente.get('/historial')
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn('error', respuesta.json())
+
+    def test_metricas_prometheus(self):
+
+        """Prueba que /metricas devuelve las métricas de instrumentación en texto de Prometheus"""
+        from instrumentacion import registro
+        registro.registrar('prueba_api', 0.01, filas=3)
+        self.addCleanup(registro.reiniciar)
+        respuesta = self.cliente.get('/metricas')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.headers['content-type'].startswith('text/plain'))
+        self.assertIn('coachbodymetrics_filas_total{operacion="prueba_api"} 3', respuesta.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
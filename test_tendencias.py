@@ -0,0 +1,77 @@
+import unittest
+from datetime import timedelta
+from calculadora import guardar_datos
+from tendencias import (
+    METRICAS_TENDENCIA, VENTANA_MEDIA, CacheTendencias, recuperar_historial_pagina_tendencias,
+    recuperar_tendencias, resumen_tendencias
+)
+from pruebas_utiles import analisis_de_prueba, crear_motor_temporal, motor_con_analisis
+
+
+class TestTendencias(unittest.TestCase):
+
+    """Pruebas de la evolución de cada cliente entre visitas."""
+
+    def setUp(self):
+        self.motor, self.analisis = motor_con_analisis(self, 70)
+
+    def test_cambios_y_medias(self):
+
+        """Prueba los cambios, la media móvil y el ritmo semanal frente al cálculo directo en Python"""
+        visitas = [r for r in self.analisis if r.nombre == "Cliente 3"]
+        filas = recuperar_tendencias("Cliente 3", self.motor)
+        self.assertEqual(len(filas), len(visitas))
+        self.assertIsNone(filas[0].peso_cambio)
+        self.assertEqual(filas[0].peso_cambio_total, 0)
+        for i in range(1, len(visitas)):
+            semanas = (visitas[i].fecha - visitas[i - 1].fecha) / timedelta(weeks=1)
+            self.assertAlmostEqual(filas[i].semanas_desde_anterior, semanas)
+            for metrica in METRICAS_TENDENCIA:
+                actual, anterior = getattr(visitas[i], metrica), getattr(visitas[i - 1], metrica)
+                recientes = [getattr(v, metrica) for v in visitas[max(i - VENTANA_MEDIA + 1, 0):i + 1]]
+                self.assertAlmostEqual(getattr(filas[i], f"{metrica}_cambio"), actual - anterior)
+                self.assertAlmostEqual(getattr(filas[i], f"{metrica}_cambio_total"),
+                                       actual - getattr(visitas[0], metrica))
+                self.assertAlmostEqual(getattr(filas[i], f"{metrica}_media"), sum(recientes) / len(recientes))
+                self.assertAlmostEqual(getattr(filas[i], f"{metrica}_semanal"), (actual - anterior) / semanas)
+
+    def test_pagina_con_tendencias(self):
+
+        """Prueba que las páginas del historial traen la evolución calculada sobre todo el cliente"""
+        pagina = recuperar_historial_pagina_tendencias(limite=10, motor=self.motor)
+        siguiente = recuperar_historial_pagina_tendencias((pagina[-1].fecha, pagina[-1].id), 10, self.motor)
+        self.assertEqual([f.id for f in pagina + siguiente], list(range(1, 21)))
+        completo = {f.id: f for f in recuperar_tendencias(siguiente[0].nombre, self.motor)}
+        self.assertEqual(siguiente[0], completo[siguiente[0].id])
+
+    def test_cache_se_invalida_con_una_medicion_nueva(self):
+
+        """Prueba que la caché sirve la misma evolución hasta que se guarda una medición del cliente"""
+        cache = CacheTendencias()
+        primera = cache.obtener("Cliente 1", self.motor)
+        self.assertIs(cache.obtener("Cliente 1", self.motor), primera)
+        self.assertEqual((cache.aciertos, cache.fallos), (1, 1))
+
+        nueva = analisis_de_prueba(1, inicio=self.analisis[-1].fecha + timedelta(days=7))[0]
+        self.assertTrue(guardar_datos(nueva.datos_cliente() | {'nombre': "Cliente 1"}, motor=self.motor))
+        actualizada = cache.obtener("Cliente 1", self.motor)
+        self.assertEqual(len(actualizada), len(primera) + 1)
+        self.assertEqual(cache.fallos, 2)
+
+        otro = crear_motor_temporal(self)
+        self.assertEqual(cache.obtener("Cliente 1", otro), [])
+        self.assertEqual(cache.fallos, 3)
+
+    def test_resumen(self):
+
+        """Prueba el resumen de la evolución desde la primera visita y desde la anterior"""
+        filas = recuperar_tendencias("Cliente 5", self.motor)
+        resumen = resumen_tendencias(filas)
+        self.assertTrue(resumen.startswith(f"Desde la primera visita ({filas[-1].semanas_desde_inicio:.0f} semanas)"))
+        self.assertIn(f"peso {filas[-1].peso_cambio_total:+.1f} kg", resumen)
+        self.assertIn(f"Desde la anterior: peso {filas[-1].peso_cambio:+.1f} kg", resumen)
+        self.assertEqual(resumen_tendencias(filas[:1]), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
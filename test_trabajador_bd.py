@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+from trabajador_bd import TrabajadorBD
+
+
+class RootFalso:
+    """Sustituye a la ventana de Tk: guarda las llamadas a after sin ejecutarlas."""
+
+    def __init__(self):
+        self.programadas = []
+
+    def after(self, ms, funcion):
+        self.programadas.append(funcion)
+
+
+class TestTrabajadorBD(unittest.TestCase):
+
+    """Pruebas del trabajador que ejecuta las operaciones de base de datos en segundo plano."""
+
+    def setUp(self):
+        self.trabajador = TrabajadorBD(RootFalso())
+        self.addCleanup(self.trabajador.cerrar)
+
+    def esperar(self, trabajo):
+        trabajo.futuro.result(timeout=5)
+        self.trabajador.procesar_pendientes()
+
+    def test_resultado_y_error_llegan_al_hilo_de_la_interfaz(self):
+
+        """Prueba que los callbacks se ejecutan en el hilo que procesa la cola y no en el del trabajo"""
+        resultados = []
+        errores = []
+        trabajo = self.trabajador.enviar(lambda a, b: (threading.current_thread(), a + b), 2, 3,
+                                         al_terminar=resultados.append)
+        self.esperar(trabajo)
+        hilo_trabajo, suma = resultados[0]
+        self.assertEqual(suma, 5)
+        self.assertIsNot(hilo_trabajo, threading.current_thread())
+
+        def fallar():
+            raise ValueError("sin conexión")
+        self.esperar(self.trabajador.enviar(fallar, al_fallar=errores.append))
+        self.assertIsInstance(errores[0], ValueError)
+
+    def test_progreso_y_cancelacion(self):
+
+        """Prueba que un trabajo cancelable informa su avance y se detiene al cancelarlo"""
+        avances = []
+        terminados = []
+        empezado = threading.Event()
+
+        def largo(progreso, cancelar):
+            for i in range(1000):
+                progreso(i)
+                empezado.set()
+                if cancelar.is_set():
+                    return None
+                time.sleep(0.001)
+            return 'completo'
+
+        trabajo = self.trabajador.enviar(largo, cancelable=True, al_progresar=avances.append,
+                                         al_terminar=terminados.append)
+        empezado.wait(5)
+        trabajo.cancelar()
+        self.esperar(trabajo)
+        self.assertEqual(terminados, [None])
+        self.assertTrue(avances)
+        self.assertLess(len(avances), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
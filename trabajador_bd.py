@@ -0,0 +1,121 @@
+"""Ejecución de las operaciones de base de datos fuera del hilo de la interfaz.
+
+Las funciones de calculadora.py y exportador.py abren una sesión o conexión propia en cada
+llamada, así que pueden ejecutarse en los hilos del trabajador sin compartir estado. Los
+resultados vuelven al hilo de Tk a través de una cola que se revisa con root.after.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Trabajo:
+    """Un trabajo enviado al TrabajadorBD.
+
+        Atributos:
+            cancelado (threading.Event): Se activa al pedir la cancelación; la función del trabajo
+                debe consultarlo para detenerse.
+            futuro (concurrent.futures.Future): Futuro del ThreadPoolExecutor que ejecuta el trabajo.
+        """
+
+    def __init__(self, trabajador, al_progresar):
+        self.cancelado = threading.Event()
+        self.futuro = None
+        self._trabajador = trabajador
+        self._al_progresar = al_progresar
+
+    def cancelar(self):
+
+        """Pide la cancelación del trabajo; si aún no había empezado, no se ejecuta y al_terminar recibe None."""
+        self.cancelado.set()
+
+    def informar_progreso(self, valor):
+
+        """Envía un avance al hilo de la interfaz; se llama desde el hilo del trabajo."""
+        if self._al_progresar is not None:
+            self._trabajador.pendientes.put((self._al_progresar, valor))
+
+
+class TrabajadorBD:
+    """Grupo de hilos para las operaciones de base de datos de la aplicación.
+
+        Los callbacks (al_terminar, al_fallar, al_progresar) se ejecutan siempre en el hilo de Tk,
+        por lo que pueden actualizar la interfaz directamente.
+
+        Atributos:
+            root (tk.Misc): Widget cuyo bucle de eventos revisa la cola de resultados.
+            pendientes (queue.Queue): Callbacks pendientes de ejecutar en el hilo de Tk.
+            intervalo (int): Milisegundos entre cada revisión de la cola.
+        """
+
+    def __init__(self, root, max_hilos=2, intervalo=50):
+        self.root = root
+        self.intervalo = intervalo
+        self.pendientes = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='bd')
+        self._cerrado = False
+        self.root.after(self.intervalo, self._revisar)
+
+    def enviar(self, funcion, *args, al_terminar=None, al_fallar=None, al_progresar=None, cancelable=False,
+               **kwargs):
+
+        """Ejecuta funcion(*args, **kwargs) en un hilo del trabajador.
+
+            Args:
+                funcion (callable): Operación a ejecutar.
+                al_terminar (callable, opcional): Recibe el resultado de la función.
+                al_fallar (callable, opcional): Recibe la excepción si la función falla.
+                al_progresar (callable, opcional): Recibe cada avance que informe la función.
+                cancelable (bool): Si es True, la función recibe además los argumentos progreso
+                    (Trabajo.informar_progreso) y cancelar (Trabajo.cancelado), como exportar_historial.
+
+            Returns:
+                Trabajo: El trabajo enviado, que permite cancelarlo.
+            """
+        trabajo = Trabajo(self, al_progresar)
+        if cancelable:
+            kwargs.update(progreso=trabajo.informar_progreso, cancelar=trabajo.cancelado)
+
+        def ejecutar():
+            if trabajo.cancelado.is_set():
+                if al_terminar is not None:
+                    self.pendientes.put((al_terminar, None))
+                return
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception as e:
+                if al_fallar is not None:
+                    self.pendientes.put((al_fallar, e))
+                else:
+                    print(f"Error en trabajo de base de datos: {e}")
+            else:
+                if al_terminar is not None:
+                    self.pendientes.put((al_terminar, resultado))
+
+        trabajo.futuro = self._executor.submit(ejecutar)
+        return trabajo
+
+    def procesar_pendientes(self):
+
+        """Ejecuta en el hilo actual todos los callbacks que hayan llegado a la cola."""
+        while True:
+            try:
+                callback, valor = self.pendientes.get_nowait()
+            except queue.Empty:
+                return
+            callback(valor)
+
+    def _revisar(self):
+        if self._cerrado:
+            return
+        try:
+            self.procesar_pendientes()
+        finally:
+            self.root.after(self.intervalo, self._revisar)
+
+    def cerrar(self):
+
+        """Detiene el trabajador: descarta los trabajos que no hayan empezado y no espera a los que están en curso."""
+        self._cerrado = True
+        self._executor.shutdown(wait=False, cancel_futures=True)